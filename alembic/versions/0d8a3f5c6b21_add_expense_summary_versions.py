@@ -0,0 +1,33 @@
+"""add expense summary versions
+
+Revision ID: 0d8a3f5c6b21
+Revises: 9c6e2b4f7a13
+Create Date: 2026-10-20 10:41:07.203118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0d8a3f5c6b21'
+down_revision: Union[str, Sequence[str], None] = '9c6e2b4f7a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('expense_summary_versions',
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('owner_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('expense_summary_versions')
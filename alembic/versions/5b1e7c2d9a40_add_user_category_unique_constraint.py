@@ -0,0 +1,39 @@
+"""add per-user unique constraint on categories
+
+Revision ID: 5b1e7c2d9a40
+Revises: 34cc0db76ef3
+Create Date: 2026-10-19 10:12:31.418202
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1e7c2d9a40'
+down_revision: Union[str, Sequence[str], None] = '34cc0db76ef3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Category names are unique per user, not globally. The expense write paths
+    # rely on this constraint as the ON CONFLICT target of the category upsert.
+    op.execute("ALTER TABLE categories DROP CONSTRAINT IF EXISTS categories_name_key")
+    op.execute("""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_user_category') THEN
+                ALTER TABLE categories ADD CONSTRAINT uq_user_category UNIQUE (owner_id, name);
+            END IF;
+        END $$;
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_user_category', 'categories', type_='unique')
+    op.create_unique_constraint('categories_name_key', 'categories', ['name'])
@@ -0,0 +1,38 @@
+"""add category merges
+
+Revision ID: 6e1c9b7d2a48
+Revises: 0d8a3f5c6b21
+Create Date: 2026-10-20 11:26:53.870412
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e1c9b7d2a48'
+down_revision: Union[str, Sequence[str], None] = '0d8a3f5c6b21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('category_merges',
+    sa.Column('old_category_id', sa.Integer(), nullable=False),
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('new_category_id', sa.Integer(), nullable=False),
+    sa.Column('merged_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['new_category_id'], ['categories.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('old_category_id')
+    )
+    op.create_index(op.f('ix_category_merges_owner_id'), 'category_merges', ['owner_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_category_merges_owner_id'), table_name='category_merges')
+    op.drop_table('category_merges')
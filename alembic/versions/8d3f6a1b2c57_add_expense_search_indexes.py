@@ -0,0 +1,41 @@
+"""add expense search indexes
+
+Revision ID: 8d3f6a1b2c57
+Revises: 5b1e7c2d9a40
+Create Date: 2026-10-19 14:40:07.120935
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d3f6a1b2c57'
+down_revision: Union[str, Sequence[str], None] = '5b1e7c2d9a40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY can't run inside a transaction; this keeps writes going on big tables
+    with op.get_context().autocommit_block():
+        # filter_expenses: owner + date range, ordered by (date, id) for keyset pagination
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_expenses_owner_date_id
+            ON expenses (owner_id, date, id)
+        """)
+        # Description search. The expression must match services/search_service.DESCRIPTION_TSVECTOR
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_expenses_description_tsv
+            ON expenses USING gin (to_tsvector('simple', coalesce(description, '')))
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_expenses_description_tsv")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_expenses_owner_date_id")
@@ -0,0 +1,150 @@
+"""partition expenses by month
+
+Revision ID: a3c5d8e1f027
+Revises: e7b21d4c9f05
+Create Date: 2026-10-19 20:05:41.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c5d8e1f027'
+down_revision: Union[str, Sequence[str], None] = 'e7b21d4c9f05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Months of empty partitions created ahead of today; tasks.partition_tasks keeps this up
+MONTHS_AHEAD = 12
+
+# Creates the missing monthly partitions expenses_YYYY_MM between two dates (inclusive),
+# returns how many were created. Rows that fell into expenses_default for a new month
+# (inserted before its partition existed) are moved into it before it is attached.
+CREATE_PARTITIONS_FUNCTION = """
+    CREATE OR REPLACE FUNCTION create_expense_partitions(from_date date, to_date date)
+    RETURNS integer
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        month_start date := date_trunc('month', from_date)::date;
+        month_end date;
+        partition_name text;
+        created integer := 0;
+    BEGIN
+        WHILE month_start <= to_date LOOP
+            month_end := (month_start + interval '1 month')::date;
+            partition_name := 'expenses_' || to_char(month_start, 'YYYY_MM');
+            IF to_regclass(partition_name) IS NULL THEN
+                EXECUTE format('CREATE TABLE %I (LIKE expenses INCLUDING DEFAULTS)', partition_name);
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM expenses_default WHERE date >= %L AND date < %L RETURNING *) '
+                    'INSERT INTO %I SELECT * FROM moved',
+                    month_start, month_end, partition_name
+                );
+                EXECUTE format(
+                    'ALTER TABLE expenses ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month_start, month_end
+                );
+                created := created + 1;
+            END IF;
+            month_start := month_end;
+        END LOOP;
+        RETURN created;
+    END
+    $$
+"""
+
+COLUMNS = "id, amount, description, date, owner_id, created_at, updated_at, category_id"
+
+
+def create_indexes() -> None:
+    # Created on the parent, Postgres builds them on every partition (and on future ones).
+    # CONCURRENTLY isn't supported for partitioned tables; this runs during the migration anyway.
+    op.execute("CREATE INDEX ix_expenses_id ON expenses (id)")
+    op.execute("CREATE INDEX ix_expenses_owner_date_id ON expenses (owner_id, date, id)")
+    op.execute(
+        "CREATE INDEX ix_expenses_description_tsv "
+        "ON expenses USING gin (to_tsvector('simple', coalesce(description, '')))"
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The partition key must be part of the primary key, so it can't be NULL
+    op.execute("UPDATE expenses SET date = COALESCE(CAST(created_at AS date), CURRENT_DATE) WHERE date IS NULL")
+
+    op.rename_table('expenses', 'expenses_unpartitioned')
+    op.execute("ALTER TABLE expenses_unpartitioned RENAME CONSTRAINT expenses_pkey TO expenses_unpartitioned_pkey")
+    op.drop_index('ix_expenses_id', table_name='expenses_unpartitioned')
+    op.execute("DROP INDEX IF EXISTS ix_expenses_owner_date_id")
+    op.execute("DROP INDEX IF EXISTS ix_expenses_description_tsv")
+
+    op.execute("""
+        CREATE TABLE expenses (
+            id integer NOT NULL DEFAULT nextval('expenses_id_seq'),
+            amount double precision NOT NULL,
+            description varchar,
+            date date NOT NULL DEFAULT CURRENT_DATE,
+            owner_id integer NOT NULL,
+            created_at timestamp,
+            updated_at timestamp,
+            category_id integer NOT NULL,
+            CONSTRAINT expenses_pkey PRIMARY KEY (id, date),
+            CONSTRAINT expenses_owner_id_fkey FOREIGN KEY (owner_id) REFERENCES users (id),
+            CONSTRAINT fk_expenses_categories FOREIGN KEY (category_id) REFERENCES categories (id)
+        ) PARTITION BY RANGE (date)
+    """)
+    # Keep the id sequence when the old table is dropped
+    op.execute("ALTER SEQUENCE expenses_id_seq OWNED BY expenses.id")
+
+    # Catches dates without a partition (far past/future), so inserts never fail
+    op.execute("CREATE TABLE expenses_default PARTITION OF expenses DEFAULT")
+    op.execute(CREATE_PARTITIONS_FUNCTION)
+    op.execute(f"""
+        SELECT create_expense_partitions(
+            COALESCE((SELECT min(date) FROM expenses_unpartitioned), CURRENT_DATE),
+            CAST(GREATEST(
+                COALESCE((SELECT max(date) FROM expenses_unpartitioned), CURRENT_DATE),
+                CURRENT_DATE + interval '{MONTHS_AHEAD} months'
+            ) AS date)
+        )
+    """)
+
+    op.execute(f"INSERT INTO expenses ({COLUMNS}) SELECT {COLUMNS} FROM expenses_unpartitioned")
+    op.drop_table('expenses_unpartitioned')
+
+    create_indexes()
+    op.execute("ANALYZE expenses")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.rename_table('expenses', 'expenses_partitioned')
+    op.execute("ALTER TABLE expenses_partitioned RENAME CONSTRAINT expenses_pkey TO expenses_partitioned_pkey")
+    op.execute("DROP INDEX ix_expenses_id")
+    op.execute("DROP INDEX ix_expenses_owner_date_id")
+    op.execute("DROP INDEX ix_expenses_description_tsv")
+
+    op.execute("""
+        CREATE TABLE expenses (
+            id integer NOT NULL DEFAULT nextval('expenses_id_seq'),
+            amount double precision NOT NULL,
+            description varchar,
+            date date,
+            owner_id integer NOT NULL,
+            created_at timestamp,
+            updated_at timestamp,
+            category_id integer NOT NULL,
+            CONSTRAINT expenses_pkey PRIMARY KEY (id),
+            CONSTRAINT expenses_owner_id_fkey FOREIGN KEY (owner_id) REFERENCES users (id),
+            CONSTRAINT fk_expenses_categories FOREIGN KEY (category_id) REFERENCES categories (id)
+        )
+    """)
+    op.execute("ALTER SEQUENCE expenses_id_seq OWNED BY expenses.id")
+    op.execute(f"INSERT INTO expenses ({COLUMNS}) SELECT {COLUMNS} FROM expenses_partitioned")
+    op.drop_table('expenses_partitioned')  # drops all partitions
+    op.execute("DROP FUNCTION create_expense_partitions(date, date)")
+
+    create_indexes()
@@ -0,0 +1,59 @@
+"""add expense archive tables
+
+Revision ID: b8e4f1a6c392
+Revises: a3c5d8e1f027
+Create Date: 2026-10-19 21:12:53.604718
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e4f1a6c392'
+down_revision: Union[str, Sequence[str], None] = 'a3c5d8e1f027'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('expense_archives',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Integer(), nullable=False),
+    sa.Column('path', sa.String(length=255), nullable=False),
+    sa.Column('row_count', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_expense_archives_id'), 'expense_archives', ['id'], unique=False)
+    op.create_index('ix_expense_archives_owner_month', 'expense_archives', ['owner_id', 'year', 'month'], unique=False)
+    op.create_table('archived_expense_totals',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('owner_id', 'category_id', 'year', 'month', name='uq_archived_total_category_month')
+    )
+    op.create_index(op.f('ix_archived_expense_totals_id'), 'archived_expense_totals', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_archived_expense_totals_id'), table_name='archived_expense_totals')
+    op.drop_table('archived_expense_totals')
+    op.drop_index('ix_expense_archives_owner_month', table_name='expense_archives')
+    op.drop_index(op.f('ix_expense_archives_id'), table_name='expense_archives')
+    op.drop_table('expense_archives')
@@ -0,0 +1,43 @@
+"""add monthly report snapshots
+
+Revision ID: c4a9e0f3d812
+Revises: 8d3f6a1b2c57
+Create Date: 2026-10-19 16:05:44.913027
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a9e0f3d812'
+down_revision: Union[str, Sequence[str], None] = '8d3f6a1b2c57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('monthly_report_snapshots',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Integer(), nullable=False),
+    sa.Column('summary', sa.JSON(), nullable=False),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.Column('html', sa.Text(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('emailed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'year', 'month', name='uq_report_snapshot_user_month')
+    )
+    op.create_index(op.f('ix_monthly_report_snapshots_id'), 'monthly_report_snapshots', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_monthly_report_snapshots_id'), table_name='monthly_report_snapshots')
+    op.drop_table('monthly_report_snapshots')
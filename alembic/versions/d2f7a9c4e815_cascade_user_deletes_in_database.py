@@ -0,0 +1,45 @@
+"""cascade user deletes in database
+
+Revision ID: d2f7a9c4e815
+Revises: b8e4f1a6c392
+Create Date: 2026-10-19 22:03:17.840265
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2f7a9c4e815'
+down_revision: Union[str, Sequence[str], None] = 'b8e4f1a6c392'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True))
+
+    # Deleting a user (or a category) now removes dependent rows in the database,
+    # instead of the ORM loading and deleting them one by one.
+    # NOT VALID isn't available for foreign keys on the partitioned expenses table,
+    # so these validate existing rows while holding their locks.
+    op.drop_constraint('expenses_owner_id_fkey', 'expenses', type_='foreignkey')
+    op.create_foreign_key('expenses_owner_id_fkey', 'expenses', 'users', ['owner_id'], ['id'], ondelete='CASCADE')
+    op.drop_constraint('fk_expenses_categories', 'expenses', type_='foreignkey')
+    op.create_foreign_key('fk_expenses_categories', 'expenses', 'categories', ['category_id'], ['id'], ondelete='CASCADE')
+    op.drop_constraint('categories_owner_id_fkey', 'categories', type_='foreignkey')
+    op.create_foreign_key('categories_owner_id_fkey', 'categories', 'users', ['owner_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('categories_owner_id_fkey', 'categories', type_='foreignkey')
+    op.create_foreign_key('categories_owner_id_fkey', 'categories', 'users', ['owner_id'], ['id'])
+    op.drop_constraint('fk_expenses_categories', 'expenses', type_='foreignkey')
+    op.create_foreign_key('fk_expenses_categories', 'expenses', 'categories', ['category_id'], ['id'])
+    op.drop_constraint('expenses_owner_id_fkey', 'expenses', type_='foreignkey')
+    op.create_foreign_key('expenses_owner_id_fkey', 'expenses', 'users', ['owner_id'], ['id'])
+    op.drop_column('users', 'deleted_at')
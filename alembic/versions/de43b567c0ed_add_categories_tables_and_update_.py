@@ -1,7 +1,7 @@
 """add categories tables and update expenses
 
 Revision ID: de43b567c0ed
-Revises: 
+Revises: 1f0c2a7b3e91
 Create Date: 2025-09-11 17:31:42.337330
 
 """
@@ -13,7 +13,7 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision: str = 'de43b567c0ed'
-down_revision: Union[str, Sequence[str], None] = None
+down_revision: Union[str, Sequence[str], None] = '1f0c2a7b3e91'
 branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
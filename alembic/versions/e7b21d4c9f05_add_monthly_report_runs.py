@@ -0,0 +1,41 @@
+"""add monthly report runs
+
+Revision ID: e7b21d4c9f05
+Revises: c4a9e0f3d812
+Create Date: 2026-10-19 17:22:10.504381
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b21d4c9f05'
+down_revision: Union[str, Sequence[str], None] = 'c4a9e0f3d812'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('monthly_report_runs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('last_user_id', sa.Integer(), nullable=False),
+    sa.Column('users_queued', sa.Integer(), nullable=False),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('year', 'month', name='uq_report_run_month')
+    )
+    op.create_index(op.f('ix_monthly_report_runs_id'), 'monthly_report_runs', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_monthly_report_runs_id'), table_name='monthly_report_runs')
+    op.drop_table('monthly_report_runs')
@@ -0,0 +1,45 @@
+"""add expenses owner category index
+
+Revision ID: f4b3c8d1e269
+Revises: d2f7a9c4e815
+Create Date: 2026-10-19 22:41:06.273519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4b3c8d1e269'
+down_revision: Union[str, Sequence[str], None] = 'd2f7a9c4e815'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Category merges walk a user's expenses of one category in id order.
+    # expenses is partitioned and CREATE INDEX CONCURRENTLY doesn't work on the parent, so:
+    # an (invalid) index on the parent only, a concurrent build per partition, then attach
+    # each one; the parent index becomes valid once every partition has its index.
+    op.execute("CREATE INDEX IF NOT EXISTS ix_expenses_owner_category_id ON ONLY expenses (owner_id, category_id, id)")
+
+    partitions = op.get_bind().execute(sa.text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'expenses'::regclass"
+    )).scalars().all()
+
+    with op.get_context().autocommit_block():
+        for partition in partitions:
+            op.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{partition}_owner_category_id_idx" '
+                f'ON "{partition}" (owner_id, category_id, id)'
+            )
+            op.execute(f'ALTER INDEX ix_expenses_owner_category_id ATTACH PARTITION "{partition}_owner_category_id_idx"')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_expenses_owner_category_id")  # drops the partitions' indexes too
@@ -0,0 +1,52 @@
+"""
+Moves expenses older than the archive horizon out of the expenses table into
+NDJSON.gz files (ARCHIVE_DIR/<owner_id>/<YYYY-MM>-<part>.ndjson.gz), keeping their
+per category totals in archived_expense_totals. Same job as the monthly Celery task.
+
+Usage (from the project root):
+    python archive_expenses.py                       # horizon from ARCHIVE_AFTER_MONTHS
+    python archive_expenses.py --older-than-months 36 --user-id 42
+    python archive_expenses.py --dry-run
+"""
+import argparse
+from database import shards
+from services.archive_service import ARCHIVE_AFTER_MONTHS, archive_horizon, find_archivable_months, archive_old_expenses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--older-than-months", type=int, default=ARCHIVE_AFTER_MONTHS)
+    parser.add_argument("--user-id", type=int, default=None, help="only this user")
+    parser.add_argument("--dry-run", action="store_true", help="only list the user/months that would be archived")
+    args = parser.parse_args()
+
+    horizon = archive_horizon(args.older_than_months)
+
+    # Every shard (only the user's own with --user-id); just the primary when unsharded
+    if args.user_id is not None:
+        factories = [shards.session_factories[shards.shard_for(args.user_id)]]
+    else:
+        factories = shards.session_factories
+
+    months = rows = 0
+    for session_factory in factories:
+        db = session_factory()
+        try:
+            if args.dry_run:
+                for owner_id, month_start in find_archivable_months(db, horizon, args.user_id):
+                    print(f"  user {owner_id}  {month_start:%Y-%m}")
+                    months += 1
+                continue
+            result = archive_old_expenses(db, horizon, args.user_id)
+        finally:
+            db.close()
+        months += result['months']
+        rows += result['rows']
+
+    if args.dry_run:
+        print(f"{months} user/months before {horizon} would be archived")
+        return
+    print(f"✅ Archived {rows:,} expenses in {months:,} user/months before {horizon}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Times the vectorized analytics computation (services/analytics_service.py)
+for users with 10^5 and more expenses. Runs on generated arrays, no database needed.
+
+Usage (from the project root):
+    python benchmarks/bench_analytics.py --sizes 100000 1000000 --categories 20
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from services.analytics_service import compute_expense_statistics
+
+
+def generate(size : int, categories : int, rng : np.random.Generator):
+    names = [f"category_{i}" for i in range(categories)]
+    codes = rng.integers(0, categories, size)
+    amounts = np.round(rng.lognormal(3.5, 0.8, size), 2)
+    dates = np.datetime64(date.today(), 'D') - rng.integers(0, 3 * 365, size).astype('timedelta64[D]')
+    ids = np.arange(1, size + 1, dtype=np.int64)
+    return names, codes, amounts, dates, ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    for size in args.sizes:
+        data = generate(size, args.categories, rng)
+        compute_expense_statistics(*data)  # warm up
+        timings = []
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            compute_expense_statistics(*data)
+            timings.append(time.perf_counter() - start)
+        print(f"{size:>10,} expenses  best {min(timings) * 1000:>8.1f} ms  "
+              f"median {sorted(timings)[len(timings) // 2] * 1000:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
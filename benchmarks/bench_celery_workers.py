@@ -0,0 +1,87 @@
+"""
+Measures Celery tasks/second per worker profile against a local Redis.
+
+For each profile a worker is started with that profile's pool / concurrency /
+prefetch settings (celery_app.WORKER_PROFILES), N tasks are queued, and the
+time until all of them finished is measured. I/O-bound tasks sleep (SMTP stand-in),
+CPU-bound tasks render report HTML.
+
+Usage (from the project root, Redis running locally):
+    python benchmarks/bench_celery_workers.py --redis-url redis://localhost:6379/15 --tasks 2000
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (label, CELERY_WORKER_PROFILE, extra env, workload)
+SCENARIOS = [
+    ("solo (old default), io", "", {"CELERY_WORKER_POOL" : "solo"}, "io"),
+    ("email profile (threads), io", "email", {}, "io"),
+    ("reports profile (prefork), io", "reports", {}, "io"),
+    ("solo (old default), cpu", "", {"CELERY_WORKER_POOL" : "solo"}, "cpu"),
+    ("email profile (threads), cpu", "email", {}, "cpu"),
+    ("reports profile (prefork), cpu", "reports", {}, "cpu"),
+]
+
+
+def run_scenario(label, profile, extra_env, workload, args) -> float:
+    env = dict(os.environ, REDIS_URL=args.redis_url, CELERY_WORKER_PROFILE=profile, **extra_env)
+    os.environ.update(REDIS_URL=args.redis_url)
+
+    # imported lazily so REDIS_URL is set before celery_app reads it
+    import redis
+    from celery_bench_tasks import io_task, cpu_task, COUNTER_KEY, celery_app
+
+    client = redis.Redis.from_url(args.redis_url)
+    client.flushdb()
+
+    worker = subprocess.Popen(
+        [sys.executable, "-m", "celery", "-A", "benchmarks.celery_bench_tasks.celery_app", "worker",
+         "-Q", "bench", "--loglevel=warning", "--without-gossip", "--without-mingle", "--without-heartbeat"],
+        cwd=ROOT, env=env
+    )
+    try:
+        time.sleep(args.startup_wait)
+        start = time.perf_counter()
+        for _ in range(args.tasks):
+            if workload == "io":
+                io_task.apply_async(args=(args.io_latency,), queue="bench")
+            else:
+                cpu_task.apply_async(args=(args.cpu_renders,), queue="bench")
+
+        deadline = start + args.timeout
+        while int(client.get(COUNTER_KEY) or 0) < args.tasks:
+            if time.perf_counter() > deadline:
+                print(f"{label:<34} timed out after {args.timeout}s")
+                return 0.0
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - start
+    finally:
+        worker.terminate()
+        worker.wait(timeout=30)
+
+    rate = args.tasks / elapsed
+    print(f"{label:<34} {rate:>9.1f} tasks/s  ({args.tasks} tasks in {elapsed:.2f}s)")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--io-latency", type=float, default=0.05, help="seconds each io task sleeps")
+    parser.add_argument("--cpu-renders", type=int, default=200, help="report renders per cpu task")
+    parser.add_argument("--startup-wait", type=float, default=3.0)
+    parser.add_argument("--timeout", type=float, default=600.0)
+    args = parser.parse_args()
+
+    for scenario in SCENARIOS:
+        run_scenario(*scenario, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Expense inserts/second with one transaction per request versus group commit
+(services.write_buffer), at 1, 10 and 100 concurrent clients.
+
+Each client inserts expenses back to back for --seconds, as its own seeded user
+(POS terminals posting for different accounts). The per-request path is the
+regular /new_expense statement, called directly without HTTP. Inserted rows are
+removed afterwards.
+
+Usage (from the project root, after benchmarks/seed.py):
+    python benchmarks/bench_group_commit.py --seconds 10 --max-rows 200 --max-delay-ms 5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The per-request path must not go through the app's own buffer
+os.environ["EXPENSE_GROUP_COMMIT"] = "false"
+
+from sqlalchemy import select, delete
+from database import AsyncSessionLocal, dispose_engines
+from models import User, Expense, Category
+from routers.expenses import create_expense, CreateExpenseRequest
+from services.write_buffer import ExpenseWriteBuffer
+
+MARKER = "group-commit-bench"
+
+
+async def load_users(prefix : str, count : int) -> list[dict]:
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(User.id, User.email, User.created_at, User.role)
+            .where(User.email.like(f"{prefix}\\_%@bench.local"))
+            .order_by(User.id)
+            .limit(count)
+        )
+        users = [dict(row) for row in result.mappings()]
+    if not users:
+        raise SystemExit(f"No '{prefix}' users found, run benchmarks/seed.py first.")
+    return users
+
+
+async def per_request_client(user : dict, deadline : float) -> int:
+    inserted = 0
+    request = CreateExpenseRequest(amount=12.5, category_name="bench-pos", description=MARKER)
+    while time.perf_counter() < deadline:
+        async with AsyncSessionLocal() as session:
+            await create_expense(request, user, session)
+        inserted += 1
+    return inserted
+
+
+async def group_commit_client(buffer : ExpenseWriteBuffer, user : dict, deadline : float) -> int:
+    inserted = 0
+    while time.perf_counter() < deadline:
+        await buffer.submit(user['id'], 12.5, "bench-pos", MARKER)
+        inserted += 1
+    return inserted
+
+
+async def run(label : str, clients : int, seconds : float, make_client) -> float:
+    deadline = time.perf_counter() + seconds
+    start = time.perf_counter()
+    counts = await asyncio.gather(*(make_client(i, deadline) for i in range(clients)))
+    rate = sum(counts) / (time.perf_counter() - start)
+    print(f"  {label:<14} {clients:>4} clients  {rate:>10,.0f} inserts/s")
+    return rate
+
+
+async def main(args):
+    users = await load_users(args.prefix, max(args.clients))
+    print(f"group commit: max_rows={args.max_rows}, max_delay_ms={args.max_delay_ms}\n")
+    try:
+        for clients in args.clients:
+            single = await run("per-request", clients, args.seconds,
+                               lambda i, deadline: per_request_client(users[i % len(users)], deadline))
+
+            buffer = ExpenseWriteBuffer(max_rows=args.max_rows, max_delay_ms=args.max_delay_ms)
+            grouped = await run("group commit", clients, args.seconds,
+                                lambda i, deadline: group_commit_client(buffer, users[i % len(users)], deadline))
+            await buffer.close()
+            batch = buffer.rows / buffer.batches if buffer.batches else 0
+            print(f"  {'':<14} speedup x{grouped / single:.1f}, {batch:.1f} rows per commit\n")
+    finally:
+        async with AsyncSessionLocal() as session:
+            await session.execute(delete(Expense).where(Expense.description == MARKER))
+            await session.execute(delete(Category).where(
+                Category.name == "bench-pos", Category.owner_id.in_([u['id'] for u in users])
+            ))
+            await session.commit()
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--max-rows", type=int, default=200)
+    parser.add_argument("--max-delay-ms", type=float, default=5.0)
+    parser.add_argument("--prefix", default="bench")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,188 @@
+"""
+Load test for GET /expenses/stream: holds many idle server-sent event streams open against
+one uvicorn worker and reports its memory per stream, checks that heartbeats keep them
+alive, how long one write takes to reach every stream of its user, and that the connection
+cap answers 503.
+
+Streams are spread over the users created by benchmarks/seed.py. Plain asyncio sockets are
+used on the client side, so 10k streams fit in one process; the open file limit is raised
+to its hard limit (raise that with `ulimit -Hn` if needed).
+
+Usage (from the project root, after benchmarks/seed.py):
+    python benchmarks/bench_idle_streams.py --streams 10000 --hold 30
+"""
+import argparse
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import httpx
+from routers.auth import create_access_token
+from run import load_users, wait_until_ready
+
+
+def rss_kb(pid : int) -> int:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+class Stream:
+    """One SSE connection; counts what it receives until closed."""
+
+    def __init__(self, token : str):
+        self.token = token
+        self.status = None
+        self.snapshots = 0
+        self.deltas = 0
+        self.heartbeats = 0
+        self.closed = False
+        self.delta_received = asyncio.Event()
+        self._writer = None
+
+    async def open(self, host : str, port : int) -> None:
+        reader, self._writer = await asyncio.open_connection(host, port)
+        self._writer.write(
+            f"GET /expenses/stream HTTP/1.1\r\nHost: {host}\r\nAuthorization: Bearer {self.token}\r\n"
+            f"Accept: text/event-stream\r\n\r\n".encode()
+        )
+        await self._writer.drain()
+        self.status = int((await reader.readline()).split()[1])
+        while (await reader.readline()) not in (b"\r\n", b""):
+            pass
+        if self.status == 200:
+            self._reader_task = asyncio.create_task(self._read(reader))
+        else:
+            self.close()
+
+    async def _read(self, reader) -> None:
+        # Chunked transfer framing lines are ignored; only SSE lines are counted
+        try:
+            while line := await reader.readline():
+                if line.startswith(b"event: snapshot"):
+                    self.snapshots += 1
+                elif line.startswith(b"event: delta"):
+                    self.deltas += 1
+                    self.delta_received.set()
+                elif line.startswith(b": keep-alive"):
+                    self.heartbeats += 1
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        self.closed = True
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+async def open_streams(tokens : list[str], count : int, host : str, port : int, concurrency : int) -> list[Stream]:
+    streams = [Stream(tokens[i % len(tokens)]) for i in range(count)]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def open_one(stream):
+        async with semaphore:
+            await stream.open(host, port)
+
+    await asyncio.gather(*(open_one(s) for s in streams))
+    return streams
+
+
+async def main(args):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    if hard < args.streams * 2 + 100:
+        raise SystemExit(f"Open file limit {hard} is too low for {args.streams} streams (client + server)")
+
+    users = load_users(args.prefix)[:args.users]
+    tokens = [create_access_token(u.email, u.id, u.created_at, u.role) for u in users]
+
+    env = {
+        **os.environ,
+        "STREAM_MAX_CONNECTIONS" : str(args.streams),
+        "STREAM_HEARTBEAT_SECONDS" : str(args.heartbeat),
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", args.host, "--port", str(args.port),
+         "--log-level", "warning", "--backlog", "4096"],
+        cwd=ROOT, env=env
+    )
+    failures = []
+    try:
+        base_url = f"http://{args.host}:{args.port}"
+        await wait_until_ready(base_url)
+        rss_before = rss_kb(server.pid)
+
+        start = time.perf_counter()
+        streams = await open_streams(tokens, args.streams, args.host, args.port, args.connect_concurrency)
+        opened = [s for s in streams if s.status == 200]
+        print(f"opened {len(opened):,}/{args.streams:,} streams in {time.perf_counter() - start:.1f}s "
+              f"over {len(tokens)} users")
+        if len(opened) < args.streams:
+            failures.append(f"{args.streams - len(opened)} streams were refused")
+
+        await asyncio.sleep(1)
+        rss_after = rss_kb(server.pid)
+        print(f"server RSS {rss_before / 1024:.0f} MiB -> {rss_after / 1024:.0f} MiB "
+              f"({(rss_after - rss_before) / max(len(opened), 1):.1f} KiB per stream)")
+
+        extra = Stream(tokens[0])
+        await extra.open(args.host, args.port)
+        print(f"stream {args.streams + 1:,} (over the cap): HTTP {extra.status}")
+        if extra.status != 503:
+            failures.append("the connection cap did not answer 503")
+
+        print(f"holding idle streams for {args.hold}s (heartbeat every {args.heartbeat}s)...")
+        await asyncio.sleep(args.hold)
+        alive = [s for s in opened if not s.closed]
+        with_heartbeat = [s for s in alive if s.heartbeats > 0]
+        print(f"{len(alive):,} still open, {len(with_heartbeat):,} received heartbeats")
+        if len(alive) < len(opened):
+            failures.append(f"{len(opened) - len(alive)} idle streams were closed")
+        if args.hold > args.heartbeat and len(with_heartbeat) < len(alive):
+            failures.append("some idle streams received no heartbeat")
+
+        # One write, delivered to every stream of its user
+        targets = [s for s in alive if s.token == tokens[0]]
+        async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as client:
+            start = time.perf_counter()
+            response = await client.post('/expenses/new_expense',
+                                         headers={'Authorization' : f"Bearer {tokens[0]}"},
+                                         json={'amount' : 1.0, 'category_name' : 'stream bench'})
+            try:
+                await asyncio.wait_for(asyncio.gather(*(s.delta_received.wait() for s in targets)), timeout=10)
+                print(f"write (HTTP {response.status_code}) reached {len(targets):,} streams of its user "
+                      f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+            except asyncio.TimeoutError:
+                received = sum(s.delta_received.is_set() for s in targets)
+                failures.append(f"delta reached only {received}/{len(targets)} streams within 10s")
+
+        for s in streams + [extra]:
+            s.close()
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=50, help="streams are spread over this many seeded users")
+    parser.add_argument("--prefix", default="bench", help="email prefix of the seeded users")
+    parser.add_argument("--hold", type=float, default=30, help="seconds the streams stay idle")
+    parser.add_argument("--heartbeat", type=float, default=10, help="STREAM_HEARTBEAT_SECONDS for the server")
+    parser.add_argument("--connect-concurrency", type=int, default=500)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8011)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,103 @@
+"""
+Compares loading a page of expenses as full ORM entities (selectinload) versus
+a column-projected JOIN, for page sizes 5, 50 and 500.
+
+Usage (from the project root, DATABASE_URL pointing at a seeded database):
+    python benchmarks/bench_read_projection.py --owner-id 1 --rounds 200
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from database import SessionLocal
+from models import Expense, Category
+
+PAGE_SIZES = (5, 50, 500)
+
+
+def load_orm(db, owner_id : int, limit : int):
+    expenses = db.execute(
+        select(Expense)
+        .options(selectinload(Expense.category))
+        .filter_by(owner_id=owner_id)
+        .order_by(Expense.date.desc())
+        .limit(limit)
+    ).scalars().all()
+    rows = [
+        {
+            "id" : e.id,
+            "amount" : e.amount,
+            "description" : e.description,
+            "category" : e.category.name if e.category else None,
+            "date" : e.date
+        } for e in expenses
+    ]
+    db.expunge_all()
+    return rows
+
+
+def load_projected(db, owner_id : int, limit : int):
+    result = db.execute(
+        select(
+            Expense.id,
+            Expense.amount,
+            Expense.description,
+            Category.name.label('category'),
+            Expense.date
+        )
+        .join(Category, Expense.category_id == Category.id)
+        .where(Expense.owner_id == owner_id)
+        .order_by(Expense.date.desc())
+        .limit(limit)
+    )
+    return [dict(row) for row in result.mappings()]
+
+
+def measure(fn, db, owner_id : int, limit : int, rounds : int) -> dict:
+    fn(db, owner_id, limit)  # warm up compiled cache + connection
+
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    for _ in range(rounds):
+        fn(db, owner_id, limit)
+    wall = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+
+    tracemalloc.start()
+    fn(db, owner_id, limit)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "wall_ms_per_call" : round(wall / rounds * 1000, 3),
+        "cpu_ms_per_call" : round(cpu / rounds * 1000, 3),
+        "peak_kib" : round(peak / 1024, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--owner-id", type=int, required=True)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print(f"{'page':>6} {'variant':>10} {'wall ms':>10} {'cpu ms':>10} {'peak KiB':>10}")
+        for limit in PAGE_SIZES:
+            for name, fn in (("orm", load_orm), ("projected", load_projected)):
+                stats = measure(fn, db, args.owner_id, limit, args.rounds)
+                print(f"{limit:>6} {name:>10} {stats['wall_ms_per_call']:>10} "
+                      f"{stats['cpu_ms_per_call']:>10} {stats['peak_kib']:>10}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
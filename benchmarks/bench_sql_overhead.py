@@ -0,0 +1,71 @@
+"""
+Per-request SQL overhead of the my_expenses read: statement rebuilt and
+compiled on every call (compiled cache disabled) versus the module-level
+statement served from the compiled cache.
+
+Usage (from the project root, DATABASE_URL pointing at a seeded database):
+    python benchmarks/bench_sql_overhead.py --owner-id 1 --rounds 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select
+from database import Engine
+from models import Expense, Category
+from routers.expenses import my_expenses_query, summary_query
+
+
+def rebuilt_query(owner_id : int):
+    return (
+        select(
+            Expense.id,
+            Expense.amount,
+            Expense.description,
+            Category.name.label('category'),
+            Expense.date
+        )
+        .join(Category, Expense.category_id == Category.id)
+        .where(Expense.owner_id == owner_id)
+        .order_by(Expense.date.desc())
+        .offset(0)
+        .limit(5)
+    )
+
+
+def run(label : str, conn, rounds : int, execute):
+    execute(conn)  # warm up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        execute(conn)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed / rounds * 1e6:>10.1f} us/request")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--owner-id", type=int, required=True)
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    params = {'owner_id' : args.owner_id, 'limit' : 5, 'offset' : 0}
+
+    with Engine.connect() as conn:
+        uncached = conn.execution_options(compiled_cache=None)
+        run("my_expenses rebuilt, no compiled cache", uncached, args.rounds,
+            lambda c: c.execute(rebuilt_query(args.owner_id)).all())
+        run("my_expenses rebuilt, compiled cache", conn, args.rounds,
+            lambda c: c.execute(rebuilt_query(args.owner_id)).all())
+        run("my_expenses module-level, compiled cache", conn, args.rounds,
+            lambda c: c.execute(my_expenses_query, params).all())
+        run("summary text(), no compiled cache", uncached, args.rounds,
+            lambda c: c.execute(summary_query, params).all())
+        run("summary text(), compiled cache", conn, args.rounds,
+            lambda c: c.execute(summary_query, params).all())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+CPU cost of getting a new access token: password login (bcrypt verify, POST /auth/token)
+versus refresh token rotation (SHA-256, POST /auth/refresh).
+
+Measures process CPU time of the token work each endpoint does in Python; the database
+round trips (one user lookup for login; token lookup, user lookup and insert for refresh)
+are left out. No connection is opened, but routers.auth imports the database module,
+so DATABASE_URL must be set as for the API.
+
+Usage (from the project root):
+    python benchmarks/bench_token_issuance.py --logins 50 --refreshes 5000
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def cpu_per_call(fn, calls : int) -> float:
+    start = time.process_time()
+    for _ in range(calls):
+        fn()
+    return (time.process_time() - start) / calls
+
+
+def main(args):
+    from routers.auth import create_access_token
+    from security import hash_password, verify_password, new_refresh_token, hash_refresh_token
+
+    password = "correct horse battery"
+    hashed_password = hash_password(password)
+    created_at = datetime.datetime.now(datetime.timezone.utc)
+    presented = new_refresh_token()
+
+    def password_login():
+        assert verify_password(password, hashed_password)
+        create_access_token("user@example.com", 1, created_at, "user")
+        hash_refresh_token(new_refresh_token())  # login also starts a refresh token family
+
+    def refresh():
+        hash_refresh_token(presented)  # lookup key of the presented token
+        create_access_token("user@example.com", 1, created_at, "user")
+        hash_refresh_token(new_refresh_token())
+
+    login_cpu = cpu_per_call(password_login, args.logins)
+    refresh_cpu = cpu_per_call(refresh, args.refreshes)
+
+    print(f"bcrypt hash: {hashed_password[:7]}... (cost {hashed_password.split('$')[2]})")
+    print(f"password login : {login_cpu * 1000:9.3f} ms CPU per token  ({args.logins} runs)")
+    print(f"refresh        : {refresh_cpu * 1000:9.3f} ms CPU per token  ({args.refreshes} runs)")
+    print(f"refresh is {login_cpu / refresh_cpu:,.0f}x cheaper; "
+          f"one core issues ~{1 / login_cpu:,.0f} logins/s vs ~{1 / refresh_cpu:,.0f} refreshes/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--refreshes", type=int, default=5000)
+    main(parser.parse_args())
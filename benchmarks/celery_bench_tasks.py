@@ -0,0 +1,32 @@
+"""
+Tasks used by bench_celery_workers.py. They run on the project's Celery app
+(same broker, serialization and worker profile settings) but touch neither
+the database nor SMTP. Each finished task increments a Redis counter.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import redis
+from celery_app import celery_app
+from services.report_service import build_monthly_report_html
+
+COUNTER_KEY = "bench:celery:done"
+_counter = redis.Redis.from_url(os.environ["REDIS_URL"])
+
+SUMMARY = [{"category" : f"category_{i}", "total" : 100.0 + i} for i in range(40)]
+
+
+@celery_app.task(name="bench.io_task", acks_late=True)
+def io_task(latency : float):
+    time.sleep(latency)  # stands in for an SMTP round trip
+    _counter.incr(COUNTER_KEY)
+
+
+@celery_app.task(name="bench.cpu_task", acks_late=True)
+def cpu_task(renders : int):
+    for _ in range(renders):
+        build_monthly_report_html(SUMMARY, 2026, 1)
+    _counter.incr(COUNTER_KEY)
@@ -0,0 +1,81 @@
+"""
+Checks read-replica routing: round-robin distribution, failover when a replica is
+down, and read-your-writes after a user's write.
+
+Any Postgres databases work as "replicas" for this check, e.g. two databases on one
+local server or two local instances; each read reports which database/port served it.
+
+Usage (from the project root):
+    python benchmarks/check_replica_routing.py \
+        --replicas postgresql://user:pw@localhost:5433/expenses,postgresql://user:pw@localhost:5434/expenses \
+        --dead-replica postgresql://user:pw@localhost:5999/expenses --reads 20
+"""
+import argparse
+import asyncio
+import os
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WHO_QUERY = "SELECT current_database() || '@' || coalesce(inet_server_port()::text, 'socket')"
+
+
+async def served_by(session) -> str:
+    from sqlalchemy import text
+    try:
+        return (await session.execute(text(WHO_QUERY))).scalar()
+    finally:
+        await session.close()
+
+
+async def main(args):
+    # database reads its configuration at import time
+    urls = [u for u in args.replicas.split(",") if u]
+    if args.dead_replica:
+        urls.insert(1, args.dead_replica)
+    os.environ["DATABASE_REPLICA_URLS"] = ",".join(urls)
+    os.environ.pop("CACHE_REDIS_URL", None)
+
+    from database import open_async_read_session, async_replicas, AsyncSessionLocal, dispose_engines
+    from services.cache import bump_user_version, wrote_recently
+
+    primary = await served_by(AsyncSessionLocal())
+    print(f"primary: {primary}")
+
+    served = Counter()
+    for _ in range(args.reads):
+        served[await served_by(await open_async_read_session())] += 1
+    print("\nreads by server:")
+    for server, count in served.most_common():
+        print(f"  {count:>5}  {server}{'  (primary)' if server == primary else ''}")
+    print("\nreplica status:")
+    for replica in async_replicas.status():
+        print(f"  {replica}")
+
+    bump_user_version(args.user_id)
+    after_write = await served_by(await open_async_read_session(use_primary = wrote_recently(args.user_id)))
+    print(f"\nread right after a write by user {args.user_id}: {after_write}")
+
+    failures = []
+    healthy = [r for r in async_replicas.status() if r["healthy"]]
+    if len(served) < min(len(healthy), args.reads):
+        failures.append("reads were not spread over all healthy replicas")
+    if args.dead_replica and async_replicas.status()[1]["healthy"]:
+        failures.append("dead replica was not marked down")
+    if after_write != primary:
+        failures.append("read-your-writes read did not go to the primary")
+
+    await dispose_engines()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replicas", required=True, help="comma separated replica URLs")
+    parser.add_argument("--dead-replica", help="URL of a server that is not running, to check failover")
+    parser.add_argument("--reads", type=int, default=20)
+    parser.add_argument("--user-id", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
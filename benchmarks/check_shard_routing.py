@@ -0,0 +1,109 @@
+"""
+Checks sharding by owner_id: how evenly the consistent-hash ring spreads users, how many
+users move when a shard is added, that a user's session lands on their shard, and that
+fan-out queries run on all shards concurrently.
+
+The ring checks need no database. For the routing checks any Postgres databases work as
+shards, e.g. several databases on one local server; each query reports which served it.
+Routing checks only query current_database()/pg_sleep, no schema is needed.
+
+Usage (from the project root):
+    python benchmarks/check_shard_routing.py --ring-shards 4 --users 100000
+    python benchmarks/check_shard_routing.py \
+        --shards postgresql://user:pw@localhost/shard0,postgresql://user:pw@localhost/shard1,postgresql://user:pw@localhost/shard2
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WHO_QUERY = "SELECT current_database() || '@' || coalesce(inet_server_port()::text, 'socket')"
+
+
+def check_ring(shard_count : int, users : int) -> list[str]:
+    from database import HashRing
+
+    ring = HashRing(shard_count)
+    placement = [ring.lookup(user_id) for user_id in range(1, users + 1)]
+    counts = Counter(placement)
+    mean = users / shard_count
+    print(f"{users:,} users over {shard_count} shards:")
+    for shard in range(shard_count):
+        print(f"  shard{shard}  {counts[shard]:>9,}  ({counts[shard] / mean:.2f}x mean)")
+
+    grown = HashRing(shard_count + 1)
+    moved = [(old, grown.lookup(user_id)) for user_id, old in enumerate(placement, start=1)
+             if grown.lookup(user_id) != old]
+    print(f"\nadding shard{shard_count}: {len(moved) / users:.1%} of users move "
+          f"(ideal {1 / (shard_count + 1):.1%})")
+
+    failures = []
+    if max(counts.values()) > 1.25 * mean:
+        failures.append("a shard holds more than 1.25x its share of users")
+    if any(new != shard_count for _, new in moved):
+        failures.append("users moved between existing shards")
+    return failures
+
+
+async def served_by(session) -> str:
+    from sqlalchemy import text
+    try:
+        return (await session.execute(text(WHO_QUERY))).scalar()
+    finally:
+        await session.close()
+
+
+async def check_routing(urls : str, users : int, sleep : float) -> list[str]:
+    # database reads its configuration at import time
+    os.environ["DATABASE_SHARD_URLS"] = urls
+    from sqlalchemy import text
+    from database import shards, dispose_engines
+
+    names = [await served_by(factory()) for factory in shards.async_session_factories]
+    print("\nshards:")
+    for index, name in enumerate(names):
+        print(f"  shard{index}  {name}")
+
+    failures = []
+    for user_id in range(1, users + 1):
+        served = await served_by(shards.async_session(user_id))
+        if served != names[shards.shard_for(user_id)]:
+            failures.append(f"user {user_id} was served by {served}, not shard{shards.shard_for(user_id)}")
+    print(f"\n{users} users routed to their shard: {'ok' if not failures else 'FAILED'}")
+
+    async def slow_query(session):
+        return (await session.execute(text("SELECT pg_sleep(:s)"), {"s" : sleep})).scalar()
+
+    start = time.perf_counter()
+    await shards.fan_out(slow_query)
+    elapsed = time.perf_counter() - start
+    print(f"fan-out of a {sleep}s query over {len(shards)} shards took {elapsed:.2f}s "
+          f"(sequential would be {sleep * len(shards):.2f}s)")
+    if len(shards) > 1 and elapsed > sleep * (len(shards) - 0.5):
+        failures.append("fan-out queries did not run concurrently")
+
+    await dispose_engines()
+    return failures
+
+
+def main(args):
+    failures = check_ring(args.ring_shards, args.users)
+    if args.shards:
+        failures += asyncio.run(check_routing(args.shards, args.routed_users, args.sleep))
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ring-shards", type=int, default=4, help="shard count for the ring checks")
+    parser.add_argument("--users", type=int, default=100_000, help="user ids placed on the ring")
+    parser.add_argument("--shards", help="comma separated shard URLs for the routing checks")
+    parser.add_argument("--routed-users", type=int, default=50)
+    parser.add_argument("--sleep", type=float, default=0.5, help="seconds each shard spends on the fan-out query")
+    main(parser.parse_args())
@@ -0,0 +1,99 @@
+"""
+Checks partition pruning on the monthly-partitioned expenses table: EXPLAINs the
+date-range queries of filter_expenses, the monthly report and the timeseries endpoint,
+and fails if a plan scans a partition outside the requested months.
+
+Usage (from the project root, after `alembic upgrade head` and seeding):
+    python benchmarks/explain_partition_pruning.py --owner-id 1 --year 2026 --month 3
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from database import Engine
+from services.search_service import expense_filter_conditions, build_filter_query, build_count_query
+from services.report_service import build_monthly_summary_query
+from services.timeseries_service import timeseries_query, next_period
+
+partitions_query = text("""
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'expenses'::regclass
+""")
+
+
+def scanned_relations(conn, query) -> set[str]:
+    # Inline the parameters so the planner prunes at plan time, as it does for real values
+    sql = str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + sql.replace("%", "%%")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    relations = set()
+    nodes = [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        if "Relation Name" in node:
+            relations.add(node["Relation Name"])
+        nodes.extend(node.get("Plans", []))
+    return relations
+
+
+def month_partitions(start_date : date, end_date : date) -> set[str]:
+    names = set()
+    current = start_date.replace(day=1)
+    while current <= end_date:
+        names.add(f"expenses_{current:%Y_%m}")
+        current = next_period(current, "month")
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--owner-id", type=int, required=True)
+    parser.add_argument("--year", type=int, default=date.today().year)
+    parser.add_argument("--month", type=int, default=date.today().month)
+    args = parser.parse_args()
+
+    start = date(args.year, args.month, 1)
+    end = next_period(start, "month") - timedelta(days=1)
+    conditions = expense_filter_conditions(args.owner_id, start, end)
+
+    cases = {
+        "filter_expenses page": build_filter_query(conditions, 51),
+        "filter_expenses count": build_count_query(conditions),
+        "monthly report summary": build_monthly_summary_query(args.owner_id, args.year, args.month),
+        "timeseries (daily)": timeseries_query.bindparams(
+            granularity="day", owner_id=args.owner_id, start_date=start, end_date=end, category=None
+        ),
+    }
+
+    failed = False
+    with Engine.connect() as conn:
+        all_partitions = {row.relname for row in conn.execute(partitions_query)}
+        if not all_partitions:
+            print("expenses is not partitioned (run `alembic upgrade head`)")
+            sys.exit(1)
+        # The default partition is only pruned when the range is fully covered by month partitions
+        allowed = (month_partitions(start, end) & all_partitions) or {"expenses_default"}
+
+        print(f"{len(all_partitions)} partitions, range {start} .. {end}\n")
+        for name, query in cases.items():
+            scanned = {r for r in scanned_relations(conn, query) if r in all_partitions}
+            unexpected = scanned - allowed
+            failed |= bool(unexpected)
+            status = "OK" if not unexpected else f"FAIL, also scans {sorted(unexpected)}"
+            print(f"  {name:<24} scans {len(scanned)}/{len(all_partitions)} partitions: {sorted(scanned)}  {status}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
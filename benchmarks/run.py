@@ -0,0 +1,267 @@
+"""
+Load test for the API. Drives the app either in-process (httpx ASGITransport)
+or through a real uvicorn server, and reports RPS and p50/p95/p99 latency per
+endpoint. Results are written as JSON and can be compared against a baseline run.
+
+Usage (from the project root, after benchmarks/seed.py):
+    python benchmarks/run.py --mode asgi --requests 500 --concurrency 20 --output results.json
+    python benchmarks/run.py --mode uvicorn --workers 4 --baseline results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# The token endpoint is rate limited per client IP, and every benchmark request comes from one IP
+os.environ.setdefault("AUTH_RATE_LIMIT", "1000000000")
+
+import httpx
+from sqlalchemy import select
+from database import Engine
+from models import User
+from routers.auth import create_access_token
+from seed import BENCH_PASSWORD
+
+
+class BenchContext:
+    def __init__(self, users : list, deep_offset : int):
+        self.users = users
+        self.deep_offset = deep_offset
+        self.tokens = {
+            u.id : create_access_token(u.email, u.id, u.created_at, u.role) for u in users
+        }
+        self.etags = {}  # last ETag per (url, params, user) for the *_poll endpoints
+
+    def pick(self):
+        user = random.choice(self.users)
+        return user, {'Authorization' : f"Bearer {self.tokens[user.id]}"}
+
+
+def my_expenses_deep(ctx):
+    user, headers = ctx.pick()
+    return 'GET', '/expenses/my_expenses', {
+        'headers' : headers, 'params' : {'limit' : 50, 'offset' : ctx.deep_offset}
+    }
+
+def filter_expenses(ctx):
+    user, headers = ctx.pick()
+    return 'GET', '/expenses/filter_expenses', {
+        'headers' : headers, 'params' : {'start_date' : '2000-01-01', 'end_date' : '2100-01-01', 'limit' : 50}
+    }
+
+def summary(ctx):
+    user, headers = ctx.pick()
+    return 'GET', '/expenses/summary', {'headers' : headers}
+
+def top_categories(ctx):
+    user, headers = ctx.pick()
+    return 'GET', '/expenses/top_categories', {'headers' : headers, 'params' : {'top_limit' : 5}}
+
+def new_expense(ctx):
+    user, headers = ctx.pick()
+    return 'POST', '/expenses/new_expense', {
+        'headers' : headers,
+        'json' : {'amount' : 12.5, 'category_name' : 'category_0', 'description' : 'bench insert'}
+    }
+
+def conditional(build_request):
+    """Same request as build_request, revalidated with the ETag of its last response (client polling)."""
+    def build(ctx):
+        method, url, kwargs = build_request(ctx)
+        etag = ctx.etags.get(etag_key(url, kwargs))
+        if etag:
+            kwargs['headers'] = {**kwargs['headers'], 'If-None-Match' : etag}
+        return method, url, kwargs
+    return build
+
+def etag_key(url : str, kwargs : dict) -> tuple:
+    return url, str(kwargs.get('params')), kwargs.get('headers', {}).get('Authorization')
+
+def token(ctx):
+    user, _ = ctx.pick()
+    return 'POST', '/auth/token', {'data' : {'username' : user.email, 'password' : BENCH_PASSWORD}}
+
+
+ENDPOINTS = {
+    'my_expenses_deep' : my_expenses_deep,
+    'filter_expenses' : filter_expenses,
+    'summary' : summary,
+    'top_categories' : top_categories,
+    'new_expense' : new_expense,
+    'token' : token,
+    'my_expenses_poll' : conditional(my_expenses_deep),
+    'summary_poll' : conditional(summary),
+    'top_categories_poll' : conditional(top_categories),
+}
+
+
+def load_users(prefix : str) -> list:
+    with Engine.connect() as conn:
+        users = conn.execute(
+            select(User.id, User.email, User.created_at, User.role)
+            .where(User.email.like(f"{prefix}\\_%@bench.local"))
+        ).all()
+    if not users:
+        raise SystemExit(f"No '{prefix}' users found, run benchmarks/seed.py first.")
+    return users
+
+
+def percentile(quantiles : list, p : int) -> float:
+    return round(quantiles[p - 1] * 1000, 3)
+
+
+async def bench_endpoint(client, ctx, build_request, total : int, concurrency : int) -> dict:
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            method, url, kwargs = build_request(ctx)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                if response.status_code >= 400:
+                    errors += 1
+                elif 'etag' in response.headers:
+                    ctx.etags[etag_key(url, kwargs)] = response.headers['etag']
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        'requests' : len(latencies),
+        'errors' : errors,
+        'rps' : round(len(latencies) / elapsed, 2),
+        'p50_ms' : percentile(quantiles, 50),
+        'p95_ms' : percentile(quantiles, 95),
+        'p99_ms' : percentile(quantiles, 99),
+    }
+
+
+async def run_all(client, ctx, endpoints : list, total : int, concurrency : int) -> dict:
+    results = {}
+    for name in endpoints:
+        # Warm up connections and statement caches outside the measurement
+        await bench_endpoint(client, ctx, ENDPOINTS[name], min(total, concurrency * 2), concurrency)
+        results[name] = await bench_endpoint(client, ctx, ENDPOINTS[name], total, concurrency)
+        r = results[name]
+        print(f"{name:<18} {r['rps']:>9} rps  p50 {r['p50_ms']:>8} ms  p95 {r['p95_ms']:>8} ms  "
+              f"p99 {r['p99_ms']:>8} ms  errors {r['errors']}")
+    return results
+
+
+async def run_asgi(ctx, args) -> dict:
+    from main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return await run_all(client, ctx, args.endpoints, args.requests, args.concurrency)
+
+
+async def wait_until_ready(base_url : str, timeout : float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get('/ping-db')).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+    raise SystemExit("uvicorn did not become ready in time")
+
+
+async def run_uvicorn(ctx, args) -> dict:
+    base_url = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(args.port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=ROOT
+    )
+    try:
+        await wait_until_ready(base_url)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+            return await run_all(client, ctx, args.endpoints, args.requests, args.concurrency)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def compare(results : dict, baseline_path : str, threshold : float) -> bool:
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+
+    regressed = False
+    print(f"\nCompared to {baseline_path}:")
+    for name, current in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        rps_delta = (current['rps'] - before['rps']) / before['rps'] * 100 if before['rps'] else 0.0
+        p95_delta = (current['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0.0
+        flag = ""
+        if rps_delta < -threshold or p95_delta > threshold:
+            regressed = True
+            flag = "  <-- regression"
+        print(f"{name:<18} rps {rps_delta:+7.1f}%  p95 {p95_delta:+7.1f}%{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--endpoints", nargs="+", choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--deep-offset", type=int, default=1000, help="offset used for my_expenses_deep")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--prefix", default="bench", help="seeded user prefix")
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--baseline", help="previous results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed regression in percent")
+    args = parser.parse_args()
+
+    ctx = BenchContext(load_users(args.prefix), args.deep_offset)
+    runner = run_asgi if args.mode == "asgi" else run_uvicorn
+    results = asyncio.run(runner(ctx, args))
+
+    with open(args.output, "w") as f:
+        json.dump({
+            'meta' : {
+                'mode' : args.mode,
+                'workers' : args.workers,
+                'requests' : args.requests,
+                'concurrency' : args.concurrency,
+                'users' : len(ctx.users),
+                'python' : platform.python_version(),
+                'timestamp' : time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+            'results' : results
+        }, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline and compare(results, args.baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
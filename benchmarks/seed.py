@@ -0,0 +1,152 @@
+"""
+Seeds the database behind DATABASE_URL with benchmark users, categories and expenses.
+With DATABASE_SHARD_URLS set, users go to DATABASE_URL (the user directory) and each
+user's categories and expenses to their shard, next to a copy of the user row.
+
+Every seeded user gets the password BENCH_PASSWORD and an email of the form
+'<prefix>_<n>@bench.local', so run.py can find them again.
+
+The schema must be migrated first (`alembic upgrade head`, on every shard); the script refuses
+to run otherwise.
+
+Usage (from the project root):
+    python benchmarks/seed.py --users 50 --categories 8 --expenses 2000 --seed 42
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import insert, delete, select
+from database import Engine, shards
+from models import User, Category, Expense
+from security import hash_password
+from services.partition_service import ensure_expense_partitions
+
+BENCH_PASSWORD = "bench-password"
+BATCH_SIZE = 10_000
+
+
+def bench_email(prefix : str, n : int) -> str:
+    return f"{prefix}_{n}@bench.local"
+
+
+def require_migrated_schema(conn):
+    # create_all would build unpartitioned tables without the migrations' indexes and constraints
+    head = ScriptDirectory.from_config(Config(os.path.join(ROOT, "alembic.ini"))).get_current_head()
+    current = MigrationContext.configure(conn).get_current_revision()
+    if current != head:
+        raise SystemExit(f"Database is at revision {current}, not {head}: run `alembic upgrade head` first")
+
+
+def clear_previous(conn, prefix : str):
+    user_ids = select(User.id).where(User.email.like(f"{prefix}\\_%@bench.local"))
+    conn.execute(delete(Expense).where(Expense.owner_id.in_(user_ids)))
+    conn.execute(delete(Category).where(Category.owner_id.in_(user_ids)))
+    conn.execute(delete(User).where(User.id.in_(user_ids)))
+
+
+def seed(users : int, categories : int, expenses : int, days : int, prefix : str, seed_value : int):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    hashed = hash_password(BENCH_PASSWORD)  # bcrypt once, shared by all users
+
+    user_rows = [
+        {'email' : bench_email(prefix, n), 'hashed_password' : hashed, 'role' : 'user',
+         'created_at' : now, 'updated_at' : now}
+        for n in range(users)
+    ]
+    with Engine.begin() as conn:
+        require_migrated_schema(conn)
+        clear_previous(conn, prefix)
+        user_ids = [row.id for row in conn.execute(
+            insert(User).returning(User.id, sort_by_parameter_order=True), user_rows
+        ).all()]
+
+    # One random stream per user, so the data doesn't depend on how users spread over shards
+    by_shard = {}
+    for n, uid in enumerate(user_ids):
+        by_shard.setdefault(shards.shard_for(uid), []).append((n, uid))
+
+    for index, factory in enumerate(shards.session_factories):
+        shard_engine = factory.kw["bind"]
+        with shard_engine.begin() as conn:
+            shard_users = by_shard.get(index, [])
+            if shard_engine is not Engine:
+                require_migrated_schema(conn)
+                clear_previous(conn, prefix)
+                if shard_users:
+                    # Expenses and categories reference the user row: copy it, without the password
+                    conn.execute(insert(User), [
+                        {**user_rows[n], 'id' : uid, 'hashed_password' : ''} for n, uid in shard_users
+                    ])
+            if shard_users:
+                seed_expenses(conn, shard_users, categories, expenses, days, seed_value, now)
+
+    return user_ids
+
+
+def seed_expenses(conn, shard_users : list[tuple[int, int]], categories : int, expenses : int,
+                  days : int, seed_value : int, now : datetime.datetime):
+    today = now.date()
+    # Monthly partitions for the seeded history, otherwise old rows land in expenses_default
+    ensure_expense_partitions(conn, today - datetime.timedelta(days=days), today)
+
+    category_rows = conn.execute(
+        insert(Category).returning(Category.id, Category.owner_id, sort_by_parameter_order=True),
+        [
+            {'name' : f"category_{c}", 'owner_id' : uid, 'created_at' : now, 'updated_at' : now}
+            for _, uid in shard_users for c in range(categories)
+        ]
+    ).all()
+    categories_by_user = {}
+    for row in category_rows:
+        categories_by_user.setdefault(row.owner_id, []).append(row.id)
+
+    batch = []
+    for n, uid in shard_users:
+        rng = random.Random(f"{seed_value}:{n}")
+        user_categories = categories_by_user[uid]
+        for _ in range(expenses):
+            batch.append({
+                'amount' : round(rng.lognormvariate(3.5, 1.0), 2),
+                'description' : f"bench expense {rng.randrange(1_000_000)}",
+                'date' : today - datetime.timedelta(days=rng.randrange(days)),
+                'created_at' : now,
+                'updated_at' : now,
+                'category_id' : rng.choice(user_categories),
+                'owner_id' : uid
+            })
+            if len(batch) >= BATCH_SIZE:
+                conn.execute(insert(Expense), batch)
+                batch = []
+    if batch:
+        conn.execute(insert(Expense), batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--categories", type=int, default=8, help="categories per user")
+    parser.add_argument("--expenses", type=int, default=2000, help="expenses per user")
+    parser.add_argument("--days", type=int, default=730, help="spread expense dates over this many past days")
+    parser.add_argument("--prefix", default="bench")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    user_ids = seed(args.users, args.categories, args.expenses, args.days, args.prefix, args.seed)
+    elapsed = time.perf_counter() - start
+    print(f"Seeded {len(user_ids)} users x {args.categories} categories x {args.expenses} expenses "
+          f"in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import os
 import ssl
 from celery import Celery
+from celery.schedules import crontab
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,14 +12,80 @@ celery_app = Celery(
     'expense_tracker',
     broker=REDIS_URL,
     backend=REDIS_URL,
-    include=['tasks.email_tasks']
+    include=[
+        'tasks.email_tasks',
+        'tasks.report_tasks',
+        'tasks.partition_tasks',
+        'tasks.archive_tasks',
+        'tasks.account_tasks',
+        'tasks.category_tasks'
+    ]
 )
 
-celery_app.conf.broker_use_ssl = {"ssl_cert_reqs":"ssl.CERT_NONE"}
-celery_app.conf.redis_backend_use_ssl = {"ssl_cert_reqs":"ssl.CERT_NONE"}
+# TLS only for rediss:// (Upstash); a local redis:// broker has no TLS
+if REDIS_URL and REDIS_URL.startswith("rediss://"):
+    celery_app.conf.broker_use_ssl = {"ssl_cert_reqs": ssl.CERT_NONE}
+    celery_app.conf.redis_backend_use_ssl = {"ssl_cert_reqs": ssl.CERT_NONE}
 
 celery_app.conf.update(
     task_track_started=True,
-    result_expires=3600
+    result_expires=3600,
+    # Report/email tasks are fire-and-forget: nobody reads their return value.
+    # Tasks whose state is polled opt back in with ignore_result=False.
+    task_ignore_result=True,
+    task_default_queue='default',
+    # CPU-bound report computation and I/O-bound email sending go to separate queues,
+    # so each can be consumed by a worker with a suitable pool
+    task_routes={
+        'tasks.email_tasks.compute_monthly_report' : {'queue' : 'reports'},
+        'tasks.report_tasks.*' : {'queue' : 'reports'},
+        'tasks.partition_tasks.*' : {'queue' : 'reports'},
+        'tasks.archive_tasks.*' : {'queue' : 'reports'},
+        'tasks.email_tasks.email_monthly_report' : {'queue' : 'email'},
+    }
 )
 
+# Worker profiles, picked with CELERY_WORKER_PROFILE (see docker-compose.yml):
+#   reports - prefork, one process per CPU, prefetch 1: long acks_late tasks don't hold
+#             messages another process could run
+#   email   - thread pool, many concurrent SMTP sessions, small prefetch per thread
+# CELERY_WORKER_POOL / CELERY_WORKER_CONCURRENCY / CELERY_PREFETCH_MULTIPLIER override a profile
+# (e.g. CELERY_WORKER_POOL=gevent when gevent is installed).
+WORKER_PROFILES = {
+    'reports' : {'worker_pool' : 'prefork', 'worker_concurrency' : os.cpu_count() or 2, 'worker_prefetch_multiplier' : 1},
+    'email' : {'worker_pool' : 'threads', 'worker_concurrency' : 50, 'worker_prefetch_multiplier' : 4},
+}
+
+worker_profile = dict(WORKER_PROFILES.get(os.getenv('CELERY_WORKER_PROFILE', ''), {}))
+if os.getenv('CELERY_WORKER_POOL'):
+    worker_profile['worker_pool'] = os.getenv('CELERY_WORKER_POOL')
+if os.getenv('CELERY_WORKER_CONCURRENCY'):
+    worker_profile['worker_concurrency'] = int(os.getenv('CELERY_WORKER_CONCURRENCY'))
+if os.getenv('CELERY_PREFETCH_MULTIPLIER'):
+    worker_profile['worker_prefetch_multiplier'] = int(os.getenv('CELERY_PREFETCH_MULTIPLIER'))
+worker_profile.setdefault('worker_prefetch_multiplier', 1)
+celery_app.conf.update(**worker_profile)
+
+# Month-end reports: on the 1st at 02:00 UTC, for the month that just ended
+celery_app.conf.timezone = 'UTC'
+celery_app.conf.beat_schedule = {
+    'monthly-expense-reports' : {
+        'task' : 'tasks.report_tasks.schedule_previous_month_reports',
+        'schedule' : crontab(minute=0, hour=2, day_of_month=1)
+    },
+    # Future monthly partitions of expenses (see migration a3c5d8e1f027)
+    'create-expense-partitions' : {
+        'task' : 'tasks.partition_tasks.create_future_expense_partitions',
+        'schedule' : crontab(minute=30, hour=1)
+    },
+    # Cold expenses to archive files (services.archive_service), after the month-end reports
+    'archive-old-expenses' : {
+        'task' : 'tasks.archive_tasks.archive_old_expenses_task',
+        'schedule' : crontab(minute=0, hour=4, day_of_month=2)
+    },
+    # Expired refresh tokens (services.token_service)
+    'purge-expired-refresh-tokens' : {
+        'task' : 'tasks.account_tasks.purge_expired_refresh_tokens_task',
+        'schedule' : crontab(minute=15, hour=3)
+    }
+}
@@ -2,4 +2,5 @@ from datetime import timedelta
 
 SECRET_KEY = '1713d846059da6c14e2f570d3ec285c5ee099336db8092cf8ad848536aa351ae'
 ALGORITHM = 'HS256'
-ACCESS_TOKEN_EXPIRES_MINUTES = timedelta(minutes=30)
\ No newline at end of file
+ACCESS_TOKEN_EXPIRES_MINUTES = timedelta(minutes=30)
+REFRESH_TOKEN_EXPIRES = timedelta(days=30)
@@ -1,11 +1,24 @@
 import os
-from sqlalchemy import create_engine
+import asyncio
+import bisect
+import hashlib
+import itertools
+import logging
+import threading
+import time
+from typing import Awaitable, Callable
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.engine import Engine as SQLAlchemyEngine
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 
 SQLALCHEMY_DATABASE_URL =os.getenv("DATABASE_URL")
 
@@ -21,11 +34,21 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=Engine)
 
 #-------------------------- ASYNC DATABASE SETUP --------------------------
 
-ASYNC_SQLALCHEMY_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
+def to_async_url(url : str) -> str:
+    return url.replace("postgresql://", "postgresql+asyncpg://")
+
+ASYNC_SQLALCHEMY_DATABASE_URL = to_async_url(SQLALCHEMY_DATABASE_URL)
+
+# Compiled SQL cache (SQLAlchemy, per engine) and server-side prepared statements (asyncpg, per connection)
+DB_QUERY_CACHE_SIZE = int(os.getenv("DB_QUERY_CACHE_SIZE", 500))
+DB_PREPARED_STATEMENT_CACHE_SIZE = int(os.getenv("DB_PREPARED_STATEMENT_CACHE_SIZE", 500))
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
 
 async_engine = create_async_engine(
     ASYNC_SQLALCHEMY_DATABASE_URL,
-    echo=True # Logs SQL queries
+    echo=DB_ECHO, # Logs SQL queries
+    query_cache_size=DB_QUERY_CACHE_SIZE,
+    connect_args={"prepared_statement_cache_size": DB_PREPARED_STATEMENT_CACHE_SIZE}
 )
 
 AsyncSessionLocal = sessionmaker(
@@ -39,5 +62,264 @@ AsyncSessionLocal = sessionmaker(
 Base = declarative_base()
 
 
+#-------------------------- READ REPLICAS --------------------------
+
+# Comma separated replica URLs (same format as DATABASE_URL). Without replicas every
+# read goes to the primary. A replica that fails its connection check is skipped for
+# DB_REPLICA_RETRY_SECONDS, then tried again.
+DATABASE_REPLICA_URLS = [
+    url.strip().replace("postgres://", "postgresql://", 1)
+    for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+]
+DB_REPLICA_RETRY_SECONDS = float(os.getenv("DB_REPLICA_RETRY_SECONDS", 30))
+DB_REPLICA_CONNECT_TIMEOUT = int(os.getenv("DB_REPLICA_CONNECT_TIMEOUT", 2))
+
+
+class ReplicaSet:
+    """Round-robin over replica session factories, skipping replicas marked down."""
+
+    def __init__(self, urls : list[str], session_factories : list):
+        self.urls = urls
+        self.session_factories = session_factories
+        self._counter = itertools.count()
+        self._down_until : dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def __bool__(self) -> bool:
+        return bool(self.session_factories)
+
+    def candidates(self) -> list[int]:
+        """Healthy replica indexes, starting at the next one in round-robin order."""
+        n = len(self.session_factories)
+        if n == 0:
+            return []
+        start = next(self._counter) % n
+        now = time.monotonic()
+        return [
+            i for i in ((start + offset) % n for offset in range(n))
+            if self._down_until.get(i, 0) <= now
+        ]
+
+    def mark_down(self, index : int, error : Exception) -> None:
+        with self._lock:
+            self._down_until[index] = time.monotonic() + DB_REPLICA_RETRY_SECONDS
+        logger.warning(f"Read replica {index} unavailable, using others for {DB_REPLICA_RETRY_SECONDS}s: {error}")
+
+    def mark_up(self, index : int) -> None:
+        if index in self._down_until:
+            with self._lock:
+                self._down_until.pop(index, None)
+
+    def status(self) -> list[dict]:
+        now = time.monotonic()
+        return [
+            {
+                "replica" : i,
+                "host" : self.urls[i].rsplit("@", 1)[-1],   # no credentials
+                "healthy" : self._down_until.get(i, 0) <= now
+            } for i in range(len(self.urls))
+        ]
+
+
+# pool_pre_ping validates pooled connections, so a replica that went away fails the check below
+replicas = ReplicaSet(DATABASE_REPLICA_URLS, [
+    sessionmaker(
+        bind = create_engine(url, pool_pre_ping=True, connect_args={"connect_timeout" : DB_REPLICA_CONNECT_TIMEOUT}),
+        autocommit=False,
+        autoflush=False
+    ) for url in DATABASE_REPLICA_URLS
+])
+
+async_replicas = ReplicaSet(DATABASE_REPLICA_URLS, [
+    sessionmaker(
+        bind = create_async_engine(
+            to_async_url(url),
+            echo=DB_ECHO,
+            pool_pre_ping=True,
+            query_cache_size=DB_QUERY_CACHE_SIZE,
+            connect_args={
+                "prepared_statement_cache_size": DB_PREPARED_STATEMENT_CACHE_SIZE,
+                "timeout": DB_REPLICA_CONNECT_TIMEOUT
+            }
+        ),
+        class_ = AsyncSession,
+        expire_on_commit = False,
+        autoflush=False,
+        autocommit=False
+    ) for url in DATABASE_REPLICA_URLS
+])
+
+
+def open_read_session(use_primary : bool = False):
+    """
+    Session for read-only work: the next healthy replica, or the primary when there
+    are no (healthy) replicas or use_primary is set (read-your-writes).
+    """
+    if not use_primary:
+        for index in replicas.candidates():
+            session = replicas.session_factories[index]()
+            try:
+                session.connection()
+            except (DBAPIError, OSError) as e:
+                session.close()
+                replicas.mark_down(index, e)
+                continue
+            replicas.mark_up(index)
+            return session
+    return SessionLocal()
+
+
+async def open_async_read_session(use_primary : bool = False) -> AsyncSession:
+    """Async variant of open_read_session."""
+    if not use_primary:
+        for index in async_replicas.candidates():
+            session = async_replicas.session_factories[index]()
+            try:
+                await session.connection()
+            except (DBAPIError, OSError, asyncio.TimeoutError) as e:
+                await session.close()
+                async_replicas.mark_down(index, e)
+                continue
+            async_replicas.mark_up(index)
+            return session
+    return AsyncSessionLocal()
+
+
+#-------------------------- SHARDING --------------------------
+
+# Comma separated shard URLs (same format as DATABASE_URL). A user's expenses, categories,
+# report snapshots and archives live on the shard picked by consistent hashing of the user id;
+# every shard carries the full schema (run the Alembic migrations against each one).
+# DATABASE_URL stays the user directory (login, user ids, report runs) and may be listed as a
+# shard itself. Without shards, DATABASE_URL is the only shard.
+# Shards are named by position: append new ones at the end, then only ~1/N of the users map
+# to a different shard (their rows must be moved before the new list is deployed).
+DATABASE_SHARD_URLS = [
+    url.strip().replace("postgres://", "postgresql://", 1)
+    for url in os.getenv("DATABASE_SHARD_URLS", "").split(",") if url.strip()
+]
+DB_SHARD_VIRTUAL_NODES = int(os.getenv("DB_SHARD_VIRTUAL_NODES", 128))
+
+
+class HashRing:
+    """Consistent hashing of user ids onto shard indexes, with virtual nodes per shard."""
+
+    def __init__(self, shard_count : int, virtual_nodes : int = DB_SHARD_VIRTUAL_NODES):
+        points = sorted(
+            (self._hash(f"shard{index}#{vnode}"), index)
+            for index in range(shard_count) for vnode in range(virtual_nodes)
+        )
+        self._hashes = [h for h, _ in points]
+        self._shards = [index for _, index in points]
+
+    @staticmethod
+    def _hash(key : str) -> int:
+        # Stable across processes, unlike hash()
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+    def lookup(self, owner_id : int) -> int:
+        position = bisect.bisect(self._hashes, self._hash(str(owner_id))) % len(self._hashes)
+        return self._shards[position]
+
+
+class ShardSet:
+    """Sync and async session factories per shard, and the ring that routes user ids to them."""
+
+    def __init__(self, urls : list[str]):
+        self.sharded = bool(urls)
+        self.urls = urls or [SQLALCHEMY_DATABASE_URL]
+        self.ring = HashRing(len(self.urls))
+        self.session_factories = []
+        self.async_session_factories = []
+        for url in self.urls:
+            if url == SQLALCHEMY_DATABASE_URL:
+                # Same database as the primary: share its pools
+                self.session_factories.append(SessionLocal)
+                self.async_session_factories.append(AsyncSessionLocal)
+                continue
+            self.session_factories.append(sessionmaker(bind=create_engine(url), autocommit=False, autoflush=False))
+            self.async_session_factories.append(sessionmaker(
+                bind = create_async_engine(
+                    to_async_url(url),
+                    echo=DB_ECHO,
+                    query_cache_size=DB_QUERY_CACHE_SIZE,
+                    connect_args={"prepared_statement_cache_size": DB_PREPARED_STATEMENT_CACHE_SIZE}
+                ),
+                class_ = AsyncSession,
+                expire_on_commit = False,
+                autoflush=False,
+                autocommit=False
+            ))
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+    def shard_for(self, owner_id : int) -> int:
+        return self.ring.lookup(owner_id) if self.sharded else 0
+
+    def session(self, owner_id : int):
+        return self.session_factories[self.shard_for(owner_id)]()
+
+    def async_session(self, owner_id : int) -> AsyncSession:
+        return self.async_session_factories[self.shard_for(owner_id)]()
+
+    async def fan_out(self, query : Callable[[AsyncSession], Awaitable], read_only : bool = True) -> list:
+        """
+        Runs query(session) on every shard concurrently and returns the results in shard order.
+        Unsharded, a read-only query goes to a replica like any other read.
+        """
+        async def run(index : int):
+            if read_only and not self.sharded:
+                session = await open_async_read_session()
+            else:
+                session = self.async_session_factories[index]()
+            try:
+                return await query(session)
+            finally:
+                await session.close()
+
+        return list(await asyncio.gather(*(run(index) for index in range(len(self.urls)))))
+
+    def status(self) -> list[dict]:
+        return [
+            {"shard" : i, "host" : url.rsplit("@", 1)[-1]}   # no credentials
+            for i, url in enumerate(self.urls)
+        ]
+
+
+shards = ShardSet(DATABASE_SHARD_URLS)
+
+
+async def dispose_engines() -> None:
+    await async_engine.dispose()
+    for factory in async_replicas.session_factories:
+        await factory.kw["bind"].dispose()
+    for factory in shards.async_session_factories:
+        if factory is not AsyncSessionLocal:
+            await factory.kw["bind"].dispose()
+
+
+#-------------------------- SQL CACHE STATISTICS --------------------------
+
+# Counted over every engine (primary, replicas, shards; sync and async) by listening on the class
+SQL_CACHE_STATS = {"hits": 0, "misses": 0, "uncached": 0}
+
+@event.listens_for(SQLAlchemyEngine, "before_cursor_execute")
+def _count_compiled_cache_usage(conn, cursor, statement, parameters, context, executemany):
+    cache_hit = getattr(context, "cache_hit", None)
+    if cache_hit is CACHE_HIT:
+        SQL_CACHE_STATS["hits"] += 1
+    elif cache_hit is CACHE_MISS:
+        SQL_CACHE_STATS["misses"] += 1
+    else:
+        SQL_CACHE_STATS["uncached"] += 1
 
 
+def get_sql_cache_stats() -> dict:
+    cached = SQL_CACHE_STATS["hits"] + SQL_CACHE_STATS["misses"]
+    return {
+        **SQL_CACHE_STATS,
+        "hit_ratio": round(SQL_CACHE_STATS["hits"] / cached, 4) if cached else None,
+        "query_cache_size": DB_QUERY_CACHE_SIZE,
+        "prepared_statement_cache_size": DB_PREPARED_STATEMENT_CACHE_SIZE
+    }
@@ -1,13 +1,17 @@
+import hashlib
 from typing import Annotated
 from datetime import datetime
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Request, Response
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from starlette import status
-from database import SessionLocal, AsyncSessionLocal
+from database import SessionLocal, AsyncSessionLocal, replicas, async_replicas, shards, open_read_session, open_async_read_session
 from config import SECRET_KEY, ALGORITHM
+from services.cache import wrote_recently, wrote_recently_async
+from services.live_updates import get_summary_version
+from services.account_service import is_account_deleted
 
 
 def get_db():
@@ -24,7 +28,7 @@ async def get_async_db():
 
 
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl='auth/token')
-def get_current_user(token : Annotated[str, Depends(oauth2_bearer)]):
+def get_token_user(token : Annotated[str, Depends(oauth2_bearer)]):
     try:
         payload = jwt.decode(token, SECRET_KEY, ALGORITHM)
         user_name : str = payload.get('email')
@@ -40,6 +44,89 @@ def get_current_user(token : Annotated[str, Depends(oauth2_bearer)]):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid User')
 
 
+# The token's user even if the account is being deleted: only for following that deletion
+token_user_dependency = Annotated[dict, Depends(get_token_user)]
+
+def get_current_user(user : token_user_dependency):
+    # Tokens issued before an account deletion stop working (services.account_service)
+    if is_account_deleted(user.get('id')):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid User')
+    return user
+
+
 db_dependency = Annotated[Session, Depends(get_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
-async_db_dependency = Annotated[AsyncSession, Depends(get_async_db)]
\ No newline at end of file
+async_db_dependency = Annotated[AsyncSession, Depends(get_async_db)]
+
+
+# Routes working on one user's expenses/categories: a session on that user's shard
+# (the primary when DATABASE_SHARD_URLS is not set)
+def get_shard_db(user : user_dependency):
+    db = shards.session(user.get('id'))
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_shard_db(user : user_dependency):
+    async with shards.async_session(user.get('id')) as session:
+        yield session
+
+
+# Read-only routes: a replica session, or the primary if the user wrote within the
+# read-your-writes window (or no replica is configured/healthy).
+# Replicas belong to the unsharded primary; with shards, reads go to the user's shard.
+def get_read_db(user : user_dependency):
+    if shards.sharded:
+        db = shards.session(user.get('id'))
+    else:
+        db = open_read_session(use_primary = bool(replicas) and wrote_recently(user.get('id')))
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def open_user_read_session(user_id : int) -> AsyncSession:
+    """For code that needs a read session outside the request scope (e.g. streamed responses)."""
+    if shards.sharded:
+        return shards.async_session(user_id)
+    return await open_async_read_session(use_primary = bool(async_replicas) and await wrote_recently_async(user_id))
+
+async def get_async_read_db(user : user_dependency):
+    session = await open_user_read_session(user.get('id'))
+    try:
+        yield session
+    finally:
+        await session.close()
+
+
+shard_db_dependency = Annotated[Session, Depends(get_shard_db)]
+async_shard_db_dependency = Annotated[AsyncSession, Depends(get_async_shard_db)]
+read_db_dependency = Annotated[Session, Depends(get_read_db)]
+async_read_db_dependency = Annotated[AsyncSession, Depends(get_async_read_db)]
+
+
+# Conditional GET for polled per-user read endpoints (route dependency). The ETag is derived
+# from the user's data version (expense_summary_versions, bumped in the transaction of every
+# write) and the request URL: an unchanged poll costs one primary key lookup, then 304.
+# The session is the endpoint's own (dependencies are cached per request), so the version comes
+# from the same database as the response; it is read first, so a write during the queries only
+# makes the next poll miss.
+ETAG_CACHE_CONTROL = 'private, no-cache'  # clients may keep the response but revalidate it
+
+async def check_user_etag(request : Request, response : Response, user : user_dependency,
+                          db : async_read_db_dependency) -> str:
+    version = await get_summary_version(db, user.get('id'))
+    key = f"{user.get('id')}:{version}:{request.url.path}?{request.url.query}"
+    etag = f'W/"{hashlib.sha256(key.encode()).hexdigest()[:32]}"'
+    headers = {'ETag' : etag, 'Cache-Control' : ETAG_CACHE_CONTROL}
+
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match:
+        # Weak comparison: gzip and other encodings don't change the ETag
+        tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+        if '*' in tags or etag.removeprefix('W/') in tags:
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    response.headers.update(headers)
+    return etag
@@ -0,0 +1,212 @@
+"""
+Synthetic data generator for large, realistic expense datasets.
+
+Generates users, categories and expenses matching models.py and loads them
+with PostgreSQL COPY. Output is fully determined by --seed and the scale
+parameters, so benchmark and index-planning runs are repeatable.
+
+    python generate_data.py --users 10000 --expenses 5000000 --seed 7
+
+Shape of the data:
+* expenses per user follow a Zipf distribution (--skew): a few heavy users, a long tail
+* each user has between --min-categories and --max-categories categories, drawn from a
+  realistic name pool, and spends on them with a Zipf preference
+* amounts are log-normal around a per-category typical price
+* dates cover the last --years years, denser towards today and on weekends
+
+Writes everything to DATABASE_URL, so it refuses to run with DATABASE_SHARD_URLS set:
+expenses and categories there must live on their owner's shard (use benchmarks/seed.py).
+"""
+import argparse
+import bisect
+import datetime
+import io
+import itertools
+import math
+import random
+import time
+
+from database import Engine, shards
+from security import hash_password
+
+DEFAULT_PASSWORD = "password123"
+
+# (name, typical amount) - amounts are spread log-normally around the typical value
+CATEGORY_POOL = [
+    ("Groceries", 45), ("Restaurants", 30), ("Coffee", 5), ("Fuel", 50), ("Public Transport", 3),
+    ("Taxi", 18), ("Rent", 1200), ("Electricity", 70), ("Water", 30), ("Internet", 45),
+    ("Mobile", 25), ("Insurance", 110), ("Healthcare", 60), ("Pharmacy", 15), ("Gym", 40),
+    ("Clothing", 55), ("Shoes", 80), ("Electronics", 250), ("Books", 18), ("Subscriptions", 12),
+    ("Movies", 14), ("Concerts", 75), ("Travel", 400), ("Hotels", 150), ("Flights", 320),
+    ("Gifts", 40), ("Charity", 25), ("Education", 200), ("Childcare", 300), ("Pets", 35),
+    ("Home Improvement", 90), ("Furniture", 350), ("Personal Care", 22), ("Laundry", 10),
+    ("Parking", 8), ("Car Maintenance", 180), ("Taxes", 500), ("Bank Fees", 6), ("Snacks", 4),
+    ("Alcohol", 20),
+]
+
+USERS_COPY = "COPY users (id, email, hashed_password, role, created_at, updated_at) FROM STDIN WITH (FORMAT csv)"
+CATEGORIES_COPY = "COPY categories (id, name, owner_id, created_at, updated_at) FROM STDIN WITH (FORMAT csv)"
+EXPENSES_COPY = ("COPY expenses (id, amount, description, date, created_at, updated_at, category_id, owner_id) "
+                 "FROM STDIN WITH (FORMAT csv)")
+
+
+def zipf_weights(n : int, skew : float) -> list[float]:
+    return [1.0 / (rank ** skew) for rank in range(1, n + 1)]
+
+
+def split_total(total : int, weights : list[float]) -> list[int]:
+    """Deterministically splits total into integer parts proportional to weights."""
+    weight_sum = sum(weights)
+    exact = [total * w / weight_sum for w in weights]
+    counts = [int(x) for x in exact]
+    remainder = total - sum(counts)
+    by_fraction = sorted(range(len(weights)), key=lambda i: exact[i] - counts[i], reverse=True)
+    for i in by_fraction[:remainder]:
+        counts[i] += 1
+    return counts
+
+
+class DateSampler:
+    """Recency-biased dates over a history window, with extra weight on weekends."""
+
+    def __init__(self, rng : random.Random, today : datetime.date, days : int):
+        self.rng = rng
+        self.days = [today - datetime.timedelta(days=offset) for offset in range(days)]
+        weights = []
+        for offset, day in enumerate(self.days):
+            recency = math.exp(-offset / (days / 2))
+            weekend = 1.4 if day.weekday() >= 5 else 1.0
+            weights.append(recency * weekend)
+        self.cumulative = list(itertools.accumulate(weights))
+
+    def sample(self) -> datetime.date:
+        return self.days[bisect.bisect(self.cumulative, self.rng.random() * self.cumulative[-1])]
+
+
+def next_ids(cursor, table : str) -> int:
+    cursor.execute(f"LOCK TABLE {table} IN EXCLUSIVE MODE")
+    cursor.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}")
+    return cursor.fetchone()[0]
+
+
+def copy_rows(cursor, copy_sql : str, rows) -> None:
+    buffer = io.StringIO()
+    buffer.writelines(rows)
+    buffer.seek(0)
+    cursor.copy_expert(copy_sql, buffer)
+
+
+def generate(args):
+    rng = random.Random(args.seed)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    now_text = now.isoformat()
+    hashed = hash_password(DEFAULT_PASSWORD)  # bcrypt once, shared by every generated user
+    dates = DateSampler(rng, now.date(), args.years * 365)
+
+    raw = Engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+
+        # ------------------ users ------------------
+        first_user_id = next_ids(cursor, "users")
+        user_ids = list(range(first_user_id, first_user_id + args.users))
+        copy_rows(cursor, USERS_COPY, (
+            f"{uid},{args.email_prefix}_{uid}@example.com,{hashed},user,{now_text},{now_text}\n"
+            for uid in user_ids
+        ))
+
+        # ------------------ categories ------------------
+        next_category_id = next_ids(cursor, "categories")
+        user_categories = {}
+        category_rows = []
+        for uid in user_ids:
+            count = rng.randint(args.min_categories, args.max_categories)
+            picked = rng.sample(CATEGORY_POOL, count)
+            ids = []
+            for name, typical in picked:
+                category_rows.append(f"{next_category_id},{name},{uid},{now_text},{now_text}\n")
+                ids.append((next_category_id, typical))
+                next_category_id += 1
+            user_categories[uid] = (ids, list(itertools.accumulate(zipf_weights(count, 1.0))))
+        copy_rows(cursor, CATEGORIES_COPY, category_rows)
+
+        # ------------------ expenses ------------------
+        # Monthly partitions for the whole history, otherwise old rows land in expenses_default
+        cursor.execute("SELECT to_regproc('create_expense_partitions') IS NOT NULL")
+        if cursor.fetchone()[0]:
+            cursor.execute("SELECT create_expense_partitions(%s, %s)", (dates.days[-1], now.date()))
+        next_expense_id = next_ids(cursor, "expenses")
+        per_user = split_total(args.expenses, zipf_weights(args.users, args.skew))
+        rng.shuffle(per_user)  # heavy users shouldn't always be the lowest ids
+
+        loaded = 0
+        start = time.perf_counter()
+        batch = []
+        for uid, count in zip(user_ids, per_user):
+            categories, cumulative = user_categories[uid]
+            total_weight = cumulative[-1]
+            for _ in range(count):
+                category_id, typical = categories[bisect.bisect(cumulative, rng.random() * total_weight)]
+                amount = round(typical * rng.lognormvariate(0.0, 0.6), 2)
+                day = dates.sample()
+                created = f"{day.isoformat()} 12:00:00+00"
+                batch.append(
+                    f"{next_expense_id},{amount},expense {next_expense_id},{day.isoformat()},"
+                    f"{created},{created},{category_id},{uid}\n"
+                )
+                next_expense_id += 1
+                if len(batch) >= args.batch_size:
+                    copy_rows(cursor, EXPENSES_COPY, batch)
+                    loaded += len(batch)
+                    batch = []
+                    elapsed = time.perf_counter() - start
+                    print(f"  {loaded:>12,} expenses  {loaded / elapsed:>10,.0f} rows/s")
+        if batch:
+            copy_rows(cursor, EXPENSES_COPY, batch)
+            loaded += len(batch)
+        elapsed = time.perf_counter() - start
+
+        # Explicit ids were used, move the sequences past them
+        for table in ("users", "categories", "expenses"):
+            cursor.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))")
+
+        raw.commit()
+        cursor.execute("ANALYZE users")
+        cursor.execute("ANALYZE categories")
+        cursor.execute("ANALYZE expenses")
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+    print(f"✅ {args.users:,} users, {len(category_rows):,} categories, {loaded:,} expenses "
+          f"({loaded / elapsed if elapsed else 0:,.0f} expense rows/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--expenses", type=int, default=1_000_000, help="total expenses across all users")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of expenses per user")
+    parser.add_argument("--min-categories", type=int, default=4)
+    parser.add_argument("--max-categories", type=int, default=20)
+    parser.add_argument("--years", type=int, default=3, help="history length")
+    parser.add_argument("--batch-size", type=int, default=200_000, help="rows per COPY")
+    parser.add_argument("--email-prefix", default="gen")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if shards.sharded:
+        parser.error("DATABASE_SHARD_URLS is set: this loads into DATABASE_URL only, "
+                     "use benchmarks/seed.py to seed sharded databases")
+    if not 1 <= args.min_categories <= args.max_categories <= len(CATEGORY_POOL):
+        parser.error(f"need 1 <= --min-categories <= --max-categories <= {len(CATEGORY_POOL)}")
+
+    print("Generating data...")
+    generate(args)
+
+
+if __name__ == "__main__":
+    main()
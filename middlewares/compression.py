@@ -0,0 +1,19 @@
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class StreamAwareGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware that passes long-lived streams (server-sent events) through untouched:
+    gzip would hold their small events back in its buffer instead of sending them.
+    """
+
+    def __init__(self, app : ASGIApp, excluded_paths : frozenset[str] = frozenset(), **kwargs):
+        super().__init__(app, **kwargs)
+        self.excluded_paths = excluded_paths
+
+    async def __call__(self, scope : Scope, receive : Receive, send : Send) -> None:
+        if scope["type"] == "http" and scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
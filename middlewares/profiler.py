@@ -0,0 +1,111 @@
+import cProfile
+import io
+import os
+import pstats
+import random
+import time
+import uuid
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from fastapi import Request
+from jose import jwt, JWTError
+from sqlalchemy import event
+from sqlalchemy.engine import Engine as SQLAlchemyEngine
+import config
+
+# Opt-in per-request profiling.
+# An admin sends "X-Profile: 1" (or ?profile=1); PROFILE_SAMPLE_PERCENT of those requests
+# are run under cProfile and the result is kept in a bounded ring buffer (/admin/profiles).
+PROFILE_SAMPLE_PERCENT = float(os.getenv("PROFILE_SAMPLE_PERCENT", 100))
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", 50))
+PROFILE_TOP_FUNCTIONS = 30
+
+PROFILES = deque(maxlen=PROFILE_BUFFER_SIZE)
+
+# SQL time of the request being profiled, filled by the engine events below
+_sql_stats : ContextVar[dict | None] = ContextVar("profile_sql_stats", default=None)
+
+# cProfile can only run one profiler at a time per interpreter
+_profiler_busy = False
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _sql_stats.get() is not None:
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _sql_stats.get()
+    if stats is not None and conn.info.get("profile_query_start"):
+        stats["time"] += time.perf_counter() - conn.info["profile_query_start"].pop()
+        stats["count"] += 1
+
+
+# Listening on the Engine class covers every engine: primary, replicas and shards, sync and async
+event.listen(SQLAlchemyEngine, "before_cursor_execute", _before_cursor_execute)
+event.listen(SQLAlchemyEngine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _is_admin(request : Request) -> bool:
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return False
+    try:
+        payload = jwt.decode(auth_header.split(" ")[1], config.SECRET_KEY, config.ALGORITHM)
+    except JWTError:
+        return False
+    return payload.get("role") == "admin"
+
+
+def _profiling_requested(request : Request) -> bool:
+    flag = request.headers.get("X-Profile") or request.query_params.get("profile")
+    if flag not in ("1", "true"):
+        return False
+    return random.uniform(0, 100) < PROFILE_SAMPLE_PERCENT and _is_admin(request)
+
+
+async def profile_request(request : Request, call_next):
+    global _profiler_busy
+    if _profiler_busy or not _profiling_requested(request):
+        return await call_next(request)
+
+    _profiler_busy = True
+    sql_stats = {"time": 0.0, "count": 0}
+    token = _sql_stats.set(sql_stats)
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    try:
+        # Note: other coroutines running on the loop while this request awaits also show up
+        profiler.enable()
+        response = await call_next(request)
+        profiler.disable()
+    finally:
+        profiler.disable()
+        _sql_stats.reset(token)
+        _profiler_busy = False
+    total = time.perf_counter() - start
+
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+
+    profile_id = uuid.uuid4().hex
+    PROFILES.append({
+        "id": profile_id,
+        "method": request.method,
+        "path": request.url.path,
+        "status_code": response.status_code,
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+        "total_ms": round(total * 1000, 3),
+        "sql_ms": round(sql_stats["time"] * 1000, 3),
+        "sql_queries": sql_stats["count"],
+        "python_ms": round((total - sql_stats["time"]) * 1000, 3),
+        "profile": output.getvalue()
+    })
+    response.headers["X-Profile-Id"] = profile_id
+    return response
+
+
+def get_profiles() -> list[dict]:
+    """Stored profiles, newest first."""
+    return list(reversed(PROFILES))
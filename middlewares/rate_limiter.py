@@ -1,3 +1,4 @@
+import os
 import time
 from fastapi import Request, HTTPException, status
 
@@ -5,7 +6,7 @@ from fastapi import Request, HTTPException, status
 # In-memory store : {"ip_address" : {"window_start" : float, "count" : int}}
 RATE_LIMIT_STORE = {}
 
-RATE_LIMIT = 3  # max requests
+RATE_LIMIT = int(os.getenv("AUTH_RATE_LIMIT", 3))  # max requests
 WINDOW_SIZE = 60  # seconds
 
 async def rate_limiter(request: Request, call_next):
@@ -1,7 +1,7 @@
 import datetime
 from sqlalchemy.orm import relationship
 from database import Base
-from sqlalchemy import Column, Integer, String, DateTime, Float, Date, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Float, Date, ForeignKey, UniqueConstraint, Index, JSON, Text
 
 def utcnow(Base):
     return datetime.datetime.now(datetime.timezone.utc)
@@ -18,23 +18,28 @@ class User(Base):
 
     created_at = Column(DateTime(timezone=True), default=utcnow)
     updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
+    deleted_at = Column(DateTime(timezone=True), nullable=True)  # account deletion requested, data being removed
 
     #Relationships
-    expenses = relationship('Expense', back_populates='owner', cascade="all, delete-orphan")
-    categories = relationship('Category', back_populates='owner', cascade="all, delete-orphan")
+    # passive_deletes: the database cascades (ON DELETE CASCADE), the ORM never loads the rows to delete them
+    expenses = relationship('Expense', back_populates='owner', cascade="all, delete-orphan", passive_deletes=True)
+    categories = relationship('Category', back_populates='owner', cascade="all, delete-orphan", passive_deletes=True)
 
 
 class Expense(Base):
     __tablename__ = 'expenses'
+    # In Postgres this table is range partitioned by month on date (expenses_YYYY_MM plus
+    # expenses_default) with primary key (id, date); see migration a3c5d8e1f027 and
+    # services.partition_service. Queries filtering on date only scan the matching months.
 
     id = Column(Integer, primary_key=True, index=True)
     amount = Column(Float, nullable=False)
     description = Column(String, nullable=True)
-    date = Column(Date, default=datetime.date.today)
+    date = Column(Date, default=datetime.date.today, nullable=False)
     created_at = Column(DateTime(timezone=True), default=utcnow)
     updated_at = Column(DateTime(timezone=True), default=utcnow,onupdate=utcnow)
-    category_id = Column(Integer, ForeignKey('categories.id'), nullable=False)
-    owner_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    category_id = Column(Integer, ForeignKey('categories.id', ondelete='CASCADE'), nullable=False)
+    owner_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
 
     # Relationships
     owner = relationship('User', back_populates='expenses')
@@ -50,10 +55,117 @@ class Category(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)
-    owner_id = Column(Integer, ForeignKey('users.id'))
+    owner_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'))
     created_at = Column(DateTime(timezone=True), default=utcnow)
     updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
 
     #Relationships
     owner = relationship('User', back_populates='categories')
-    expenses = relationship('Expense', back_populates='category', cascade="all, delete-orphan")
\ No newline at end of file
+    expenses = relationship('Expense', back_populates='category', cascade="all, delete-orphan", passive_deletes=True)
+
+
+class MonthlyReportSnapshot(Base):
+    __tablename__ = 'monthly_report_snapshots'
+    __table_args__ = (
+        UniqueConstraint('user_id', 'year', 'month', name='uq_report_snapshot_user_month'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    year = Column(Integer, nullable=False)
+    month = Column(Integer, nullable=False)
+    summary = Column(JSON, nullable=False)  # [{"category": ..., "total": ...}]
+    total = Column(Float, nullable=False)
+    html = Column(Text, nullable=False)
+    computed_at = Column(DateTime(timezone=True), default=utcnow)
+    emailed_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class MonthlyReportRun(Base):
+    __tablename__ = 'monthly_report_runs'
+    __table_args__ = (
+        UniqueConstraint('year', 'month', name='uq_report_run_month'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    year = Column(Integer, nullable=False)
+    month = Column(Integer, nullable=False)
+    status = Column(String(20), nullable=False, default='running')  # running/completed
+    last_user_id = Column(Integer, nullable=False, default=0)  # users up to this id have been queued
+    users_queued = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime(timezone=True), default=utcnow)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class ExpenseArchive(Base):
+    """One archive file (NDJSON.gz) holding a user's expenses of one month."""
+    __tablename__ = 'expense_archives'
+    __table_args__ = (
+        Index('ix_expense_archives_owner_month', 'owner_id', 'year', 'month'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    year = Column(Integer, nullable=False)
+    month = Column(Integer, nullable=False)
+    path = Column(String(255), nullable=False)  # relative to ARCHIVE_DIR
+    row_count = Column(Integer, nullable=False)
+    total = Column(Float, nullable=False)
+    archived_at = Column(DateTime(timezone=True), default=utcnow)
+
+
+class ArchivedExpenseTotal(Base):
+    """Per category and month totals of archived expenses, so aggregates stay complete."""
+    __tablename__ = 'archived_expense_totals'
+    __table_args__ = (
+        UniqueConstraint('owner_id', 'category_id', 'year', 'month', name='uq_archived_total_category_month'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    category_id = Column(Integer, ForeignKey('categories.id', ondelete='CASCADE'), nullable=False)
+    year = Column(Integer, nullable=False)
+    month = Column(Integer, nullable=False)
+    total = Column(Float, nullable=False)
+    count = Column(Integer, nullable=False)
+
+
+class CategoryMerge(Base):
+    """
+    A category that was merged into another and deleted. Archive files keep the category id
+    their expenses had when archived; read-back maps it to the category that replaced it.
+    """
+    __tablename__ = 'category_merges'
+
+    old_category_id = Column(Integer, primary_key=True)
+    owner_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    new_category_id = Column(Integer, ForeignKey('categories.id', ondelete='CASCADE'), nullable=False)
+    merged_at = Column(DateTime(timezone=True), default=utcnow)
+
+
+class RefreshToken(Base):
+    """
+    A refresh token, stored as its SHA-256 hash. Each use rotates it: the row is revoked and
+    replaced by a new token of the same family (one family per login). A revoked token that
+    is presented again means it was copied, so the whole family is revoked.
+    """
+    __tablename__ = 'refresh_tokens'
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    token_hash = Column(String(64), unique=True, nullable=False)
+    family_id = Column(String(32), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), default=utcnow)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    revoked_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class ExpenseSummaryVersion(Base):
+    """
+    Counts the writes to a user's category totals (live summary stream). Each write increments it
+    in its own transaction, so a query reading it together with the totals gets matching values.
+    """
+    __tablename__ = 'expense_summary_versions'
+
+    owner_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    version = Column(BigInteger, nullable=False)
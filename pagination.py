@@ -1,4 +1,4 @@
-from typing import List, Any
+from typing import List, Any, Optional
 
 def paginate_query_result(data : List[Any],
                           total_count : int,
@@ -11,4 +11,19 @@ def paginate_query_result(data : List[Any],
         'offset' : offset,
         'has_more' : has_more,
         'expenses' : data
-    }
\ No newline at end of file
+    }
+
+def paginate_keyset_result(data : List[Any],
+                           limit : int,
+                           has_more : bool,
+                           next_cursor : Optional[str],
+                           total_count : Optional[int] = None,
+                           offset : int = 0):
+    return{
+        'total_count' : total_count,
+        'limit' : limit,
+        'offset' : offset,
+        'has_more' : has_more,
+        'next_cursor' : next_cursor,
+        'expenses' : data
+    }
@@ -1,6 +1,13 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
-from dependencies import db_dependency, user_dependency
+from database import get_sql_cache_stats, async_replicas, shards
+from dependencies import user_dependency
+from middlewares.profiler import get_profiles
+from services.cache import bump_user_version_async
+from services.live_updates import summary_version_bump, publish_summary_resync
 from models import Expense
 
 router = APIRouter(
@@ -9,24 +16,80 @@ router = APIRouter(
 )
 
 @router.get("/expenses", status_code=status.HTTP_200_OK)
-async def read_all_expenses(db : db_dependency,
-                            user : user_dependency):
+async def read_all_expenses(user : user_dependency):
     if user is None or user.get('role') != 'admin' :
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Admins only : access denied.')
-    expenses = db.query(Expense).all()
-    return expenses
+
+    async def shard_expenses(session : AsyncSession) -> list[dict]:
+        # Plain column rows, no ORM entities to build and track
+        result = await session.execute(select(*Expense.__table__.columns))
+        return [dict(row) for row in result.mappings()]
+
+    # Every shard is queried at the same time. Expense ids are only unique within a shard,
+    # so each row says where it lives (pass it on as owner_id/shard to identify the expense).
+    return [
+        {**row, 'shard' : shard}
+        for shard, rows in enumerate(await shards.fan_out(shard_expenses))
+        for row in rows
+    ]
 
 @router.delete("/expenses/{expense_id}", status_code=status.HTTP_200_OK)
 async def delete_expense(expense_id : int,
-                         db : db_dependency,
-                         user : user_dependency):
+                         user : user_dependency,
+                         owner_id : Optional[int] = Query(None, description='Owner of the expense (required when sharded)')):
     if user is None or user.get('role') != 'admin' :
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Admins only : access denied.')
 
-    expense = db.query(Expense).filter_by(id=expense_id).first()
-    if expense is None:
+    # Each shard has its own expenses.id sequence: the same id names different expenses on
+    # different shards, so the owner has to pick the one shard to delete from
+    if owner_id is None and shards.sharded:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail='owner_id is required: expense ids are only unique per shard.')
+
+    query = delete(Expense).where(Expense.id == expense_id)
+    if owner_id is not None:
+        query = query.where(Expense.owner_id == owner_id)
+
+    session = shards.async_session(owner_id) if owner_id is not None else shards.async_session_factories[0]()
+    try:
+        result = await session.execute(query.returning(Expense.owner_id))
+        deleted = result.first()
+        if deleted is not None:
+            await session.execute(summary_version_bump([deleted.owner_id]))
+        await session.commit()
+    finally:
+        await session.close()
+    if deleted is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Expense not found')
 
-    db.delete(expense)
-    db.commit()
-    return {"message" : f"Expense {expense_id} deleted successfully"}
\ No newline at end of file
+    await bump_user_version_async(deleted.owner_id)
+    publish_summary_resync(deleted.owner_id)
+    return {"message" : f"Expense {expense_id} deleted successfully"}
+
+@router.get("/sql_cache_stats", status_code=status.HTTP_200_OK)
+async def read_sql_cache_stats(user : user_dependency):
+    if user is None or user.get('role') != 'admin' :
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Admins only : access denied.')
+    return get_sql_cache_stats()
+
+@router.get("/profiles", status_code=status.HTTP_200_OK)
+async def read_profiles(user : user_dependency,
+                        path : Optional[str] = Query(None, description='Only profiles of this request path')):
+    if user is None or user.get('role') != 'admin' :
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Admins only : access denied.')
+    profiles = get_profiles()
+    if path:
+        profiles = [p for p in profiles if p['path'] == path]
+    return profiles
+
+@router.get("/db_replicas", status_code=status.HTTP_200_OK)
+async def read_replica_status(user : user_dependency):
+    if user is None or user.get('role') != 'admin' :
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Admins only : access denied.')
+    return async_replicas.status()
+
+@router.get("/db_shards", status_code=status.HTTP_200_OK)
+async def read_shard_status(user : user_dependency):
+    if user is None or user.get('role') != 'admin' :
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Admins only : access denied.')
+    return {"sharded" : shards.sharded, "shards" : shards.status()}
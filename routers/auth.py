@@ -9,6 +9,8 @@ from config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRES_MINUTES
 from dependencies import db_dependency
 from security import hash_password, verify_password
 from models import User
+from services.token_service import issue_refresh_token, rotate_refresh_token, revoke_refresh_token
+from services.account_service import add_user_to_shard
 
 router = APIRouter(
     prefix='/auth',
@@ -23,10 +25,15 @@ class CreateUserRequest(BaseModel):
 class Token(BaseModel):
     access_token:str
     token_type:str
+    refresh_token:str
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token : str
 
 def authenticate_user(username:str, password:str, db):
     user = db.query(User).filter_by(email=username).first()
-    if user and verify_password(password, user.hashed_password):
+    # Accounts being deleted can't log in any more
+    if user and user.deleted_at is None and verify_password(password, user.hashed_password):
         return user
     raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid Credentials')
 
@@ -55,6 +62,7 @@ async def create_user(db:db_dependency,
     db.add(create_user_model)
     db.commit()
     db.refresh(create_user_model)
+    add_user_to_shard(create_user_model)
     return {
         'message':'User created successfully',
         'id':create_user_model.id,
@@ -66,4 +74,27 @@ async def login_for_access_token(db:db_dependency,
                                  form_data: Annotated[OAuth2PasswordRequestForm, Depends()]):
     user = authenticate_user(form_data.username, form_data.password, db)
     token = create_access_token(user.email, user.id, user.created_at, user.role)
-    return {'access_token' : token, 'token_type' : 'bearer'}
\ No newline at end of file
+    refresh_token = issue_refresh_token(db, user.id)
+    return {'access_token' : token, 'token_type' : 'bearer', 'refresh_token' : refresh_token}
+
+@router.post('/refresh', response_model=Token)
+async def refresh_access_token(db:db_dependency,
+                               request : RefreshTokenRequest):
+    """
+    New access token without the password (no bcrypt). The refresh token is single use:
+    the response carries its replacement.
+    """
+    rotated = rotate_refresh_token(db, request.refresh_token)
+    if rotated is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid Refresh Token')
+    user, refresh_token = rotated
+    token = create_access_token(user.email, user.id, user.created_at, user.role)
+    return {'access_token' : token, 'token_type' : 'bearer', 'refresh_token' : refresh_token}
+
+@router.post('/logout', status_code=status.HTTP_200_OK)
+async def logout(db:db_dependency,
+                 request : RefreshTokenRequest):
+    # Access tokens already issued stay valid until they expire (ACCESS_TOKEN_EXPIRES_MINUTES)
+    if not revoke_refresh_token(db, request.refresh_token):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid Refresh Token')
+    return {'message' : 'Logged out'}
\ No newline at end of file
@@ -1,31 +1,72 @@
+import asyncio
 import datetime
+import heapq
+import itertools
+import json
 from datetime import date
-from typing import Optional
-from fastapi import APIRouter, HTTPException, Path, Query
-from pydantic import BaseModel, Field
-from sqlalchemy import text, select, func
+from typing import Annotated, Optional, Literal
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Response
+from fastapi.concurrency import run_in_threadpool, iterate_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, StringConstraints
+from sqlalchemy import text, select, func, insert, update, delete, any_, bindparam, Integer
+from sqlalchemy.dialects.postgresql import insert as pg_insert, ARRAY
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import selectinload
 from starlette import status
-from dependencies import user_dependency, db_dependency, async_db_dependency
+from dependencies import user_dependency, shard_db_dependency, async_shard_db_dependency, async_read_db_dependency, open_user_read_session, check_user_etag
 from models import Expense, Category
-from pagination import paginate_query_result
+from pagination import paginate_query_result, paginate_keyset_result
+from database import shards
+from services.cache import LRUCache, bump_user_version_async
+from services.category_service import merge_category
+from services.write_buffer import EXPENSE_GROUP_COMMIT, WriteBufferFull, expense_write_buffer
+from services.live_updates import STREAM_HEARTBEAT_SECONDS, summary_broker, summary_version_bump, publish_summary_delta, \
+    get_summary_version
+from services.timeseries_service import get_spending_timeseries
+from services.search_service import (
+    expense_filter_conditions,
+    build_filter_query,
+    build_count_query,
+    encode_cursor,
+    decode_cursor
+)
+from services.archive_service import (
+    list_archive_files,
+    has_archived_months,
+    get_category_names,
+    iter_archived_expenses,
+    archived_expense_matches
+)
 
 router = APIRouter(
     prefix='/expenses',
     tags=['expenses']
 )
 
+# categories.name is String(100): longer names are rejected here (422), not by the database,
+# where with group commit they would fail the whole batch
+CategoryName = Annotated[str, StringConstraints(strip_whitespace=True, min_length=1, max_length=100)]
+
 class CreateExpenseRequest(BaseModel):
     amount : float = Field(gt=0)
-    category_name : str
+    category_name : CategoryName
     description : Optional[str] = None
 
 class UpdatedExpense(BaseModel):
     amount : float = Field(gt=0)
-    category_name : str
+    category_name : CategoryName
     description : Optional[str] = None
 
+class DeleteExpensesRequest(BaseModel):
+    ids : list[int] = Field(min_length=1, max_length=1000)
+
+class BulkDeleteRequest(BaseModel):
+    ids : Optional[list[int]] = None
+    category_names : Optional[list[str]] = None
+    start_date : Optional[date] = None
+    end_date : Optional[date] = None
+    dry_run : bool = False
+
 def get_or_create_category(db, user_id : int, name : str) -> Category:
     name = name.strip()
 
@@ -48,32 +89,44 @@ def get_or_create_category(db, user_id : int, name : str) -> Category:
         return db.query(Category).filter_by(owner_id = user_id, name = name).first()
 
 
-async def get_or_create_category_async(db, user_id : int, name : str) -> Category:
-    name = name.strip()
-
-    # Try to find existing
-    result = await db.execute(
-        select(Category).filter_by(owner_id = user_id, name = name)
+def upsert_category_cte(user_id : int, name : str):
+    """
+    INSERT ... ON CONFLICT for the user's category as a CTE, so the category id
+    is resolved inside the same statement as the expense write.
+    The no-op DO UPDATE makes RETURNING yield the id of an existing row too.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    stmt = pg_insert(Category).values(
+        name = name.strip(),
+        owner_id = user_id,
+        created_at = now,
+        updated_at = now
     )
+    stmt = stmt.on_conflict_do_update(
+        index_elements = [Category.owner_id, Category.name],
+        set_ = {'name' : stmt.excluded.name}
+    ).returning(Category.id)
+    return stmt.cte('upserted_category')
 
-    category = result.scalar_one_or_none()
-    if category:
-        return category
 
-    # Create new
-    category = Category(name = name, owner_id = user_id)
-    db.add(category)
+def summary_version_cte(user_id : int):
+    """
+    The user's summary version bump as a CTE: it commits with the write itself, and RETURNING
+    gives the version its live summary delta is published with.
+    """
+    return summary_version_bump([user_id]).cte('summary_version')
+
+
+def summary_version_column(summary_version):
+    return select(summary_version.c.version).scalar_subquery().label('summary_version')
 
-    try:
-        # Commit and refresh
-        await db.commit()
-        await db.refresh(category)
-        return category
-    except IntegrityError:
-        # Handle concurrent creation
-        await db.rollback()
-        result = await db.execute(select(Category).filter_by(owner_id = user_id, name = name))
-        return result.scalar_one_or_none()
+
+def removed_amounts(rows) -> dict[str, float]:
+    """Live summary delta of deleted (id, amount, name) rows."""
+    deltas : dict[str, float] = {}
+    for row in rows:
+        deltas[row.name] = deltas.get(row.name, 0) - row.amount
+    return deltas
 
 
 # @router.post('/new_expense', status_code = status.HTTP_201_CREATED)
@@ -107,29 +160,48 @@ async def get_or_create_category_async(db, user_id : int, name : str) -> Categor
 @router.post('/new_expense', status_code = status.HTTP_201_CREATED)
 async def create_expense(request : CreateExpenseRequest,
                          user : user_dependency,
-                         db : async_db_dependency):
+                         db : async_shard_db_dependency):
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid User')
 
-    #ensure category exists for this user or else create it
-    category = await get_or_create_category_async(db, user.get('id'), request.category_name)
-
-    expense_model = Expense(
-        amount = request.amount,
-        category_id = category.id,
-        description = request.description,
-        owner_id = user.get('id')
+    if EXPENSE_GROUP_COMMIT:
+        # Batched with other requests into one INSERT/commit; returns once the batch is durable
+        try:
+            return await expense_write_buffer.submit(user.get('id'), request.amount,
+                                                     request.category_name, request.description)
+        except WriteBufferFull:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail='Too many pending writes, retry shortly.', headers={'Retry-After' : '1'})
+
+    #ensure category exists for this user or else create it, and insert in the same statement
+    category = upsert_category_cte(user.get('id'), request.category_name)
+    summary_version = summary_version_cte(user.get('id'))
+
+    insert_query = (
+        insert(Expense)
+        .add_cte(category)
+        .add_cte(summary_version)
+        .values(
+            amount = request.amount,
+            category_id = select(category.c.id).scalar_subquery(),
+            description = request.description,
+            owner_id = user.get('id')
+        )
+        .returning(Expense.id, Expense.amount, Expense.description, Expense.date,
+                   summary_version_column(summary_version))
     )
-    db.add(expense_model)
+    result = await db.execute(insert_query)
+    expense = result.one()
     await db.commit()
-    await db.refresh(expense_model)
+    await bump_user_version_async(user.get('id'))
+    publish_summary_delta(user.get('id'), expense.summary_version, {request.category_name.strip() : expense.amount})
 
     return {
-        "id" : expense_model.id,
-        "amount" : expense_model.amount,
-        "description" : expense_model.description,
-        "category" : category.name,
-        "date" : expense_model.date
+        "id" : expense.id,
+        "amount" : expense.amount,
+        "description" : expense.description,
+        "category" : request.category_name.strip(),
+        "date" : expense.date
     }
 
 
@@ -163,145 +235,357 @@ async def create_expense(request : CreateExpenseRequest,
 #
 #     return paginate_query_result(response, total_count, limit, offset)
 
-@router.get('/my_expenses', status_code = status.HTTP_200_OK)
+#---------------- Hot read statements ----------------
+# Built once at import so each request only binds parameters: the compiled form
+# is reused from the engine's compiled cache and asyncpg's prepared statement cache.
+
+my_expenses_count_query = select(func.count(Expense.id)).where(Expense.owner_id == bindparam('owner_id'))
+
+# Only the response columns, category name via JOIN -> one statement, no ORM identity map
+my_expenses_query = (
+    select(
+        Expense.id,
+        Expense.amount,
+        Expense.description,
+        Category.name.label('category'),
+        Expense.date
+    )
+    .join(Category, Expense.category_id == Category.id)
+    .where(Expense.owner_id == bindparam('owner_id'))
+    .order_by(Expense.date.desc())
+    .offset(bindparam('offset'))
+    .limit(bindparam('limit'))
+)
+
+# All-time totals: live expenses plus the rollup of archived ones (services.archive_service)
+summary_query = text("""
+    SELECT c.name AS category, SUM(t.total) AS total_spent
+    FROM (
+        SELECT e.category_id, SUM(e.amount) AS total
+        FROM expenses e
+        WHERE e.owner_id = :owner_id
+        GROUP BY e.category_id
+        UNION ALL
+        SELECT a.category_id, a.total
+        FROM archived_expense_totals a
+        WHERE a.owner_id = :owner_id
+    ) t
+    JOIN categories c ON t.category_id = c.id
+    GROUP BY c.name
+    ORDER BY total_spent DESC
+""")
+
+top_categories_query = text("""
+    SELECT c.name AS category, SUM(t.total) AS total_spent
+    FROM (
+        SELECT e.category_id, SUM(e.amount) AS total
+        FROM expenses e
+        WHERE e.owner_id = :owner_id
+        GROUP BY e.category_id
+        UNION ALL
+        SELECT a.category_id, a.total
+        FROM archived_expense_totals a
+        WHERE a.owner_id = :owner_id
+    ) t
+    JOIN categories c ON t.category_id = c.id
+    GROUP BY c.name
+    ORDER BY total_spent DESC
+    LIMIT :top_limit
+""")
+
+
+@router.get('/my_expenses', status_code = status.HTTP_200_OK, dependencies=[Depends(check_user_etag)])
 async def get_expenses(user : user_dependency,
-                       db : async_db_dependency,
+                       db : async_read_db_dependency,
                        limit : int = Query(5, ge=0, le=50, description='Number of expenses to return'),
                        offset : int = Query(0, ge=0, description='Number of expenses to skip')
                        ):
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid User')
 
-    count_query = select(func.count(Expense.id)).filter_by(owner_id=user.get('id'))
-    total_result = await db.execute(count_query)
+    total_result = await db.execute(my_expenses_count_query, {'owner_id' : user.get('id')})
     total_count = total_result.scalar() or 0
 
-    expenses_query = (
-        select(Expense)
-        .options(selectinload(Expense.category))
-        .filter_by(owner_id=user.get('id'))
-        .order_by(Expense.date.desc())
-        .offset(offset)
-        .limit(limit)
-    )
-    result = await db.execute(expenses_query)
-    expenses = result.scalars().all()
+    result = await db.execute(my_expenses_query, {
+        'owner_id' : user.get('id'),
+        'limit' : limit,
+        'offset' : offset
+    })
 
-    response = [
-        {
-            "id" : e.id,
-            "amount" : e.amount,
-            "description" : e.description,
-            "category" : e.category.name if e.category else None,
-            "date" : e.date
-        } for e in expenses
-    ]
+    response = [dict(row) for row in result.mappings()]
 
     return paginate_query_result(response, total_count, limit, offset)
 
 
 @router.put('/update_expense/{expense_id}', status_code = status.HTTP_201_CREATED)
 async def update_expenses(request : UpdatedExpense,
-                          user : user_dependency, db : db_dependency,
+                          user : user_dependency, db : async_shard_db_dependency,
                           expense_id : int = Path(gt=0)):
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid User')
 
-    expense_model = db.query(Expense).filter_by(owner_id = user.get('id')).filter_by(id=expense_id).first()
-    if expense_model is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Expense Not Found')
+    category = upsert_category_cte(user.get('id'), request.category_name)
+    summary_version = summary_version_cte(user.get('id'))
 
-    category = get_or_create_category(db, user.get('id'), request.category_name)
+    # Amount and category before the update (row locked first), for the live summary delta
+    old = (
+        select(Expense.id, Expense.amount.label('old_amount'), Category.name.label('old_category'))
+        .join(Category, Expense.category_id == Category.id)
+        .where(Expense.id == expense_id, Expense.owner_id == user.get('id'))
+        .with_for_update(of=Expense)
+        .subquery('old')
+    )
 
-    expense_model.amount = request.amount
-    expense_model.category_id=category.id
-    expense_model.description=request.description
+    update_query = (
+        update(Expense)
+        .add_cte(category)
+        .add_cte(summary_version)
+        .where(Expense.id == expense_id, Expense.owner_id == user.get('id'), Expense.id == old.c.id)
+        .values(
+            amount = request.amount,
+            category_id = select(category.c.id).scalar_subquery(),
+            description = request.description
+        )
+        .returning(Expense.id, Expense.amount, Expense.description, Expense.date,
+                   old.c.old_amount, old.c.old_category, summary_version_column(summary_version))
+    )
+    result = await db.execute(update_query)
+    expense = result.first()
+    if expense is None:
+        # Discard the category upsert as well
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Expense Not Found')
 
-    db.add(expense_model)
-    db.commit()
-    db.refresh(expense_model)
+    await db.commit()
+    await bump_user_version_async(user.get('id'))
+    deltas = {expense.old_category : -expense.old_amount}
+    deltas[request.category_name.strip()] = deltas.get(request.category_name.strip(), 0) + expense.amount
+    publish_summary_delta(user.get('id'), expense.summary_version, deltas)
     return {
-        "id": expense_model.id,
-        "amount": expense_model.amount,
-        "description": expense_model.description,
-        "category": category.name,
-        "date": expense_model.date
+        "id": expense.id,
+        "amount": expense.amount,
+        "description": expense.description,
+        "category": request.category_name.strip(),
+        "date": expense.date
     }
 
 @router.delete('/delete_expense/{expense_id}', status_code=status.HTTP_200_OK)
-async def delete_expense(expense_id : int, db : db_dependency, user:user_dependency):
+async def delete_expense(expense_id : int, db : async_shard_db_dependency, user:user_dependency):
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid User')
 
-    expense_model = db.query(Expense).filter_by(owner_id=user.get('id')).filter_by(id=expense_id).first()
-    if expense_model is None:
+    summary_version = summary_version_cte(user.get('id'))
+    delete_query = (
+        delete(Expense)
+        .add_cte(summary_version)
+        .where(Expense.id == expense_id, Expense.owner_id == user.get('id'), Expense.category_id == Category.id)
+        .returning(Expense.id, Expense.amount, Category.name, summary_version_column(summary_version))
+    )
+    result = await db.execute(delete_query)
+    deleted = result.first()
+    if deleted is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Invalid Expense Id')
 
-    db.delete(expense_model)
-    db.commit()
+    await db.commit()
+    await bump_user_version_async(user.get('id'))
+    publish_summary_delta(user.get('id'), deleted.summary_version, {deleted.name : -deleted.amount})
     return {'message' : 'Expense deleted Successfully'}
 
 
-@router.get('/summary', status_code = status.HTTP_200_OK)
-async def get_expense_summary(db : db_dependency, user : user_dependency):
-
+@router.delete('', status_code=status.HTTP_200_OK)
+async def delete_expenses_by_ids(request : DeleteExpensesRequest,
+                                 db : async_shard_db_dependency,
+                                 user : user_dependency):
+    """
+    Delete several of the user's expenses by id in one statement.
+    Ids that don't exist or belong to someone else are reported as not found.
+    """
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid User')
 
-    query = text("""
-        SELECT c.name AS category, SUM(e.amount) AS total_spent
-        FROM expenses e
-        JOIN categories c ON e.category_id = c.id
-        WHERE e.owner_id = :owner_id
-        GROUP BY c.name
-        ORDER BY total_spent DESC
-    """)
+    summary_version = summary_version_cte(user.get('id'))
+    delete_query = (
+        delete(Expense)
+        .add_cte(summary_version)
+        .where(
+            Expense.owner_id == user.get('id'),
+            Expense.id == any_(bindparam('ids', type_=ARRAY(Integer))),
+            Expense.category_id == Category.id
+        )
+        .returning(Expense.id, Expense.amount, Category.name, summary_version_column(summary_version))
+    )
+    result = await db.execute(delete_query, {'ids' : request.ids})
+    rows = result.fetchall()
+    deleted_ids = [row.id for row in rows]
+    if rows:
+        await db.commit()
+        await bump_user_version_async(user.get('id'))
+        publish_summary_delta(user.get('id'), rows[0].summary_version, removed_amounts(rows))
+    else:
+        # Nothing deleted: undo the summary version bump so caches and ETags stay valid
+        await db.rollback()
 
-    result = db.execute(query, {'owner_id':user.get('id')})
+    deleted = set(deleted_ids)
+    return {
+        'deleted_count' : len(deleted_ids),
+        'deleted_ids' : deleted_ids,
+        'not_found_ids' : [i for i in request.ids if i not in deleted]
+    }
+
+
+@router.get('/summary', status_code = status.HTTP_200_OK, dependencies=[Depends(check_user_etag)])
+async def get_expense_summary(db : async_read_db_dependency, user : user_dependency):
+
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid User')
+
+    result = await db.execute(summary_query, {'owner_id':user.get('id')})
     return [{'category' : row[0], 'total_spent' : row[1]} for row in result.fetchall()]
 
+# Totals plus the summary version they correspond to, read by one statement (one snapshot of
+# the database): the totals contain exactly the deltas up to that version
+stream_snapshot_query = text("""
+    SELECT v.version, s.category, s.total_spent
+    FROM (
+        SELECT COALESCE(
+            (SELECT sv.version FROM expense_summary_versions sv WHERE sv.owner_id = :owner_id), 0
+        ) AS version
+    ) v
+    LEFT JOIN (
+        SELECT c.name AS category, SUM(t.total) AS total_spent
+        FROM (
+            SELECT e.category_id, SUM(e.amount) AS total
+            FROM expenses e
+            WHERE e.owner_id = :owner_id
+            GROUP BY e.category_id
+            UNION ALL
+            SELECT a.category_id, a.total
+            FROM archived_expense_totals a
+            WHERE a.owner_id = :owner_id
+        ) t
+        JOIN categories c ON t.category_id = c.id
+        GROUP BY c.name
+    ) s ON true
+    ORDER BY s.total_spent DESC
+""")
+
+# Snapshots sent when a stream (re)connects, keyed by (user_id, data version): many streams
+# of one user, or a reconnect storm after a deploy, share one summary query per version.
+# The version is read from the database (one primary key lookup), so all workers agree on it.
+stream_snapshot_cache = LRUCache(max_entries=1000)
+
+async def load_summary_snapshot(user_id : int) -> dict:
+    # Primary (or shard), not a replica: a lagging replica would miss deltas already skipped
+    async with shards.async_session(user_id) as session:
+        key = (user_id, await get_summary_version(session, user_id))
+        snapshot = stream_snapshot_cache.get(key)
+        if snapshot is None:
+            rows = (await session.execute(stream_snapshot_query, {'owner_id' : user_id})).fetchall()
+            snapshot = {
+                'version' : rows[0].version,
+                'categories' : {row.category : row.total_spent for row in rows if row.category is not None}
+            }
+            stream_snapshot_cache.set(key, snapshot)
+    return snapshot
+
+def sse_event(event : str, data : dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.get('/stream', status_code = status.HTTP_200_OK)
+async def stream_summary(user : user_dependency):
+    """
+    Server-sent events with the user's spending per category. On connect a `snapshot` event
+    carries all totals ({"version", "categories" : {name : total}}); after every write a `delta`
+    event carries the amounts to add to them. Another `snapshot` replaces the totals: it follows
+    category merges, or comes instead of deltas the client was too slow to receive.
+    A comment line every STREAM_HEARTBEAT_SECONDS keeps idle connections open through proxies.
+    """
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid User')
+    user_id = user.get('id')
+    # Subscribed before the snapshot is read, so no write falls between the two
+    subscription = summary_broker.subscribe(user_id)
+    if subscription is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail='Too many open streams, retry shortly.', headers={'Retry-After' : '5'})
+
+    async def events():
+        try:
+            snapshot = await load_summary_snapshot(user_id)
+            yield sse_event('snapshot', snapshot)
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event['type'] == 'resync':
+                    snapshot = await load_summary_snapshot(user_id)
+                    yield sse_event('snapshot', snapshot)
+                elif event['version'] > snapshot['version']:
+                    # Deltas up to the snapshot's version are already in its totals
+                    yield sse_event('delta', {'version' : event['version'], 'categories' : event['categories']})
+        finally:
+            # Also on client disconnect (the generator is cancelled)
+            summary_broker.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type='text/event-stream',
+                             headers={'Cache-Control' : 'no-cache', 'X-Accel-Buffering' : 'no'})
+
 @router.get('/filter_expenses', status_code = status.HTTP_200_OK)
-async def filter_expenses(db : db_dependency,
+async def filter_expenses(db : async_read_db_dependency,
                           user : user_dependency,
                           start_date : date = Query(...,description='Start Date in YYYY-MM-DD'),
                           end_date : date = Query(...,description='End Date in YYYY-MM-DD'),
+                          categories : Optional[list[str]] = Query(None, description='Only these category names'),
+                          min_amount : Optional[float] = Query(None, ge=0, description='Minimum amount'),
+                          max_amount : Optional[float] = Query(None, ge=0, description='Maximum amount'),
+                          q : Optional[str] = Query(None, min_length=1, max_length=200, description='Words in the description'),
+                          cursor : Optional[str] = Query(None, description='next_cursor of the previous page'),
                           limit : int = Query(5, ge=1, le=50, description='Number of expenses to return'),
-                          offset : int = Query(0, ge=0, description='Number of expenses to skip')):
-
+                          offset : int = Query(0, ge=0, description='Number of expenses to skip (ignored with cursor)'),
+                          include_archived : bool = Query(False, description='Also search archived (old) expenses')):
+    """
+    With include_archived, archived expenses in the range are read back from their archive
+    files and merged in (date, id) order; total_count is then not reported.
+    """
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid User')
 
-    count_query = text("""
-        SELECT COUNT(*) 
-        FROM expenses
-        WHERE owner_id = :owner_id
-        AND date BETWEEN :start_date AND :end_date
-    """)
-    count_result = db.execute(count_query, {
-        'owner_id': user.get('id'),
-        'start_date': start_date,
-        'end_date': end_date
-    })
-    total_count = count_result.scalar()
-
-    data_query = text("""
-        SELECT e.id, e.amount, c.name, e.description, e.date
-        FROM expenses e
-        JOIN categories c ON e.category_id = c.id
-        Where e.owner_id = :owner_id
-        AND e.date BETWEEN :start_date AND :end_date
-        ORDER BY e.date ASC
-        LIMIT :limit 
-        OFFSET :offset
-    """)
-
-    result = db.execute(data_query,{
-        'owner_id' : user.get('id'),
-        'start_date' : start_date,
-        'end_date' : end_date,
-        'limit' : limit,
-        'offset' : offset
-    })
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid cursor')
+
+    conditions = expense_filter_conditions(user.get('id'), start_date, end_date,
+                                           categories, min_amount, max_amount, q)
+    skip = offset if after is None else 0
+
+    archived = []
+    if include_archived:
+        archive_files = await list_archive_files(db, user.get('id'), start_date, end_date)
+        if archive_files:
+            category_names = await get_category_names(db, user.get('id'))
+            archived = await run_in_threadpool(
+                lambda: list(itertools.islice(
+                    (row for row in iter_archived_expenses(archive_files, start_date, end_date, category_names, after)
+                     if archived_expense_matches(row, categories, min_amount, max_amount, q)),
+                    skip + limit + 1
+                ))
+            )
+
+    # Counting every match is the expensive part, so only the first page reports it
+    total_count = None
+    if after is None and not archived:
+        count_result = await db.execute(build_count_query(conditions))
+        total_count = count_result.scalar()
+
+    # One extra row tells whether there is a next page
+    if archived:
+        # Offset applies to the merged rows, so fetch the live rows from the start
+        result = await db.execute(build_filter_query(conditions, skip + limit + 1, 0, after))
+    else:
+        result = await db.execute(build_filter_query(conditions, limit + 1, offset, after))
 
     expenses = [
         {
@@ -312,27 +596,80 @@ async def filter_expenses(db : db_dependency,
             'date': row[4]
         } for row in result.fetchall()
     ]
+    if archived:
+        merged = heapq.merge(archived, expenses, key=lambda e: (e['date'], e['id']))
+        expenses = list(itertools.islice(merged, skip, skip + limit + 1))
 
-    return paginate_query_result(expenses, total_count, limit, offset)
+    has_more = len(expenses) > limit
+    expenses = expenses[:limit]
+    next_cursor = encode_cursor(expenses[-1]['date'], expenses[-1]['id']) if has_more else None
 
+    return paginate_keyset_result(expenses, limit, has_more, next_cursor, total_count,
+                                  offset if after is None else 0)
 
-@router.get('/top_categories', status_code=status.HTTP_200_OK)
-async def top_spending_categories(db : db_dependency, user : user_dependency,
-                                  top_limit : int = Query(..., description='Top N Spend Categories')):
+
+export_query = (
+    select(
+        Expense.id,
+        Expense.amount,
+        Category.name.label('category'),
+        Expense.description,
+        Expense.date
+    )
+    .join(Category, Expense.category_id == Category.id)
+    .where(
+        Expense.owner_id == bindparam('owner_id'),
+        Expense.date.between(bindparam('start_date'), bindparam('end_date'))
+    )
+    .order_by(Expense.date.asc(), Expense.id.asc())
+)
+
+
+@router.get('/export', status_code=status.HTTP_200_OK)
+async def export_expenses(user : user_dependency,
+                          db : async_read_db_dependency,
+                          start_date : date = Query(..., description='Start Date in YYYY-MM-DD'),
+                          end_date : date = Query(..., description='End Date in YYYY-MM-DD'),
+                          include_archived : bool = Query(True, description='Include archived (old) expenses')):
+    """
+    Every expense in the range as NDJSON (one JSON object per line), streamed.
+    Archived expenses come first, then live ones, each in (date, id) order.
+    """
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid User')
 
-    query = text("""
-        SELECT c.name AS category, SUM(e.amount) AS total_spent
-        FROM expenses e
-        JOIN categories c ON e.category_id = c.id
-        WHERE e.owner_id = :owner_id
-        GROUP BY c.name
-        ORDER BY total_spent DESC
-        LIMIT :top_limit
-    """)
+    user_id = user.get('id')
+    archive_files = await list_archive_files(db, user_id, start_date, end_date) if include_archived else []
+    category_names = await get_category_names(db, user_id) if archive_files else {}
+
+    async def ndjson_lines():
+        if archive_files:
+            # File reads run in the threadpool, one row at a time
+            archived = iter_archived_expenses(archive_files, start_date, end_date, category_names)
+            async for row in iterate_in_threadpool(archived):
+                yield json.dumps(row, default=str) + "\n"
+
+        # Own session: the request's session is closed once the response starts streaming
+        session = await open_user_read_session(user_id)
+        try:
+            result = await session.stream(export_query, {
+                'owner_id' : user_id, 'start_date' : start_date, 'end_date' : end_date
+            })
+            async for row in result.mappings():
+                yield json.dumps(dict(row), default=str) + "\n"
+        finally:
+            await session.close()
+
+    return StreamingResponse(ndjson_lines(), media_type='application/x-ndjson')
+
+
+@router.get('/top_categories', status_code=status.HTTP_200_OK, dependencies=[Depends(check_user_etag)])
+async def top_spending_categories(db : async_read_db_dependency, user : user_dependency,
+                                  top_limit : int = Query(..., description='Top N Spend Categories')):
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid User')
 
-    result = db.execute(query, {
+    result = await db.execute(top_categories_query, {
         'owner_id' : user.get('id'), 'top_limit' : top_limit
     })
 
@@ -341,123 +678,215 @@ async def top_spending_categories(db : db_dependency, user : user_dependency,
     } for row in result.fetchall()]
 
 
-@router.put('/bulk_update_category', status_code=status.HTTP_200_OK)
-async def bulk_update_category(db : db_dependency,
-                               user : user_dependency,
-                               old_category : str,
-                               new_category : str):
+@router.get('/timeseries', status_code=status.HTTP_200_OK)
+async def spending_timeseries(db : async_read_db_dependency,
+                              user : user_dependency,
+                              granularity : Literal['day', 'week', 'month'] = Query('month'),
+                              start_date : date = Query(..., description='Start Date in YYYY-MM-DD'),
+                              end_date : date = Query(..., description='End Date in YYYY-MM-DD'),
+                              category : Optional[str] = Query(None, description='Only this category')):
+    """
+    Spending totals per day/week/month as a dense series of parallel arrays:
+    {'periods': [...], 'totals': [...], 'counts': [...]}
+    Each bucket only counts expenses between start_date and end_date, so the first and last
+    week or month can be partial. Archived expenses count per whole month.
+    """
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid User')
 
-    old_name = old_category.strip()
-    new_name = new_category.strip()
-
-    if old_name.lower() == new_name.lower():
-        return {'message' : 'Old and New category are the same; nothing to do.'}
+    if start_date > end_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='start_date must be before end_date.')
 
-    #finding existing old category
-    old = db.query(Category).filter_by(owner_id=user.get('id'), name=old_name).first()
-    if not old:
-        return {'message' : f'No category name {old_name} found for this user.', 'updated':0}
+    try:
+        return await get_spending_timeseries(db, user.get('id'), granularity, start_date, end_date,
+                                             category.strip() if category else None)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
 
-    #ensure new category exists
-    new = get_or_create_category(db, user.get('id'), new_name)
 
-    now = datetime.datetime.now(datetime.timezone.utc)
-    bulk_update_query = text("""
-        UPDATE expenses
-        SET category_id = :new_cid, updated_at = :now
-        WHERE category_id = :old_cid AND owner_id = :owner_id
-        RETURNING id
-    """)
+@router.get('/analytics', status_code=status.HTTP_200_OK)
+async def expense_analytics(db : async_read_db_dependency, user : user_dependency):
+    """
+    Per-category mean/median/percentiles, month-over-month totals and unusually large expenses.
+    """
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid User')
 
-    try:
-        result = db.execute(bulk_update_query, {
-            'new_cid': new.id,
-            'old_cid': old.id,
-            'owner_id': user.get('id'),
-            'now': now
-        })
-        updated_rows = [r[0] for r in result.fetchall()]
-        db.commit()
+    # NumPy is only imported once analytics are actually requested
+    from services.analytics_service import get_expense_analytics
 
-    except Exception as exc:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Failed to update expenses : {str(exc)}")
+    return await get_expense_analytics(db, user.get('id'))
 
-    return {
-        'message' : f"{len(updated_rows)} expenses moved from '{old_name}' to '{new_name}'.",
-        'updated_count' : len(updated_rows),
-        'updated_ids' : updated_rows,
-        'from_category_id' : old.id,
-        'to_category_id' : new.id
-    }
 
-@router.delete('/bulk_delete_expenses', status_code=status.HTTP_200_OK)
-async def bulk_delete_expenses(db : db_dependency,
+@router.put('/bulk_update_category', status_code=status.HTTP_200_OK)
+async def bulk_update_category(db : shard_db_dependency,
                                user : user_dependency,
-                               category_names : list[int]):
-
+                               response : Response,
+                               old_category : str,
+                               new_category : str,
+                               include_ids : bool = Query(False, description='Also return the ids of the moved expenses'),
+                               background : bool = Query(False, description='Run as a background task (large categories)')):
     """
-    Delete multiple expenses by category_name for a user
-    Rollback if any issue occurs
+    Moves every expense of old_category to new_category (renaming old_category when
+    new_category doesn't exist yet) and removes old_category.
+    Expenses are moved in chunks with a commit each, see services.category_service.
     """
-
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid User')
 
+    old_name = old_category.strip()
+    new_name = new_category.strip()
 
-    # Resolve category names -> ids
-    categories = db.query(Category).filter(
-        Category.owner_id == user.get('id'),
-        Category.name.in_([name.strip() for name in category_names])
-    ).all()
-
-    if not categories:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='No matching categories found for this user.')
+    if old_name == new_name:
+        return {'message' : 'Old and New category are the same; nothing to do.'}
 
-    category_ids = [c.id for c in categories]
+    if background:
+        # Imported here so API startup doesn't load Celery
+        from tasks.category_tasks import merge_category_task, merge_task_id
+        task_id = merge_task_id(user.get('id'))
+        merge_category_task.apply_async(args=(user.get('id'), old_name, new_name), task_id=task_id)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {'message' : f"Moving expenses from '{old_name}' to '{new_name}'.", 'task_id' : task_id}
 
     try:
-        bulk_delete_query = """
-            DELETE FROM expenses
-            WHERE user_id = :user_id AND category_id in :category_ids
-            RETURNING id
-        """
-
-        result = db.execute(bulk_delete_query , {
-            'user_id' : user.get('id'),
-            'category_ids' : tuple(category_ids)
-        })
-
-        deleted_ids = [r[0] for r in result.fetchall()]
-        db.commit()
-        return {
-            'message' : f'Deleted {len(deleted_ids)} expenses under categories : {category_names}',
-            'deleted_ids' : deleted_ids,
-            'categories_resolved' : {c.name : c.id for c in categories}
-        }
-
-    except Exception as e:
+        # Chunked, synchronous DB work: keep it off the event loop
+        result = await run_in_threadpool(merge_category, db, user.get('id'), old_name, new_name,
+                                         include_ids=include_ids)
+    except Exception as exc:
         db.rollback()
-        raise HTTPException(status_code=500, detail=f'Rollback due to error : {str(e)}')
-
-
-
-
+        raise HTTPException(status_code=500, detail=f"Failed to update expenses : {str(exc)}")
 
+    if result is None:
+        return {'message' : f'No category name {old_name} found for this user.', 'updated_count' : 0}
 
+    if result['renamed']:
+        message = f"Category '{old_name}' renamed to '{new_name}'."
+    else:
+        message = f"{result['updated_count']} expenses moved from '{old_name}' to '{new_name}'."
+    return {'message' : message, **result}
 
 
+@router.get('/category_merge/{task_id}', status_code=status.HTTP_200_OK)
+async def category_merge_status(task_id : str, user : user_dependency):
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid User')
+    if not task_id.startswith(f"merge-category-{user.get('id')}-"):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Task not found')
+
+    from tasks.category_tasks import merge_category_task
+    result = merge_category_task.AsyncResult(task_id)
+    if result.state == 'FAILURE':
+        return {'status' : result.state, 'error' : str(result.info)}
+    # PENDING: queued, PROGRESS: counts so far, SUCCESS: final counts
+    return {'status' : result.state, **(result.info if isinstance(result.info, dict) else {})}
+
+# One statement shape for every predicate combination: unused predicates get NULL
+# and are short-circuited, lists are bound as arrays for = ANY(...).
+BULK_DELETE_PREDICATES = """
+    FROM expenses e
+    WHERE e.owner_id = :owner_id
+    AND (CAST(:ids AS integer[]) IS NULL OR e.id = ANY(CAST(:ids AS integer[])))
+    AND (CAST(:category_names AS varchar[]) IS NULL OR e.category_id IN (
+        SELECT c.id FROM categories c
+        WHERE c.owner_id = :owner_id
+        AND c.name = ANY(CAST(:category_names AS varchar[]))
+    ))
+    AND (CAST(:start_date AS date) IS NULL OR e.date >= CAST(:start_date AS date))
+    AND (CAST(:end_date AS date) IS NULL OR e.date <= CAST(:end_date AS date))
+    AND NOT (CAST(:check_archives AS boolean) AND EXISTS (
+        SELECT 1 FROM expense_archives ea
+        WHERE ea.owner_id = :owner_id
+        AND (CAST(:start_date AS date) IS NULL OR ea.year * 12 + ea.month >=
+             EXTRACT(YEAR FROM CAST(:start_date AS date)) * 12 + EXTRACT(MONTH FROM CAST(:start_date AS date)))
+        AND (CAST(:end_date AS date) IS NULL OR ea.year * 12 + ea.month <=
+             EXTRACT(YEAR FROM CAST(:end_date AS date)) * 12 + EXTRACT(MONTH FROM CAST(:end_date AS date)))
+    ))
+"""
+
+bulk_delete_query = text(
+    """
+    WITH summary_version AS (
+        INSERT INTO expense_summary_versions (owner_id, version) VALUES (:owner_id, 1)
+        ON CONFLICT (owner_id) DO UPDATE SET version = expense_summary_versions.version + 1
+        RETURNING version
+    )
+    DELETE""" + BULK_DELETE_PREDICATES
+    + "RETURNING e.id, e.amount, (SELECT c.name FROM categories c WHERE c.id = e.category_id) AS name, "
+    + "(SELECT version FROM summary_version) AS summary_version"
+)
+bulk_delete_count_query = text("SELECT COUNT(*)" + BULK_DELETE_PREDICATES)
 
 
+@router.delete('/bulk_delete_expenses', status_code=status.HTTP_200_OK)
+async def bulk_delete_expenses(request : BulkDeleteRequest,
+                               db : async_shard_db_dependency,
+                               user : user_dependency):
 
+    """
+    Delete a user's expenses matching any combination of ids, category names and date range.
+    All given predicates must match. dry_run only counts the matching rows.
+    """
 
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid User')
 
+    if not (request.ids or request.category_names or request.start_date or request.end_date):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail='Provide at least one of ids, category_names, start_date, end_date.')
 
+    if request.start_date and request.end_date and request.start_date > request.end_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='start_date must be before end_date.')
 
+    # Archived expenses only exist in archive files and their monthly rollups, which a DELETE on
+    # expenses can't reach: a range/category delete overlapping archived months matches nothing
+    # (the check is part of the statement), and only then is the overlap looked up to answer 409
+    check_archives = bool(request.category_names or request.start_date or request.end_date)
+    params = {
+        'owner_id' : user.get('id'),
+        'ids' : request.ids or None,
+        'category_names' : [name.strip() for name in request.category_names] if request.category_names else None,
+        'start_date' : request.start_date,
+        'end_date' : request.end_date,
+        'check_archives' : check_archives
+    }
 
+    async def touches_archive() -> bool:
+        return check_archives and \
+            await has_archived_months(db, user.get('id'), request.start_date, request.end_date)
 
+    archived_conflict = HTTPException(status_code=status.HTTP_409_CONFLICT,
+                                      detail='The range includes archived months, whose expenses cannot be deleted. '
+                                             'Limit it to months after the archive horizon.')
 
+    if request.dry_run:
+        result = await db.execute(bulk_delete_count_query, params)
+        matched_count = result.scalar()
+        if not matched_count and await touches_archive():
+            raise archived_conflict
+        return {'dry_run' : True, 'matched_count' : matched_count}
 
+    try:
+        result = await db.execute(bulk_delete_query, params)
+        rows = result.fetchall()
+        deleted_ids = [r.id for r in rows]
+        if rows:
+            await db.commit()
+            await bump_user_version_async(user.get('id'))
+            publish_summary_delta(user.get('id'), rows[0].summary_version, removed_amounts(rows))
+        else:
+            # Nothing deleted: undo the summary version bump so caches and ETags stay valid
+            await db.rollback()
+            if await touches_archive():
+                raise archived_conflict
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f'Rollback due to error : {str(e)}')
 
+    return {
+        'message' : f'Deleted {len(deleted_ids)} expenses',
+        'deleted_count' : len(deleted_ids),
+        'deleted_ids' : deleted_ids
+    }
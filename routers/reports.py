@@ -1,9 +1,9 @@
-from datetime import date
+import datetime
 
-from fastapi import APIRouter, HTTPException, status
-from dependencies import db_dependency, user_dependency
-from models import User
-from tasks.email_tasks import send_monthly_expense_report
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Path, Query, status
+from dependencies import shard_db_dependency, user_dependency
+from services.report_service import get_monthly_report_snapshot, previous_month
 
 router = APIRouter(
     prefix="/reports",
@@ -12,32 +12,60 @@ router = APIRouter(
 
 @router.post("/run-monthly", status_code = status.HTTP_202_ACCEPTED)
 async def run_monthly_reports(
-        db : db_dependency,
-        user : user_dependency
+        user : user_dependency,
+        year : Optional[int] = Query(None, ge=2000, le=2100, description='Defaults to the previous month'),
+        month : Optional[int] = Query(None, ge=1, le=12)
 ):
 
     if user["role"] != "admin":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="Admin access required")
 
-    today = date.today()
-    year = today.year
-    month = today.month
+    # Same month as the Beat run by default. A run completes its month for good (snapshots are
+    # emailed and the run is marked completed), so a month that hasn't ended can't be reported.
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    if year is None and month is None:
+        year, month = previous_month(today)
+    elif year is None or month is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Give both year and month, or neither')
+    if (year, month) >= (today.year, today.month):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f'{month}/{year} has not ended yet; reports cover finished months only')
 
-    users = db.query(User).all()
+    # Imported here: loading Celery + the email stack is only needed when reports are queued
+    from tasks.report_tasks import run_monthly_reports as run_monthly_reports_task
 
-    if not users:
-        return {"message": "No users found"}
-
-    # Queue one task per user
-    for u in users:
-        send_monthly_expense_report.delay(
-            user_id = u.id,
-            email = u.email
-        )
+    # The run task queues users in batches and records its progress, so calling this
+    # again for the same month resumes / no-ops instead of re-sending every email
+    run_monthly_reports_task.delay(year = year, month = month)
 
     return {
-        "message" : "Monthly expense reports queued",
-        "users_processes" : len(users),
+        "message" : "Monthly expense report run queued",
         "month" : f"{month}/{year}"
-    }
\ No newline at end of file
+    }
+
+# Plain def: the snapshot is read through a sync session, which FastAPI runs in its threadpool
+@router.get("/{year}/{month}", status_code = status.HTTP_200_OK)
+def read_monthly_report(
+        db : shard_db_dependency,
+        user : user_dependency,
+        year : int = Path(ge=2000, le=2100),
+        month : int = Path(ge=1, le=12)
+):
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid User')
+
+    # Served from the stored snapshot only; expenses are not touched
+    snapshot = get_monthly_report_snapshot(db = db, user_id = user.get('id'), year = year, month = month)
+    if snapshot is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='No report for this month')
+
+    return {
+        "year" : snapshot.year,
+        "month" : snapshot.month,
+        "summary" : snapshot.summary,
+        "total" : snapshot.total,
+        "computed_at" : snapshot.computed_at,
+        "emailed_at" : snapshot.emailed_at,
+        "html" : snapshot.html
+    }
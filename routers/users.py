@@ -1,9 +1,12 @@
+from datetime import datetime, timezone
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
 from starlette import status
-from dependencies import db_dependency, user_dependency
+from dependencies import db_dependency, user_dependency, token_user_dependency
 from models import User
 from security import verify_password, hash_password
+from services.token_service import revoke_user_refresh_tokens
+from services.account_service import mark_account_deleted
 
 router = APIRouter(
     prefix='/user',
@@ -31,20 +34,50 @@ async def change_password(request : UserVerification,
     user_model = db.query(User).filter_by(id=user.get('id')).first()
     if verify_password(request.old_password, user_model.hashed_password):
         user_model.hashed_password = hash_password(request.new_password)
+        # Sessions started with the old password end with their current access token
+        revoke_user_refresh_tokens(db, user_model.id)
     db.add(user_model)
     db.commit()
     return {'message' : 'Password Updated Successfully'}
 
-@router.delete('/delete_profile', status_code=status.HTTP_204_NO_CONTENT)
-async def delete_profile(user : user_dependency, db : db_dependency,
+@router.delete('/delete_profile', status_code=status.HTTP_202_ACCEPTED)
+async def delete_profile(user : token_user_dependency, db : db_dependency,
                          request : DeleteProfileRequest):
+    """
+    Marks the account as deleted (no more logins) and removes its data in a background task,
+    in chunks; progress at GET /user/delete_profile.
+    """
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail = 'Invalid User')
     user_model = db.query(User).filter_by(id=user.get('id')).first()
-    if verify_password(request.userPassword, user_model.hashed_password):
-        db.delete(user_model)
-        db.commit()
-        return {'message': 'User Deleted'}
-    else :
+    if user_model is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='User not found')
+    if not verify_password(request.userPassword, user_model.hashed_password):
         raise HTTPException(status_code=401, detail='Invalid Password')
 
+    # Imported here so API startup doesn't load Celery
+    from tasks.account_tasks import delete_user_account, deletion_task_id
+    task_id = deletion_task_id(user_model.id)
+
+    # The user row still exists, so the deletion hasn't finished: queue it again unless a worker
+    # is on it. A lost message or an expired result both read as PENDING, so that can't be
+    # told apart from "queued" and is re-queued too; the task is safe to run twice.
+    if user_model.deleted_at is None or \
+            delete_user_account.AsyncResult(task_id).state not in ('STARTED', 'PROGRESS'):
+        user_model.deleted_at = user_model.deleted_at or datetime.now(timezone.utc)
+        db.commit()
+        mark_account_deleted(user_model.id)
+        delete_user_account.apply_async(args=(user_model.id,), task_id=task_id)
+    return {'message': 'User deletion started', 'task_id': task_id}
+
+@router.get('/delete_profile', status_code=status.HTTP_200_OK)
+async def account_deletion_status(user : token_user_dependency):
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail = 'Invalid User')
+
+    from tasks.account_tasks import delete_user_account, deletion_task_id
+    result = delete_user_account.AsyncResult(deletion_task_id(user.get('id')))
+    if result.state == 'FAILURE':
+        return {'status' : result.state, 'error' : str(result.info)}
+    # PENDING: queued (or never requested), PROGRESS/SUCCESS carry the counts
+    return {'status' : result.state, **(result.info if isinstance(result.info, dict) else {})}
@@ -1,3 +1,5 @@
+import hashlib
+import secrets
 from passlib.context import CryptContext
 
 bcrypt_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
@@ -6,4 +8,12 @@ def hash_password(password : str) -> str:
     return bcrypt_context.hash(password)
 
 def verify_password(plain_password:str, hashed_password:str) -> bool:
-    return bcrypt_context.verify(plain_password, hashed_password)
\ No newline at end of file
+    return bcrypt_context.verify(plain_password, hashed_password)
+
+# Refresh tokens are 256 random bits, so a fast hash is enough to store them;
+# bcrypt's work factor only matters for guessable secrets like passwords
+def new_refresh_token() -> str:
+    return secrets.token_urlsafe(32)
+
+def hash_refresh_token(token : str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
@@ -0,0 +1,95 @@
+import os
+import time
+from typing import Callable, Optional
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from database import SessionLocal, shards
+from models import User, Expense, Category
+from services.archive_service import delete_user_archives
+from services.cache import LRUCache
+
+# Rows deleted per transaction: each chunk holds its row locks only until its commit
+ACCOUNT_DELETE_CHUNK_SIZE = int(os.getenv("ACCOUNT_DELETE_CHUNK_SIZE", 5000))
+
+# Access tokens of a deleted account stop working within this many seconds (their own expiry
+# is ACCESS_TOKEN_EXPIRES_MINUTES): how long a worker trusts its last look at users.deleted_at
+ACCOUNT_STATUS_CACHE_SECONDS = float(os.getenv("ACCOUNT_STATUS_CACHE_SECONDS", 10))
+
+account_status_cache = LRUCache()  # user_id -> (checked_at, deleted)
+
+
+def is_account_deleted(user_id : int) -> bool:
+    """True if the account is marked deleted or already gone (user directory, DATABASE_URL)."""
+    now = time.monotonic()
+    cached = account_status_cache.get(user_id)
+    if cached is not None and now - cached[0] < ACCOUNT_STATUS_CACHE_SECONDS:
+        return cached[1]
+    db = SessionLocal()
+    try:
+        row = db.execute(select(User.deleted_at).where(User.id == user_id)).first()
+    finally:
+        db.close()
+    deleted = row is None or row.deleted_at is not None
+    account_status_cache.set(user_id, (now, deleted))
+    return deleted
+
+
+def mark_account_deleted(user_id : int) -> None:
+    """Takes effect at once in this worker; others notice within ACCOUNT_STATUS_CACHE_SECONDS."""
+    account_status_cache.set(user_id, (time.monotonic(), True))
+
+
+def _delete_chunk(db : Session, model, user_id : int, chunk_size : int) -> int:
+    chunk_ids = select(model.id).where(model.owner_id == user_id).limit(chunk_size).scalar_subquery()
+    result = db.execute(delete(model).where(model.owner_id == user_id, model.id.in_(chunk_ids)))
+    db.commit()
+    return result.rowcount
+
+
+def delete_user_data(db : Session,
+                     user_id : int,
+                     chunk_size : int = ACCOUNT_DELETE_CHUNK_SIZE,
+                     on_progress : Optional[Callable[[dict], None]] = None) -> dict:
+    """
+    Deletes a user's expenses and categories in bounded chunks (one commit each), then the
+    archive files and finally the user row; ON DELETE CASCADE removes the small remaining
+    per-user rows (report snapshots, archived totals). Safe to rerun after a crash.
+    """
+    progress = {'expenses_deleted' : 0, 'categories_deleted' : 0, 'archive_files_deleted' : 0}
+
+    for model, key in ((Expense, 'expenses_deleted'), (Category, 'categories_deleted')):
+        while True:
+            deleted = _delete_chunk(db, model, user_id, chunk_size)
+            if not deleted:
+                break
+            progress[key] += deleted
+            if on_progress:
+                on_progress(progress)
+
+    progress['archive_files_deleted'] = delete_user_archives(db, user_id)
+
+    db.execute(delete(User).where(User.id == user_id))
+    db.commit()
+    return progress
+
+
+def add_user_to_shard(user : User) -> None:
+    """
+    Copies a newly registered user to their shard, where expenses/categories reference it.
+    Login data stays in the user directory (DATABASE_URL): the copy has no password.
+    No-op unsharded, or when the shard is the directory itself.
+    """
+    if not shards.sharded:
+        return
+    db = shards.session(user.id)
+    try:
+        db.execute(
+            pg_insert(User)
+            .values(id = user.id, email = user.email, hashed_password = '', role = user.role,
+                    created_at = user.created_at, updated_at = user.updated_at)
+            .on_conflict_do_nothing()
+        )
+        db.commit()
+    finally:
+        db.close()
@@ -0,0 +1,165 @@
+import itertools
+from datetime import date
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.cache import LRUCache
+from services.live_updates import get_summary_version
+
+ANOMALY_THRESHOLD = 3.5      # robust z-score (median / MAD) above which an expense is flagged
+ANOMALY_MIN_EXPENSES = 5     # categories with fewer expenses are never flagged
+MAX_ANOMALIES = 50
+
+# One row per category holding that category's expenses as arrays (columnar, no ORM objects)
+category_arrays_query = text("""
+    SELECT c.name,
+           array_agg(e.id) AS ids,
+           array_agg(e.amount) AS amounts,
+           array_agg(e.date) AS dates
+    FROM expenses e
+    JOIN categories c ON e.category_id = c.id
+    WHERE e.owner_id = :owner_id
+    AND e.date IS NOT NULL
+    GROUP BY c.name
+    ORDER BY c.name
+""")
+
+# Results keyed by (user_id, data version, current month). The data version is the
+# database-held one every write bumps, so all workers see it; month-over-month figures end at
+# the current month, so they change when it does even if the data doesn't
+analytics_cache = LRUCache(max_entries=1000)
+
+
+def _to_list(values : np.ndarray, decimals : int = 2) -> list:
+    """JSON friendly list: rounded, NaN -> None."""
+    rounded = np.round(values.astype(float), decimals)
+    return [None if np.isnan(v) else float(v) for v in rounded]
+
+
+def _group_quantile(sorted_values : np.ndarray, starts : np.ndarray, counts : np.ndarray, q : float) -> np.ndarray:
+    """
+    Quantile of every group at once. sorted_values holds the groups back to back,
+    each sorted ascending; uses linear interpolation like np.percentile.
+    """
+    position = starts + q * (counts - 1)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.ceil(position).astype(np.int64)
+    fraction = position - lower
+    return sorted_values[lower] * (1 - fraction) + sorted_values[upper] * fraction
+
+
+def compute_expense_statistics(names : list[str], codes : np.ndarray, amounts : np.ndarray,
+                               dates : np.ndarray, ids : np.ndarray, today : date | None = None) -> dict:
+    """
+    Per-category distribution statistics, month-over-month totals and anomaly flags.
+    codes[i] is the index into names of expense i; dates are datetime64[D].
+    """
+    if amounts.size == 0:
+        return {
+            'expense_count' : 0,
+            'categories' : {'names' : []},
+            'monthly' : {'months' : [], 'totals' : [], 'delta' : [], 'pct_change' : []},
+            'anomalies' : []
+        }
+
+    k = len(names)
+
+    # ---------- per-category distribution ----------
+    order = np.lexsort((amounts, codes))
+    sorted_amounts = amounts[order]
+    sorted_codes = codes[order]
+    counts = np.bincount(codes, minlength=k)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    totals = np.bincount(codes, weights=amounts, minlength=k)
+    medians = _group_quantile(sorted_amounts, starts, counts, 0.5)
+
+    # ---------- monthly totals + month-over-month ----------
+    months = dates.astype('datetime64[M]')
+    first_month = months.min()
+    last_month = max(months.max(), np.datetime64(today or date.today(), 'M'))
+    n_months = int((last_month - first_month).astype(np.int64)) + 1
+    month_index = (months - first_month).astype(np.int64)
+
+    monthly_totals = np.bincount(month_index, weights=amounts, minlength=n_months)
+    previous = np.concatenate(([np.nan], monthly_totals[:-1]))
+    delta = monthly_totals - previous
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct_change = np.where(previous > 0, delta / previous * 100, np.nan)
+
+    per_category_month = np.bincount(
+        codes * n_months + month_index, weights=amounts, minlength=k * n_months
+    ).reshape(k, n_months)
+    last_totals = per_category_month[:, -1]
+    previous_totals = per_category_month[:, -2] if n_months > 1 else np.zeros(k)
+
+    # ---------- anomalies: robust z-score within the category ----------
+    deviation = sorted_amounts - medians[sorted_codes]
+    abs_deviation = np.abs(deviation)
+    mad = _group_quantile(abs_deviation[np.lexsort((abs_deviation, sorted_codes))], starts, counts, 0.5)
+    scale = 1.4826 * mad[sorted_codes]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        score = np.where(scale > 0, deviation / scale, 0.0)
+    flagged = np.flatnonzero((score > ANOMALY_THRESHOLD) & (counts[sorted_codes] >= ANOMALY_MIN_EXPENSES))
+    flagged = flagged[np.argsort(-score[flagged])][:MAX_ANOMALIES]
+
+    sorted_ids = ids[order]
+    sorted_dates = dates[order]
+    anomalies = [
+        {
+            'id' : int(sorted_ids[i]),
+            'date' : str(sorted_dates[i]),
+            'category' : names[sorted_codes[i]],
+            'amount' : float(sorted_amounts[i]),
+            'category_median' : round(float(medians[sorted_codes[i]]), 2),
+            'score' : round(float(score[i]), 2)
+        } for i in flagged
+    ]
+
+    return {
+        'expense_count' : int(amounts.size),
+        'categories' : {
+            'names' : names,
+            'count' : counts.tolist(),
+            'total' : _to_list(totals),
+            'mean' : _to_list(totals / counts),
+            'median' : _to_list(medians),
+            'p25' : _to_list(_group_quantile(sorted_amounts, starts, counts, 0.25)),
+            'p75' : _to_list(_group_quantile(sorted_amounts, starts, counts, 0.75)),
+            'p90' : _to_list(_group_quantile(sorted_amounts, starts, counts, 0.90)),
+            'p95' : _to_list(_group_quantile(sorted_amounts, starts, counts, 0.95)),
+            'last_month_total' : _to_list(last_totals),
+            'previous_month_total' : _to_list(previous_totals),
+            'mom_delta' : _to_list(last_totals - previous_totals)
+        },
+        'monthly' : {
+            'months' : [str(m) for m in np.arange(first_month, last_month + 1)],
+            'totals' : _to_list(monthly_totals),
+            'delta' : _to_list(delta),
+            'pct_change' : _to_list(pct_change)
+        },
+        'anomalies' : anomalies
+    }
+
+
+async def get_expense_analytics(db : AsyncSession, user_id : int) -> dict:
+    today = date.today()
+    key = (user_id, await get_summary_version(db, user_id), today.year, today.month)
+    cached = analytics_cache.get(key)
+    if cached is not None:
+        return cached
+
+    rows = (await db.execute(category_arrays_query, {'owner_id' : user_id})).all()
+    lengths = [len(row.amounts) for row in rows]
+    total = sum(lengths)
+
+    names = [row.name for row in rows]
+    codes = np.repeat(np.arange(len(rows)), lengths)
+    amounts = np.fromiter(itertools.chain.from_iterable(row.amounts for row in rows), dtype=np.float64, count=total)
+    ids = np.fromiter(itertools.chain.from_iterable(row.ids for row in rows), dtype=np.int64, count=total)
+    dates = np.array(list(itertools.chain.from_iterable(row.dates for row in rows)), dtype='datetime64[D]')
+
+    # NumPy work of large histories would hold the event loop for tens of milliseconds
+    result = await run_in_threadpool(compute_expense_statistics, names, codes, amounts, dates, ids, today)
+    analytics_cache.set(key, result)
+    return result
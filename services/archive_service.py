@@ -0,0 +1,282 @@
+import datetime
+import gzip
+import heapq
+import json
+import logging
+import os
+import re
+import uuid
+from datetime import date
+from typing import Iterable, Iterator, Optional
+from sqlalchemy import select, delete, text, any_, bindparam, Integer
+from sqlalchemy.dialects.postgresql import insert as pg_insert, ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from models import Expense, Category, CategoryMerge, ExpenseArchive, ArchivedExpenseTotal
+from services.cache import bump_user_version
+from services.live_updates import summary_version_bump
+
+logger = logging.getLogger(__name__)
+
+# Expenses older than ARCHIVE_AFTER_MONTHS whole months are moved out of the expenses table
+# into one NDJSON.gz file per user/month (ARCHIVE_DIR/<owner_id>/<YYYY-MM>-<part>.ndjson.gz).
+# Their per category totals go to archived_expense_totals, so summaries stay complete.
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+ARCHIVE_AFTER_MONTHS = int(os.getenv("ARCHIVE_AFTER_MONTHS", 24))
+
+archivable_months_query = text("""
+    SELECT owner_id, CAST(date_trunc('month', date) AS date) AS month_start
+    FROM expenses
+    WHERE date < :horizon
+    AND (CAST(:owner_id AS integer) IS NULL OR owner_id = :owner_id)
+    GROUP BY 1, 2
+    ORDER BY 1, 2
+""")
+
+# Locks the month's rows, so an update can't slip in between writing the file and deleting them
+month_expenses_query = (
+    select(
+        Expense.id,
+        Expense.amount,
+        Expense.description,
+        Expense.date,
+        Expense.category_id,
+        Category.name.label('category'),
+        Expense.created_at,
+        Expense.updated_at
+    )
+    .join(Category, Expense.category_id == Category.id)
+    .where(
+        Expense.owner_id == bindparam('owner_id'),
+        Expense.date >= bindparam('start_date'),
+        Expense.date < bindparam('end_date')
+    )
+    .order_by(Expense.date, Expense.id)
+    .with_for_update(of=Expense)
+)
+
+delete_archived_query = delete(Expense).where(
+    Expense.owner_id == bindparam('owner_id'),
+    Expense.date >= bindparam('start_date'),
+    Expense.date < bindparam('end_date'),
+    Expense.id == any_(bindparam('ids', type_=ARRAY(Integer)))
+)
+
+
+def archive_horizon(months : int = ARCHIVE_AFTER_MONTHS, today : Optional[date] = None) -> date:
+    """First day of the oldest month that stays in the expenses table."""
+    today = today or date.today()
+    month_index = today.year * 12 + today.month - 1 - months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def month_end(month_start : date) -> date:
+    """First day of the following month (exclusive bound)."""
+    return date(month_start.year + 1, 1, 1) if month_start.month == 12 else date(month_start.year, month_start.month + 1, 1)
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+
+def write_archive_file(rows : Iterable[dict], relative_path : str) -> None:
+    """Writes the rows as NDJSON.gz; the file only appears under its final name once complete."""
+    path = os.path.join(ARCHIVE_DIR, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as out:
+            for row in rows:
+                out.write(json.dumps(row, default=_json_default).encode() + b"\n")
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp_path, path)
+
+
+def archive_user_month(db : Session, owner_id : int, month_start : date) -> int:
+    """
+    Moves one user's expenses of one month into an archive file and returns how many were moved.
+
+    The file is written first, then the manifest row, the rollup and the delete are committed
+    together. A crash in between leaves an unreferenced file and the rows still in place;
+    the next run archives them again into a new part.
+    """
+    params = {'owner_id' : owner_id, 'start_date' : month_start, 'end_date' : month_end(month_start)}
+    rows = [dict(row) for row in db.execute(month_expenses_query, params).mappings()]
+    if not rows:
+        db.rollback()
+        return 0
+
+    relative_path = f"{owner_id}/{month_start:%Y-%m}-{uuid.uuid4().hex[:8]}.ndjson.gz"
+    write_archive_file(rows, relative_path)
+
+    totals : dict[int, list] = {}
+    for row in rows:
+        category_total = totals.setdefault(row['category_id'], [0.0, 0])
+        category_total[0] += row['amount']
+        category_total[1] += 1
+
+    try:
+        db.add(ExpenseArchive(
+            owner_id = owner_id,
+            year = month_start.year,
+            month = month_start.month,
+            path = relative_path,
+            row_count = len(rows),
+            total = sum(row['amount'] for row in rows)
+        ))
+        rollup = pg_insert(ArchivedExpenseTotal).values([
+            {'owner_id' : owner_id, 'category_id' : category_id, 'year' : month_start.year,
+             'month' : month_start.month, 'total' : total, 'count' : count}
+            for category_id, (total, count) in totals.items()
+        ])
+        # An earlier part of the same month may already be archived
+        db.execute(rollup.on_conflict_do_update(
+            constraint = 'uq_archived_total_category_month',
+            set_ = {
+                'total' : ArchivedExpenseTotal.total + rollup.excluded.total,
+                'count' : ArchivedExpenseTotal.count + rollup.excluded.count
+            }
+        ))
+        db.execute(delete_archived_query, {**params, 'ids' : [row['id'] for row in rows]})
+        db.execute(summary_version_bump([owner_id]))  # totals unchanged, but the expense list isn't
+        db.commit()
+    except Exception:
+        db.rollback()
+        os.remove(os.path.join(ARCHIVE_DIR, relative_path))
+        raise
+    return len(rows)
+
+
+def find_archivable_months(db : Session, horizon : date, owner_id : Optional[int] = None) -> list[tuple[int, date]]:
+    result = db.execute(archivable_months_query, {'horizon' : horizon, 'owner_id' : owner_id})
+    return [(row.owner_id, row.month_start) for row in result]
+
+
+def archive_old_expenses(db : Session, horizon : date, owner_id : Optional[int] = None) -> dict:
+    """Archives every user/month older than horizon, one transaction per user/month."""
+    archived_rows = 0
+    archived_months = 0
+    for user_id, month_start in find_archivable_months(db, horizon, owner_id):
+        moved = archive_user_month(db, user_id, month_start)
+        if moved:
+            bump_user_version(user_id)
+            archived_rows += moved
+            archived_months += 1
+    logger.info(f"Archived expenses before {horizon} | months={archived_months} | rows={archived_rows}")
+    return {'horizon' : horizon.isoformat(), 'months' : archived_months, 'rows' : archived_rows}
+
+
+def delete_user_archives(db : Session, owner_id : int) -> int:
+    """
+    Removes the user's archive files and their manifest rows, returns the number of files.
+    Files go first: a crash afterwards leaves manifest rows pointing at missing files,
+    which a rerun deletes, never archived data without a manifest row.
+    """
+    paths = db.execute(select(ExpenseArchive.path).where(ExpenseArchive.owner_id == owner_id)).scalars().all()
+    for relative_path in paths:
+        try:
+            os.remove(os.path.join(ARCHIVE_DIR, relative_path))
+        except FileNotFoundError:
+            pass
+    user_dir = os.path.join(ARCHIVE_DIR, str(owner_id))
+    if os.path.isdir(user_dir) and not os.listdir(user_dir):
+        os.rmdir(user_dir)
+
+    db.execute(delete(ExpenseArchive).where(ExpenseArchive.owner_id == owner_id))
+    db.commit()
+    return len(paths)
+
+
+#---------------- Read-back ----------------
+
+async def list_archive_files(db : AsyncSession, owner_id : int, start_date : date, end_date : date) -> list[str]:
+    """Archive files of the user that may hold expenses between start_date and end_date."""
+    start_key = start_date.year * 12 + start_date.month
+    end_key = end_date.year * 12 + end_date.month
+    result = await db.execute(
+        select(ExpenseArchive.path)
+        .where(
+            ExpenseArchive.owner_id == owner_id,
+            (ExpenseArchive.year * 12 + ExpenseArchive.month).between(start_key, end_key)
+        )
+        .order_by(ExpenseArchive.year, ExpenseArchive.month, ExpenseArchive.id)
+    )
+    return list(result.scalars())
+
+
+async def has_archived_months(db : AsyncSession, owner_id : int,
+                              start_date : Optional[date], end_date : Optional[date]) -> bool:
+    """Whether any archived month of the user overlaps the range (None: open ended)."""
+    query = select(ExpenseArchive.id).where(ExpenseArchive.owner_id == owner_id)
+    month_key = ExpenseArchive.year * 12 + ExpenseArchive.month
+    if start_date is not None:
+        query = query.where(month_key >= start_date.year * 12 + start_date.month)
+    if end_date is not None:
+        query = query.where(month_key <= end_date.year * 12 + end_date.month)
+    return (await db.execute(query.limit(1))).first() is not None
+
+
+async def get_category_names(db : AsyncSession, owner_id : int) -> dict[int, str]:
+    """Current name per category id, including ids of merged (deleted) categories."""
+    current = select(Category.id, Category.name).where(Category.owner_id == owner_id)
+    merged = (
+        select(CategoryMerge.old_category_id, Category.name)
+        .join(Category, CategoryMerge.new_category_id == Category.id)
+        .where(CategoryMerge.owner_id == owner_id)
+    )
+    result = await db.execute(current.union_all(merged))
+    return {row[0] : row[1] for row in result}
+
+
+def _read_archive_file(relative_path : str) -> Iterator[dict]:
+    with gzip.open(os.path.join(ARCHIVE_DIR, relative_path), "rt") as lines:
+        for line in lines:
+            row = json.loads(line)
+            row['date'] = date.fromisoformat(row['date'])
+            yield row
+
+
+def iter_archived_expenses(paths : list[str], start_date : date, end_date : date,
+                           category_names : dict[int, str],
+                           after : Optional[tuple[date, int]] = None) -> Iterator[dict]:
+    """
+    Streams archived expenses between start_date and end_date (inclusive) in (date, id) order,
+    with the same keys as the filter_expenses response. Each file is sorted, so files are
+    merged lazily; only one row per file is held in memory.
+    Category names are the current ones (renames apply, merged categories resolve through
+    category_names), falling back to the archived name.
+    """
+    merged = heapq.merge(*(_read_archive_file(p) for p in paths), key=lambda r: (r['date'], r['id']))
+    for row in merged:
+        if row['date'] < start_date or (after is not None and (row['date'], row['id']) <= after):
+            continue
+        if row['date'] > end_date:
+            break
+        yield {
+            'id' : row['id'],
+            'amount' : row['amount'],
+            'category' : category_names.get(row['category_id'], row['category']),
+            'description' : row['description'],
+            'date' : row['date']
+        }
+
+
+def archived_expense_matches(row : dict, categories : Optional[list[str]] = None,
+                             min_amount : Optional[float] = None, max_amount : Optional[float] = None,
+                             text_query : Optional[str] = None) -> bool:
+    """Python counterpart of search_service.expense_filter_conditions for archived rows."""
+    if categories and row['category'] not in {c.strip() for c in categories}:
+        return False
+    if min_amount is not None and row['amount'] < min_amount:
+        return False
+    if max_amount is not None and row['amount'] > max_amount:
+        return False
+    if text_query:
+        # plainto_tsquery('simple', ...): every word must occur in the description
+        words = set(re.findall(r"\w+", (row['description'] or "").lower()))
+        if not all(word in words for word in re.findall(r"\w+", text_query.lower())):
+            return False
+    return True
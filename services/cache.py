@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+# Per-user write tracking.
+# Every write to a user's expenses/categories calls bump_user_version after its commit, which
+# feeds read-your-writes routing (wrote_recently). Caches and ETags are keyed by the data
+# version held in the database instead (services.live_updates.get_summary_version), which
+# every worker sees as soon as the write commits.
+#
+# State lives in-process by default. With several API workers (or Celery tasks that
+# mutate data) set CACHE_REDIS_URL so all processes share it.
+# Async code (request handlers, dependencies) uses the *_async variants: with Redis they
+# don't block the event loop, in-process they are the same dict operations.
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 10_000))
+
+# Read-your-writes: for this many seconds after a write, the user's reads skip the
+# replicas (see database.open_async_read_session). Should exceed the usual replica lag.
+READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", 5))
+
+_VERSION_KEY = "user_data_version:{user_id}"
+_RECENT_WRITE_KEY = "user_recent_write:{user_id}"
+
+_local_versions : dict[int, int] = {}
+_local_last_write : dict[int, float] = {}
+_redis_client = None
+_async_redis_client = None
+
+
+def _redis():
+    global _redis_client
+    if _redis_client is None:
+        import redis
+        _redis_client = redis.Redis.from_url(CACHE_REDIS_URL)
+    return _redis_client
+
+
+def _async_redis():
+    global _async_redis_client
+    if _async_redis_client is None:
+        import redis.asyncio as aioredis
+        _async_redis_client = aioredis.Redis.from_url(CACHE_REDIS_URL)
+    return _async_redis_client
+
+
+async def close_async_redis() -> None:
+    global _async_redis_client
+    if _async_redis_client is not None:
+        await _async_redis_client.aclose()
+        _async_redis_client = None
+
+
+def bump_user_version(user_id : int) -> int:
+    """Call after committing any change to the user's expenses or categories."""
+    if CACHE_REDIS_URL:
+        key = _VERSION_KEY.format(user_id=user_id)
+        pipe = _redis().pipeline()
+        pipe.hincrby(key, 'version', 1)
+        pipe.set(_RECENT_WRITE_KEY.format(user_id=user_id), 1, px=int(READ_YOUR_WRITES_SECONDS * 1000))
+        return int(pipe.execute()[0])
+    _local_last_write[user_id] = time.monotonic()
+    _local_versions[user_id] = _local_versions.get(user_id, 0) + 1
+    return _local_versions[user_id]
+
+
+async def bump_user_version_async(user_id : int) -> int:
+    if CACHE_REDIS_URL:
+        key = _VERSION_KEY.format(user_id=user_id)
+        pipe = _async_redis().pipeline()
+        pipe.hincrby(key, 'version', 1)
+        pipe.set(_RECENT_WRITE_KEY.format(user_id=user_id), 1, px=int(READ_YOUR_WRITES_SECONDS * 1000))
+        return int((await pipe.execute())[0])
+    return bump_user_version(user_id)
+
+
+def wrote_recently(user_id : int) -> bool:
+    """True within READ_YOUR_WRITES_SECONDS of the user's last bump_user_version."""
+    if CACHE_REDIS_URL:
+        return bool(_redis().exists(_RECENT_WRITE_KEY.format(user_id=user_id)))
+    last_write = _local_last_write.get(user_id)
+    return last_write is not None and time.monotonic() - last_write < READ_YOUR_WRITES_SECONDS
+
+
+async def wrote_recently_async(user_id : int) -> bool:
+    if CACHE_REDIS_URL:
+        return bool(await _async_redis().exists(_RECENT_WRITE_KEY.format(user_id=user_id)))
+    return wrote_recently(user_id)
+
+
+class LRUCache:
+    """Small thread-safe LRU map, used for version-keyed results."""
+
+    def __init__(self, max_entries : int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data : OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key : Hashable, default : Any = None) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key : Hashable, value : Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __contains__(self, key : Hashable) -> bool:
+        with self._lock:
+            return key in self._data
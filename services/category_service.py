@@ -0,0 +1,151 @@
+import datetime
+import os
+from typing import Callable, Optional
+from sqlalchemy import select, update, delete, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import Category
+from services.cache import bump_user_version
+from services.live_updates import summary_version_bump, publish_summary_resync
+
+# Expenses moved per transaction: row locks are only held until the chunk's commit
+CATEGORY_MERGE_CHUNK_SIZE = int(os.getenv("CATEGORY_MERGE_CHUNK_SIZE", 5000))
+
+# Next chunk in id order, served by ix_expenses_owner_category_id
+move_chunk_query = text("""
+    WITH chunk AS (
+        SELECT id FROM expenses
+        WHERE owner_id = :owner_id AND category_id = :old_cid AND id > :after_id
+        ORDER BY id
+        LIMIT :chunk_size
+    )
+    UPDATE expenses e
+    SET category_id = :new_cid, updated_at = :now
+    FROM chunk
+    WHERE e.id = chunk.id AND e.owner_id = :owner_id AND e.category_id = :old_cid
+    RETURNING e.id
+""")
+
+# Archived totals follow the expenses (services.archive_service)
+move_archived_totals_query = text("""
+    INSERT INTO archived_expense_totals (owner_id, category_id, year, month, total, count)
+    SELECT owner_id, :new_cid, year, month, total, count
+    FROM archived_expense_totals
+    WHERE owner_id = :owner_id AND category_id = :old_cid
+    ON CONFLICT ON CONSTRAINT uq_archived_total_category_month DO UPDATE
+    SET total = archived_expense_totals.total + excluded.total,
+        count = archived_expense_totals.count + excluded.count
+""")
+
+delete_archived_totals_query = text("""
+    DELETE FROM archived_expense_totals WHERE owner_id = :owner_id AND category_id = :old_cid
+""")
+
+# Archive files still hold the old category id: record where it went. Categories merged into
+# the old one earlier now resolve to the new one too, so every mapping is a single step.
+repoint_category_merges_query = text("""
+    UPDATE category_merges SET new_category_id = :new_cid
+    WHERE owner_id = :owner_id AND new_category_id = :old_cid
+""")
+
+record_category_merge_query = text("""
+    INSERT INTO category_merges (old_category_id, owner_id, new_category_id, merged_at)
+    VALUES (:old_cid, :owner_id, :new_cid, :now)
+""")
+
+
+def _find_category(db : Session, user_id : int, name : str) -> Optional[Category]:
+    return db.execute(select(Category).filter_by(owner_id=user_id, name=name)).scalar_one_or_none()
+
+
+def merge_category(db : Session,
+                   user_id : int,
+                   old_name : str,
+                   new_name : str,
+                   chunk_size : int = CATEGORY_MERGE_CHUNK_SIZE,
+                   include_ids : bool = False,
+                   on_progress : Optional[Callable[[dict], None]] = None) -> Optional[dict]:
+    """
+    Moves the user's expenses from category old_name to new_name and removes old_name.
+    Returns None if old_name doesn't exist.
+
+    If new_name doesn't exist yet this is a rename of the category row, no expense is touched.
+    Otherwise expenses move in id ordered chunks, one commit (and cache version bump) each.
+    The last step locks the old category, so no expense can be added to it, moves whatever
+    arrived meanwhile plus the archived totals, records the merge for archived expenses
+    (category_merges) and deletes it.
+    Safe to rerun after a failure: it continues with the rows still in the old category.
+    """
+    old_name, new_name = old_name.strip(), new_name.strip()
+    old = _find_category(db, user_id, old_name)
+    if old is None:
+        return None
+
+    result = {
+        'from_category_id' : old.id,
+        'to_category_id' : old.id,
+        'renamed' : False,
+        'updated_count' : 0,
+        'chunks' : 0
+    }
+    if include_ids:
+        result['updated_ids'] = []
+
+    new = _find_category(db, user_id, new_name)
+    if new is None:
+        try:
+            db.execute(
+                update(Category)
+                .where(Category.id == old.id)
+                .values(name=new_name, updated_at=datetime.datetime.now(datetime.timezone.utc))
+            )
+            db.execute(summary_version_bump([user_id]))
+            db.commit()
+            bump_user_version(user_id)
+            publish_summary_resync(user_id)
+            result['renamed'] = True
+            return result
+        except IntegrityError:
+            # new_name was created concurrently -> merge into it
+            db.rollback()
+            new = _find_category(db, user_id, new_name)
+    result['to_category_id'] = new.id
+
+    params = {'owner_id' : user_id, 'old_cid' : old.id, 'new_cid' : new.id, 'chunk_size' : chunk_size}
+
+    def move(after_id : int) -> list[int]:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        moved = [row[0] for row in db.execute(move_chunk_query, {**params, 'after_id' : after_id, 'now' : now})]
+        result['updated_count'] += len(moved)
+        if include_ids:
+            result['updated_ids'].extend(moved)
+        return moved
+
+    after_id = 0
+    while True:
+        moved = move(after_id)
+        if not moved:
+            break
+        db.execute(summary_version_bump([user_id]))
+        db.commit()
+        bump_user_version(user_id)
+        after_id = max(moved)
+        result['chunks'] += 1
+        if on_progress:
+            on_progress(result)
+
+    # Inserts into the old category wait on this lock; the rows they committed before are moved here
+    db.execute(select(Category.id).where(Category.id == old.id).with_for_update())
+    while move(0):
+        pass
+    db.execute(move_archived_totals_query, params)
+    db.execute(delete_archived_totals_query, params)
+    db.execute(repoint_category_merges_query, params)
+    db.execute(record_category_merge_query, {**params, 'now' : datetime.datetime.now(datetime.timezone.utc)})
+    db.execute(delete(Category).where(Category.id == old.id))
+    db.execute(summary_version_bump([user_id]))
+    db.commit()
+    bump_user_version(user_id)
+    # Open summary streams reload their totals once, instead of a delta per chunk
+    publish_summary_resync(user_id)
+    return result
@@ -0,0 +1,209 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Iterable, Optional
+from sqlalchemy import select, bindparam
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import ExpenseSummaryVersion
+from services.cache import CACHE_REDIS_URL
+
+logger = logging.getLogger(__name__)
+
+# Live summary updates for GET /expenses/stream (server-sent events).
+# Writes publish per category deltas of the user's totals; every open stream of that user
+# receives them. In-process by default (one API worker). With CACHE_REDIS_URL set, events
+# go through Redis pub/sub, so a write on any worker (or Celery task) reaches streams on all.
+# Deltas carry the user's summary version (expense_summary_versions), which the write bumps in
+# its own transaction; snapshots read it in the same statement as the totals, so a stream can
+# tell exactly which deltas a snapshot already contains.
+# Every other write to the user's expenses/categories (merges, archiving, admin deletes) bumps it
+# as well, so it is also the user's data version for ETags and result caches: being in the
+# database, it is the same for every API worker and Celery task and survives restarts.
+STREAM_MAX_CONNECTIONS = int(os.getenv("STREAM_MAX_CONNECTIONS", 10_000))  # per worker
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", 100))  # undelivered events per stream
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", 15))
+STREAM_REDIS_CHANNEL = "expense_summary_events"
+
+RESYNC = {'type' : 'resync'}
+
+
+class Subscription:
+    """One open stream: a bounded queue of events for its user."""
+
+    def __init__(self, user_id : int, queue_size : int):
+        self.user_id = user_id
+        self.queue : asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    def offer(self, event : dict) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # The client doesn't keep up: instead of buffering without bound (or blocking the
+            # publisher), drop its pending deltas and make it reload the totals once
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+
+class SummaryBroker:
+
+    def __init__(self, max_connections : int = STREAM_MAX_CONNECTIONS, queue_size : int = STREAM_QUEUE_SIZE):
+        self.max_connections = max_connections
+        self.queue_size = queue_size
+        self.connections = 0
+        self._subscribers : dict[int, set[Subscription]] = {}
+        self._loop : Optional[asyncio.AbstractEventLoop] = None
+        self._listener : Optional[asyncio.Task] = None
+        self._redis_client = None
+        self._async_redis_client = None
+        self._publishing : set[asyncio.Task] = set()
+
+    def subscribe(self, user_id : int) -> Optional[Subscription]:
+        """
+        Called from the event loop of this worker. None when max_connections streams are
+        already open: the check and the reservation run without an await in between, so
+        concurrent connects can't both take the last slot.
+        """
+        if self.connections >= self.max_connections:
+            return None
+        self._loop = asyncio.get_running_loop()
+        if CACHE_REDIS_URL and (self._listener is None or self._listener.done()):
+            self._listener = asyncio.create_task(self._listen())
+        subscription = Subscription(user_id, self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        self.connections += 1
+        return subscription
+
+    def unsubscribe(self, subscription : Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.user_id)
+        if subscribers is not None and subscription in subscribers:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.user_id]
+            self.connections -= 1
+
+    def publish(self, user_id : int, event : dict) -> None:
+        """Safe to call from request handlers, worker threads and Celery tasks."""
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if CACHE_REDIS_URL:
+            message = json.dumps({'user_id' : user_id, **event})
+            if running_loop is not None:
+                # Request handlers: sent in the background, the event loop doesn't wait on Redis
+                task = running_loop.create_task(self._publish_async(message))
+                self._publishing.add(task)
+                task.add_done_callback(self._publishing.discard)
+                return
+            if self._redis_client is None:
+                import redis
+                self._redis_client = redis.Redis.from_url(CACHE_REDIS_URL)
+            self._redis_client.publish(STREAM_REDIS_CHANNEL, message)
+            return
+        if self._loop is None or self._loop.is_closed():
+            return  # no stream was ever opened in this process
+        if running_loop is self._loop:
+            self._dispatch(user_id, event)
+        else:
+            self._loop.call_soon_threadsafe(self._dispatch, user_id, event)
+
+    async def _publish_async(self, message : str) -> None:
+        if self._async_redis_client is None:
+            import redis.asyncio as aioredis
+            self._async_redis_client = aioredis.Redis.from_url(CACHE_REDIS_URL)
+        try:
+            await self._async_redis_client.publish(STREAM_REDIS_CHANNEL, message)
+        except Exception as e:
+            logger.warning(f"Publishing a live update to Redis failed: {e}")
+
+    def _dispatch(self, user_id : int, event : dict) -> None:
+        for subscription in self._subscribers.get(user_id, ()):
+            subscription.offer(event)
+
+    async def _listen(self) -> None:
+        import redis.asyncio as aioredis
+        reconnecting = False
+        while True:
+            client = aioredis.Redis.from_url(CACHE_REDIS_URL)
+            pubsub = client.pubsub()
+            try:
+                await pubsub.subscribe(STREAM_REDIS_CHANNEL)
+                if reconnecting:
+                    # Events published while disconnected are lost: every stream reloads
+                    for subscribers in self._subscribers.values():
+                        for subscription in subscribers:
+                            subscription.offer(RESYNC)
+                async for message in pubsub.listen():
+                    if message['type'] != 'message':
+                        continue
+                    event = json.loads(message['data'])
+                    self._dispatch(event.pop('user_id'), event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Live update subscription to Redis lost, reconnecting: {e}")
+                reconnecting = True
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+                await client.aclose()
+
+    async def close(self) -> None:
+        if self._publishing:
+            await asyncio.gather(*self._publishing)
+        if self._async_redis_client is not None:
+            await self._async_redis_client.aclose()
+            self._async_redis_client = None
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+
+summary_broker = SummaryBroker()
+
+
+def summary_version_bump(owner_ids : Iterable[int]):
+    """
+    Upsert incrementing the summary version of the given users, returning (owner_id, version).
+    Run it inside the write's transaction: the row lock it takes orders the versions of one
+    user's writes like their commits.
+    """
+    stmt = pg_insert(ExpenseSummaryVersion).values([
+        {'owner_id' : owner_id, 'version' : 1} for owner_id in sorted(set(owner_ids))
+    ])
+    return stmt.on_conflict_do_update(
+        index_elements = [ExpenseSummaryVersion.owner_id],
+        set_ = {'version' : ExpenseSummaryVersion.version + 1}
+    ).returning(ExpenseSummaryVersion.owner_id, ExpenseSummaryVersion.version)
+
+
+summary_version_query = select(ExpenseSummaryVersion.version).where(
+    ExpenseSummaryVersion.owner_id == bindparam('owner_id')
+)
+
+
+async def get_summary_version(db : AsyncSession, user_id : int) -> int:
+    """The user's data version as seen by db (0 before the first write)."""
+    return (await db.execute(summary_version_query, {'owner_id' : user_id})).scalar() or 0
+
+
+def publish_summary_delta(user_id : int, version : int, categories : dict[str, float]) -> None:
+    """
+    Call after the commit of a write that changed the user's category totals, with the version
+    its summary_version_bump returned; categories maps names to the amount added (negative: removed).
+    """
+    categories = {name : amount for name, amount in categories.items() if amount}
+    if categories:
+        summary_broker.publish(user_id, {'type' : 'delta', 'version' : version, 'categories' : categories})
+
+
+def publish_summary_resync(user_id : int) -> None:
+    """For writes whose effect isn't a simple delta (e.g. category merges): streams reload the totals."""
+    summary_broker.publish(user_id, RESYNC)
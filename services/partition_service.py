@@ -0,0 +1,17 @@
+from datetime import date
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# create_expense_partitions() is installed by migration a3c5d8e1f027
+partition_function_exists_query = text("SELECT to_regproc('create_expense_partitions') IS NOT NULL")
+create_partitions_query = text("SELECT create_expense_partitions(:from_date, :to_date)")
+
+
+def ensure_expense_partitions(conn : Connection, from_date : date, to_date : date) -> int:
+    """
+    Creates the missing monthly expense partitions covering from_date..to_date and
+    returns how many were created. A no-op (0) on databases that aren't partitioned.
+    """
+    if not conn.execute(partition_function_exists_query).scalar():
+        return 0
+    return conn.execute(create_partitions_query, {'from_date' : from_date, 'to_date' : to_date}).scalar()
@@ -1,18 +1,21 @@
+import datetime
 from datetime import date
 from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
-from models import Expense, Category
+from models import Expense, Category, MonthlyReportSnapshot
 
-def get_monthly_expense_summary(
-        db : Session,
-        user_id: int,
-        year: int,
-        month: int
-) -> list[dict]:
+def previous_month(today : date) -> tuple[int, int]:
+    first_of_month = today.replace(day=1)
+    last_month = first_of_month - datetime.timedelta(days=1)
+    return last_month.year, last_month.month
+
+
+def build_monthly_summary_query(user_id : int, year : int, month : int):
     """
-    Returns category-wise expense totals for a given month.
+    Category totals of one month. The half-open date range lets Postgres scan only
+    that month's expenses partition.
     """
-
     start_date = date(year, month, 1)
 
     if month == 12:
@@ -34,8 +37,18 @@ def get_monthly_expense_summary(
         .group_by(Category.name)
         .order_by(func.sum(Expense.amount).desc())
     )
+    return stmt
 
-    result = db.execute(stmt).all()
+def get_monthly_expense_summary(
+        db : Session,
+        user_id: int,
+        year: int,
+        month: int
+) -> list[dict]:
+    """
+    Returns category-wise expense totals for a given month.
+    """
+    result = db.execute(build_monthly_summary_query(user_id, year, month)).all()
 
     return [
         {"category": row.category, "total": float(row.total)}
@@ -76,4 +89,55 @@ def build_monthly_report_html(
             <td><strong>₹ {total_amount}</strong></td>
         </tr>
     </table>
-    """
\ No newline at end of file
+    """
+
+def save_monthly_report_snapshot(
+        db : Session,
+        user_id : int,
+        year : int,
+        month : int,
+        read_db : Session | None = None
+) -> None:
+    """
+    Computes the month's summary + HTML once and stores it (replacing an earlier snapshot).
+    The email stage and GET /reports/{year}/{month} only read this row.
+    read_db (e.g. a replica session) runs the aggregation; the snapshot is written through db.
+    """
+    summary = get_monthly_expense_summary(db=read_db or db, user_id=user_id, year=year, month=month)
+    html = build_monthly_report_html(summary, year, month)
+
+    stmt = pg_insert(MonthlyReportSnapshot).values(
+        user_id = user_id,
+        year = year,
+        month = month,
+        summary = summary,
+        total = sum(item["total"] for item in summary),
+        html = html,
+        computed_at = datetime.datetime.now(datetime.timezone.utc)
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint = 'uq_report_snapshot_user_month',
+        set_ = {
+            'summary' : stmt.excluded.summary,
+            'total' : stmt.excluded.total,
+            'html' : stmt.excluded.html,
+            'computed_at' : stmt.excluded.computed_at
+        }
+    )
+    db.execute(stmt)
+    db.commit()
+
+def get_monthly_report_snapshot(
+        db : Session,
+        user_id : int,
+        year : int,
+        month : int,
+        for_update : bool = False
+) -> MonthlyReportSnapshot | None:
+    """
+    for_update locks the row (SKIP LOCKED): returns None if another transaction holds it.
+    """
+    stmt = select(MonthlyReportSnapshot).filter_by(user_id=user_id, year=year, month=month)
+    if for_update:
+        stmt = stmt.with_for_update(skip_locked=True)
+    return db.execute(stmt).scalar_one_or_none()
@@ -0,0 +1,78 @@
+from datetime import date
+from typing import Optional
+from sqlalchemy import select, func, any_, bindparam, literal_column, tuple_, String
+from sqlalchemy.dialects.postgresql import ARRAY
+from models import Expense, Category
+
+# Must match the expression of ix_expenses_description_tsv exactly, otherwise the GIN index isn't used.
+# Rendered literally (not as bound parameters) so the planner can match it.
+DESCRIPTION_TSVECTOR = literal_column("to_tsvector('simple', coalesce(expenses.description, ''))")
+
+
+def expense_filter_conditions(owner_id : int,
+                              start_date : date,
+                              end_date : date,
+                              categories : Optional[list[str]] = None,
+                              min_amount : Optional[float] = None,
+                              max_amount : Optional[float] = None,
+                              text_query : Optional[str] = None) -> list:
+    """
+    WHERE clauses for a filtered expense search. Only the given predicates are added,
+    so each combination compiles (and is cached) as its own index-friendly statement.
+    """
+    conditions = [
+        Expense.owner_id == owner_id,
+        Expense.date.between(start_date, end_date)
+    ]
+    if categories:
+        conditions.append(
+            Category.name == any_(bindparam('category_names', [c.strip() for c in categories], type_=ARRAY(String)))
+        )
+    if min_amount is not None:
+        conditions.append(Expense.amount >= min_amount)
+    if max_amount is not None:
+        conditions.append(Expense.amount <= max_amount)
+    if text_query:
+        conditions.append(DESCRIPTION_TSVECTOR.op('@@')(func.plainto_tsquery('simple', text_query)))
+    return conditions
+
+
+def build_filter_query(conditions : list, limit : int, offset : int = 0,
+                       cursor : Optional[tuple[date, int]] = None):
+    """Page of matching expenses in (date, id) order; keyset pagination when a cursor is given."""
+    query = (
+        select(
+            Expense.id,
+            Expense.amount,
+            Category.name.label('category'),
+            Expense.description,
+            Expense.date
+        )
+        .join(Category, Expense.category_id == Category.id)
+        .where(*conditions)
+        .order_by(Expense.date.asc(), Expense.id.asc())
+        .limit(limit)
+    )
+    if cursor is not None:
+        query = query.where(tuple_(Expense.date, Expense.id) > tuple_(*cursor))
+    elif offset:
+        query = query.offset(offset)
+    return query
+
+
+def build_count_query(conditions : list):
+    return (
+        select(func.count(Expense.id))
+        .join(Category, Expense.category_id == Category.id)
+        .where(*conditions)
+    )
+
+
+def encode_cursor(expense_date : date, expense_id : int) -> str:
+    return f"{expense_date.isoformat()}_{expense_id}"
+
+
+def decode_cursor(cursor : str) -> tuple[date, int]:
+    """Raises ValueError for malformed cursors."""
+    expense_date, _, expense_id = cursor.partition('_')
+    return date.fromisoformat(expense_date), int(expense_id)
@@ -0,0 +1,140 @@
+from datetime import date, timedelta
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.cache import LRUCache
+from services.live_updates import get_summary_version
+
+MAX_POINTS = 5000
+
+# Archived expenses (services.archive_service) only exist as monthly totals, so they are
+# part of monthly series only; day/week series cover live expenses.
+timeseries_query = text("""
+    SELECT t.period, SUM(t.total) AS total, CAST(SUM(t.count) AS integer) AS count
+    FROM (
+        SELECT CAST(date_trunc(:granularity, e.date) AS date) AS period,
+               SUM(e.amount) AS total,
+               COUNT(*) AS count
+        FROM expenses e
+        WHERE e.owner_id = :owner_id
+        AND e.date BETWEEN :start_date AND :end_date
+        AND (CAST(:category AS varchar) IS NULL OR e.category_id IN (
+            SELECT c.id FROM categories c
+            WHERE c.owner_id = :owner_id AND c.name = CAST(:category AS varchar)
+        ))
+        GROUP BY 1
+        UNION ALL
+        SELECT make_date(a.year, a.month, 1), a.total, a.count
+        FROM archived_expense_totals a
+        WHERE CAST(:granularity AS varchar) = 'month'
+        AND a.owner_id = :owner_id
+        AND make_date(a.year, a.month, 1) BETWEEN CAST(:start_date AS date) AND CAST(:end_date AS date)
+        AND (CAST(:category AS varchar) IS NULL OR a.category_id IN (
+            SELECT c.id FROM categories c
+            WHERE c.owner_id = :owner_id AND c.name = CAST(:category AS varchar)
+        ))
+    ) t
+    GROUP BY 1
+    ORDER BY 1
+""")
+
+# Totals of closed months, keyed by (user_id, data version, category, month_start).
+# A closed month only changes through a write, which bumps the database-held data version
+# (expense_summary_versions) in its own transaction, so every worker sees the change.
+monthly_rollup_cache = LRUCache()
+
+
+def period_start(day : date, granularity : str) -> date:
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())  # date_trunc('week') -> Monday
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_period(day : date, granularity : str) -> date:
+    if granularity == "week":
+        return day + timedelta(days=7)
+    if granularity == "month":
+        return date(day.year + 1, 1, 1) if day.month == 12 else date(day.year, day.month + 1, 1)
+    return day + timedelta(days=1)
+
+
+def dense_periods(start_date : date, end_date : date, granularity : str) -> list[date]:
+    periods = []
+    current = period_start(start_date, granularity)
+    while current <= end_date:
+        periods.append(current)
+        current = next_period(current, granularity)
+    return periods
+
+
+async def _query_totals(db : AsyncSession, user_id : int, granularity : str,
+                        start_date : date, end_date : date, category : Optional[str]) -> dict:
+    result = await db.execute(timeseries_query, {
+        'granularity' : granularity,
+        'owner_id' : user_id,
+        'start_date' : start_date,
+        'end_date' : end_date,
+        'category' : category
+    })
+    return {row.period : (float(row.total), row.count) for row in result}
+
+
+async def get_spending_timeseries(db : AsyncSession, user_id : int, granularity : str,
+                                  start_date : date, end_date : date,
+                                  category : Optional[str] = None) -> dict:
+    """
+    Dense spending series between start_date and end_date (inclusive), as parallel arrays.
+    Periods without expenses are present with a zero total. Buckets only sum expenses inside the
+    range, also the first and last month/week when the range starts or ends inside them.
+    Archived months only exist as monthly totals: they count if the range includes their first day.
+    Closed months that lie entirely in the range are served from the rollup cache.
+    """
+    periods = dense_periods(start_date, end_date, granularity)
+    if len(periods) > MAX_POINTS:
+        raise ValueError(f"Range too large: {len(periods)} points (max {MAX_POINTS}).")
+
+    totals = {}
+    if granularity == "month":
+        current_month = date.today().replace(day=1)
+        version = await get_summary_version(db, user_id)
+
+        def month_last_day(month : date) -> date:
+            return next_period(month, "month") - timedelta(days=1)
+
+        closed = [p for p in periods if p < current_month]
+        whole = [p for p in closed if p >= start_date and month_last_day(p) <= end_date]
+
+        missing = []
+        for month in whole:
+            cached = monthly_rollup_cache.get((user_id, version, category, month))
+            if cached is None:
+                missing.append(month)
+            else:
+                totals[month] = cached
+
+        if missing:
+            fetched = await _query_totals(db, user_id, "month", missing[0], month_last_day(missing[-1]), category)
+            for month in missing:
+                totals[month] = fetched.get(month, (0.0, 0))
+                monthly_rollup_cache.set((user_id, version, category, month), totals[month])
+
+        # Closed months cut by the range (at most the first and the last), clipped to it
+        for month in (p for p in closed if p not in whole):
+            totals.update(await _query_totals(db, user_id, "month", max(month, start_date),
+                                              min(month_last_day(month), end_date), category))
+
+        if end_date >= current_month:
+            totals.update(await _query_totals(db, user_id, "month", max(current_month, start_date),
+                                              end_date, category))
+    else:
+        totals = await _query_totals(db, user_id, granularity, start_date, end_date, category)
+
+    return {
+        'granularity' : granularity,
+        'category' : category,
+        'periods' : [p.isoformat() for p in periods],
+        'totals' : [totals.get(p, (0.0, 0))[0] for p in periods],
+        'counts' : [totals.get(p, (0.0, 0))[1] for p in periods]
+    }
@@ -0,0 +1,106 @@
+import datetime
+import logging
+import uuid
+from typing import Optional
+from sqlalchemy import select, update, delete
+from sqlalchemy.orm import Session
+from config import REFRESH_TOKEN_EXPIRES
+from models import RefreshToken, User
+from security import new_refresh_token, hash_refresh_token
+
+logger = logging.getLogger(__name__)
+
+
+def _add_refresh_token(db : Session, user_id : int, family_id : str, now : datetime.datetime) -> str:
+    token = new_refresh_token()
+    db.add(RefreshToken(
+        user_id = user_id,
+        token_hash = hash_refresh_token(token),
+        family_id = family_id,
+        created_at = now,
+        expires_at = now + REFRESH_TOKEN_EXPIRES
+    ))
+    return token
+
+
+def _revoke_family(db : Session, family_id : str, now : datetime.datetime) -> None:
+    db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at = now)
+    )
+
+
+def issue_refresh_token(db : Session, user_id : int) -> str:
+    """Starts a new token family (one per password login) and returns its first token."""
+    token = _add_refresh_token(db, user_id, uuid.uuid4().hex, datetime.datetime.now(datetime.timezone.utc))
+    db.commit()
+    return token
+
+
+def rotate_refresh_token(db : Session, token : str) -> Optional[tuple[User, str]]:
+    """
+    Exchanges a refresh token for its successor; returns the user and the new token,
+    or None if the token is unknown, expired, revoked or its user is being deleted.
+    Presenting an already rotated token revokes its whole family: either the client or
+    an attacker holds a stolen copy, and neither can tell which.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    # Row lock: two concurrent refreshes with the same token can't both rotate it
+    row = db.execute(
+        select(RefreshToken).where(RefreshToken.token_hash == hash_refresh_token(token)).with_for_update()
+    ).scalar_one_or_none()
+    if row is None:
+        return None
+
+    if row.revoked_at is not None:
+        _revoke_family(db, row.family_id, now)
+        db.commit()
+        logger.warning(f"Revoked refresh token reused, family revoked | user_id={row.user_id}")
+        return None
+    if row.expires_at <= now:
+        db.rollback()
+        return None
+
+    user = db.get(User, row.user_id)
+    if user is None or user.deleted_at is not None:
+        db.rollback()
+        return None
+
+    row.revoked_at = now
+    new_token = _add_refresh_token(db, user.id, row.family_id, now)
+    db.commit()
+    return user, new_token
+
+
+def revoke_refresh_token(db : Session, token : str) -> bool:
+    """Logout: revokes the token's family. Returns False for an unknown token."""
+    family_id = db.execute(
+        select(RefreshToken.family_id).where(RefreshToken.token_hash == hash_refresh_token(token))
+    ).scalar_one_or_none()
+    if family_id is None:
+        return False
+    _revoke_family(db, family_id, datetime.datetime.now(datetime.timezone.utc))
+    db.commit()
+    return True
+
+
+def revoke_user_refresh_tokens(db : Session, user_id : int) -> None:
+    """Ends every session of the user (password change); the caller commits."""
+    db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.user_id == user_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at = datetime.datetime.now(datetime.timezone.utc))
+    )
+
+
+def purge_expired_refresh_tokens(db : Session) -> int:
+    """
+    Deletes expired tokens. Revoked tokens stay until they expire, so their reuse
+    is still detected.
+    """
+    result = db.execute(
+        delete(RefreshToken).where(RefreshToken.expires_at < datetime.datetime.now(datetime.timezone.utc))
+    )
+    db.commit()
+    return result.rowcount
@@ -0,0 +1,202 @@
+import asyncio
+import datetime
+import logging
+import os
+from typing import Optional
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from database import shards, ShardSet
+from models import Expense, Category
+from services.cache import bump_user_version_async
+from services.live_updates import summary_version_bump, publish_summary_delta
+
+logger = logging.getLogger(__name__)
+
+# Group commit for POST /expenses/new_expense (off by default).
+# Requests enqueue their expense and wait; a background flusher writes up to
+# GROUP_COMMIT_MAX_ROWS queued expenses as one multi-row INSERT in one transaction
+# (one per shard when sharded), at the latest GROUP_COMMIT_MAX_DELAY_MS after the first one arrived. Every request
+# gets its id only after that transaction committed.
+EXPENSE_GROUP_COMMIT = os.getenv("EXPENSE_GROUP_COMMIT", "false").lower() == "true"
+GROUP_COMMIT_MAX_ROWS = int(os.getenv("GROUP_COMMIT_MAX_ROWS", 200))
+GROUP_COMMIT_MAX_DELAY_MS = float(os.getenv("GROUP_COMMIT_MAX_DELAY_MS", 5))
+GROUP_COMMIT_MAX_PENDING = int(os.getenv("GROUP_COMMIT_MAX_PENDING", 5000))
+
+
+class WriteBufferFull(Exception):
+    """More than max_pending expenses are waiting; the caller should retry later."""
+    pass
+
+
+class ExpenseWriteBuffer:
+
+    def __init__(self,
+                 shard_set : ShardSet = shards,
+                 max_rows : int = GROUP_COMMIT_MAX_ROWS,
+                 max_delay_ms : float = GROUP_COMMIT_MAX_DELAY_MS,
+                 max_pending : int = GROUP_COMMIT_MAX_PENDING):
+        self.shard_set = shard_set
+        self.max_rows = max_rows
+        self.max_delay = max_delay_ms / 1000
+        self.max_pending = max_pending
+        self._pending : list[tuple[dict, asyncio.Future]] = []
+        self._wakeup : Optional[asyncio.Event] = None
+        self._batch_full : Optional[asyncio.Event] = None
+        self._flusher : Optional[asyncio.Task] = None
+        self._closing = False
+        self.batches = 0
+        self.rows = 0
+
+    def _start(self) -> None:
+        # Created on first use, inside the running event loop of this worker
+        self._wakeup = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._closing = False
+        self._flusher = asyncio.create_task(self._run())
+
+    async def submit(self, owner_id : int, amount : float, category_name : str,
+                     description : Optional[str]) -> dict:
+        """Queues one expense and returns the inserted row once its batch is committed."""
+        if self._flusher is None or self._flusher.done():
+            self._start()
+        if len(self._pending) >= self.max_pending:
+            raise WriteBufferFull(f"{len(self._pending)} expenses waiting to be written")
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(({
+            'owner_id' : owner_id,
+            'amount' : amount,
+            'category_name' : category_name.strip(),
+            'description' : description
+        }, future))
+        self._wakeup.set()
+        if len(self._pending) >= self.max_rows:
+            self._batch_full.set()
+        return await future
+
+    async def _run(self) -> None:
+        # Returns once close() was called and everything queued is written
+        while not (self._closing and not self._pending):
+            await self._wakeup.wait()
+            # First expense arrived: give others max_delay to join, unless the batch fills up
+            try:
+                await asyncio.wait_for(self._batch_full.wait(), timeout=self.max_delay)
+            except asyncio.TimeoutError:
+                pass
+
+            batch = self._pending[:self.max_rows]
+            del self._pending[:self.max_rows]
+            if not self._pending:
+                self._wakeup.clear()
+            if len(self._pending) < self.max_rows and not self._closing:
+                self._batch_full.clear()
+
+            if batch:
+                await self._flush(batch)
+
+    async def _flush(self, batch : list[tuple[dict, asyncio.Future]]) -> None:
+        # One transaction per shard of the batch, written concurrently
+        by_shard : dict[int, list[tuple[dict, asyncio.Future]]] = {}
+        for entry in batch:
+            by_shard.setdefault(self.shard_set.shard_for(entry[0]['owner_id']), []).append(entry)
+        await asyncio.gather(*(
+            self._flush_shard(self.shard_set.async_session_factories[index], entries)
+            for index, entries in by_shard.items()
+        ))
+
+    async def _flush_shard(self, session_factory, batch : list[tuple[dict, asyncio.Future]]) -> None:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        try:
+            async with session_factory() as session:
+                # One upsert for all categories of the batch. Sorted and deduplicated: a row can't
+                # be upserted twice by one statement, and a fixed order avoids deadlocks between workers.
+                keys = sorted({(item['owner_id'], item['category_name']) for item, _ in batch})
+                category_upsert = pg_insert(Category).values([
+                    {'owner_id' : owner_id, 'name' : name, 'created_at' : now, 'updated_at' : now}
+                    for owner_id, name in keys
+                ])
+                category_upsert = category_upsert.on_conflict_do_update(
+                    index_elements = [Category.owner_id, Category.name],
+                    set_ = {'name' : category_upsert.excluded.name}
+                ).returning(Category.id, Category.owner_id, Category.name)
+                category_ids = {
+                    (row.owner_id, row.name) : row.id for row in await session.execute(category_upsert)
+                }
+
+                # Multi-row INSERT; returned rows come back in parameter order
+                result = await session.execute(
+                    insert(Expense).returning(
+                        Expense.id, Expense.amount, Expense.description, Expense.date,
+                        sort_by_parameter_order=True
+                    ),
+                    [
+                        {
+                            'amount' : item['amount'],
+                            'category_id' : category_ids[(item['owner_id'], item['category_name'])],
+                            'description' : item['description'],
+                            'owner_id' : item['owner_id'],
+                            'created_at' : now,
+                            'updated_at' : now
+                        } for item, _ in batch
+                    ]
+                )
+                rows = result.all()
+                # Live summary versions of the batch's users, committed with their expenses
+                versions = {
+                    row.owner_id : row.version
+                    for row in await session.execute(summary_version_bump(item['owner_id'] for item, _ in batch))
+                }
+                await session.commit()
+        except Exception as exc:
+            if len(batch) > 1:
+                # One bad row (or owner) must not fail the other requests of the batch: write them
+                # one by one, so only the request that causes the error gets it
+                logger.warning(f"Group commit of {len(batch)} expenses failed, retrying row by row: {exc}")
+                for entry in batch:
+                    await self._flush_shard(session_factory, [entry])
+                return
+            logger.exception("Group commit of 1 expense failed")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        # Committed: the requests get their rows first, whatever happens to the bookkeeping below
+        for (item, future), row in zip(batch, rows):
+            if not future.done():  # the request may have been cancelled meanwhile
+                future.set_result({
+                    'id' : row.id,
+                    'amount' : row.amount,
+                    'description' : row.description,
+                    'category' : item['category_name'],
+                    'date' : row.date
+                })
+        self.batches += 1
+        self.rows += len(batch)
+
+        # A Redis error here must not end the flusher (and with it every later write)
+        try:
+            deltas : dict[int, dict[str, float]] = {}
+            for item, _ in batch:
+                categories = deltas.setdefault(item['owner_id'], {})
+                categories[item['category_name']] = categories.get(item['category_name'], 0) + item['amount']
+            for owner_id, categories in deltas.items():
+                await bump_user_version_async(owner_id)
+                publish_summary_delta(owner_id, versions[owner_id], categories)
+        except Exception:
+            logger.exception(f"Cache version bump / live update after group commit of {len(batch)} expenses failed")
+
+    async def close(self) -> None:
+        """Writes what is still queued and stops the flusher (application shutdown)."""
+        if self._flusher is None:
+            return
+        # Not cancelled: a batch it is writing would be lost. Flushing without delay, it drains
+        # the queue and returns.
+        self._closing = True
+        self._wakeup.set()
+        self._batch_full.set()
+        await self._flusher
+        self._flusher = None
+
+
+expense_write_buffer = ExpenseWriteBuffer()
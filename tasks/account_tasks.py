@@ -0,0 +1,60 @@
+import logging
+from sqlalchemy.exc import OperationalError
+from sqlalchemy import delete
+from database import SessionLocal, shards
+from services.account_service import delete_user_data
+from services.token_service import purge_expired_refresh_tokens
+from services.cache import bump_user_version
+from models import User
+from celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+
+def deletion_task_id(user_id : int) -> str:
+    """One deletion task per user: repeated requests and status polling use the same id."""
+    return f"delete-user-{user_id}"
+
+
+@celery_app.task(bind=True,
+                 acks_late=True,
+                 ignore_result=False,  # progress and outcome are polled via GET /user/delete_profile
+                 track_started=True,  # a running deletion isn't queued again (routers.users)
+                 autoretry_for=(OperationalError,),
+                 retry_backoff=True,
+                 retry_kwargs={"max_retries" : 5})
+def delete_user_account(self, user_id : int):
+    db = shards.session(user_id)
+    try:
+        result = delete_user_data(
+            db,
+            user_id,
+            on_progress=lambda progress: self.update_state(state='PROGRESS', meta=progress)
+        )
+    finally:
+        db.close()
+
+    if shards.sharded:
+        # The data lived on the user's shard; the login row is in the user directory
+        db = SessionLocal()
+        try:
+            db.execute(delete(User).where(User.id == user_id))
+            db.commit()
+        finally:
+            db.close()
+
+    bump_user_version(user_id)
+    logger.info(f"User account deleted | user_id={user_id} | {result}")
+    return result
+
+
+@celery_app.task
+def purge_expired_refresh_tokens_task() -> int:
+    """Celery Beat entry point (daily)."""
+    db = SessionLocal()
+    try:
+        purged = purge_expired_refresh_tokens(db)
+    finally:
+        db.close()
+    logger.info(f"Purged {purged} expired refresh tokens")
+    return purged
@@ -0,0 +1,27 @@
+from database import shards
+from services.archive_service import archive_horizon, archive_old_expenses
+from celery_app import celery_app
+
+
+@celery_app.task(acks_late=True)
+def archive_old_expenses_task(owner_id : int | None = None):
+    """
+    Celery Beat entry point (monthly). Safe to rerun: archived rows are gone from expenses,
+    and an interrupted user/month is archived again as a new part.
+    """
+    horizon = archive_horizon()
+    # Every shard (only the user's own for owner_id); just the primary when unsharded
+    if owner_id is not None:
+        factories = [shards.session_factories[shards.shard_for(owner_id)]]
+    else:
+        factories = shards.session_factories
+    result = {'horizon' : horizon.isoformat(), 'months' : 0, 'rows' : 0}
+    for session_factory in factories:
+        db = session_factory()
+        try:
+            shard_result = archive_old_expenses(db, horizon, owner_id)
+        finally:
+            db.close()
+        result['months'] += shard_result['months']
+        result['rows'] += shard_result['rows']
+    return result
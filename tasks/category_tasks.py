@@ -0,0 +1,31 @@
+import logging
+import uuid
+from database import shards
+from services.category_service import merge_category
+from celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+
+def merge_task_id(user_id : int) -> str:
+    """Task ids carry the user id, so the status endpoint only shows a user their own merges."""
+    return f"merge-category-{user_id}-{uuid.uuid4().hex}"
+
+
+@celery_app.task(bind=True,
+                 acks_late=True,
+                 ignore_result=False)  # progress and outcome are polled via GET /expenses/category_merge/{task_id}
+def merge_category_task(self, user_id : int, old_name : str, new_name : str):
+    db = shards.session(user_id)
+    try:
+        result = merge_category(
+            db, user_id, old_name, new_name,
+            on_progress=lambda progress: self.update_state(state='PROGRESS', meta=progress)
+        )
+    finally:
+        db.close()
+
+    if result is None:
+        return {'updated_count' : 0, 'message' : f'No category name {old_name} found for this user.'}
+    logger.info(f"Category merge done | user_id={user_id} | {old_name} -> {new_name} | {result['updated_count']} expenses")
+    return result
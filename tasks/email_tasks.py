@@ -1,49 +1,90 @@
 import logging
 import datetime
-from database import SessionLocal
+from database import shards, open_read_session
 from services.report_service import (
-    get_monthly_expense_summary,
-    build_monthly_report_html
+    save_monthly_report_snapshot,
+    get_monthly_report_snapshot
 )
 from celery_app import celery_app
 from send_email import send_email
-from tasks.exceptions import RetryableEmailError
+from tasks.exceptions import RetryableEmailError, PermanentEmailError
 
 logger = logging.getLogger(__name__)
 
+# Monthly reports run in two stages so an SMTP retry never recomputes the aggregation:
+#   compute_monthly_report  -> aggregates expenses into monthly_report_snapshots
+#   email_monthly_report    -> sends the stored snapshot HTML (retried on SMTP errors)
+
+@celery_app.task(acks_late=True)
+def compute_monthly_report(user_id : int, email : str, year : int, month : int):
+    db = shards.session(user_id)
+    read_db = None
+    try:
+        existing = get_monthly_report_snapshot(db = db, user_id = user_id, year = year, month = month)
+        if existing is not None and existing.emailed_at is not None:
+            logger.info(f"Monthly report already delivered | user_id={user_id} | {month}/{year}")
+            return
+
+        # The aggregation over a closed month runs on a read replica when one is configured
+        # (replicas serve the unsharded primary; a sharded user is aggregated on their shard)
+        if not shards.sharded:
+            read_db = open_read_session()
+        save_monthly_report_snapshot(
+            db = db,
+            user_id = user_id,
+            year = year,
+            month = month,
+            read_db = read_db
+        )
+    except Exception:
+        logger.exception(
+            f"Monthly report computation failed | user_id={user_id} | {month}/{year}"
+        )
+        raise
+    finally:
+        if read_db is not None:
+            read_db.close()
+        db.close()
+
+    email_monthly_report.delay(user_id = user_id, email = email, year = year, month = month)
+
+
 @celery_app.task(bind=True,
                  autoretry_for=(RetryableEmailError,),
                  retry_backoff = True,
                  retry_kwargs = {"max_retries" : 5},
                  retry_jitter = True,
                  acks_late=True)
-def send_monthly_expense_report(self, user_id : int, email : str):
-    db = SessionLocal()
+def email_monthly_report(self, user_id : int, email : str, year : int, month : int):
+    db = shards.session(user_id)
     try:
-        now = datetime.datetime.now(datetime.timezone.utc)
-        year = now.year
-        month = now.month
+        # Row lock for the duration of the send: a duplicate task for the same user/month skips
+        snapshot = get_monthly_report_snapshot(db = db, user_id = user_id, year = year, month = month,
+                                               for_update = True)
+        if snapshot is None:
+            if get_monthly_report_snapshot(db = db, user_id = user_id, year = year, month = month) is None:
+                raise PermanentEmailError(f"No report snapshot for user {user_id} {month}/{year}")
+            logger.info(f"Monthly report is being sent by another worker | user_id={user_id} | {month}/{year}")
+            return
 
-        summary = get_monthly_expense_summary(
-            db = db,
-            user_id = user_id,
-            year = year,
-            month = month
-        )
-
-        html_body = build_monthly_report_html(summary, year, month)
+        if snapshot.emailed_at is not None:
+            logger.info(f"Monthly report already delivered | user_id={user_id} | {month}/{year}")
+            return
 
         send_email(
             to_email = email,
             subject = "📊 Your Monthly Expense Report",
-            html_body = html_body
+            html_body = snapshot.html
         )
 
+        snapshot.emailed_at = datetime.datetime.now(datetime.timezone.utc)
+        db.commit()
+
     except Exception as exc:
         logger.exception(
-            f"Monthly report failed | user_id={user_id} | {month}/{year}"
+            f"Monthly report email failed | user_id={user_id} | {month}/{year}"
         )
         raise #why raise again? Celery must see the exception otherwise no retry, task marked as success
 
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -0,0 +1,29 @@
+import logging
+import os
+import datetime
+from database import shards
+from services.partition_service import ensure_expense_partitions
+from celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+# Empty monthly partitions kept ready ahead of today
+EXPENSE_PARTITION_MONTHS_AHEAD = int(os.getenv("EXPENSE_PARTITION_MONTHS_AHEAD", 12))
+
+
+@celery_app.task
+def create_future_expense_partitions(months_ahead : int = EXPENSE_PARTITION_MONTHS_AHEAD) -> int:
+    """
+    Celery Beat entry point (daily). Idempotent: only missing partitions are created,
+    so running it more often than needed is harmless.
+    """
+    today = datetime.date.today()
+    month_index = today.month - 1 + months_ahead
+    last_month = datetime.date(today.year + month_index // 12, month_index % 12 + 1, 1)
+    created = 0
+    for session_factory in shards.session_factories:
+        with session_factory.kw["bind"].begin() as conn:
+            created += ensure_expense_partitions(conn, today, last_month)
+    if created:
+        logger.info(f"Created {created} expense partition(s) | months_ahead={months_ahead}")
+    return created
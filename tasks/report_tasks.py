@@ -0,0 +1,80 @@
+import logging
+import datetime
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from database import SessionLocal
+from models import User, MonthlyReportRun
+from celery_app import celery_app
+from tasks.email_tasks import compute_monthly_report
+from services.report_service import previous_month
+
+logger = logging.getLogger(__name__)
+
+USER_BATCH_SIZE = 1000
+
+
+@celery_app.task
+def schedule_previous_month_reports():
+    """
+    Celery Beat entry point (1st of every month). Fixes the report month once, here,
+    so nothing downstream depends on the clock at execution time.
+    """
+    year, month = previous_month(datetime.datetime.now(datetime.timezone.utc).date())
+    run_monthly_reports.delay(year = year, month = month)
+
+
+@celery_app.task(acks_late=True)
+def run_monthly_reports(year : int, month : int):
+    """
+    Queues the compute stage for every user, in id order and in batches.
+
+    Progress is stored in monthly_report_runs.last_user_id after each batch, so a run
+    that crashes (or is started twice) resumes after the last queued user. Users of a
+    batch that was queued but not recorded get queued again, which is harmless: the
+    report stages skip users whose report for the month was already emailed.
+    """
+    db = SessionLocal()
+    try:
+        db.execute(
+            pg_insert(MonthlyReportRun)
+            .values(year = year, month = month, status = 'running', last_user_id = 0, users_queued = 0)
+            .on_conflict_do_nothing(constraint = 'uq_report_run_month')
+        )
+        db.commit()
+
+        run = db.execute(
+            select(MonthlyReportRun).filter_by(year = year, month = month).with_for_update(skip_locked = True)
+        ).scalar_one_or_none()
+        if run is None:
+            logger.info(f"Monthly report run {month}/{year} is already in progress elsewhere")
+            return
+        if run.status == 'completed':
+            logger.info(f"Monthly report run {month}/{year} already completed")
+            return
+
+        while True:
+            users = db.execute(
+                select(User.id, User.email)
+                .where(User.id > run.last_user_id, User.deleted_at.is_(None))
+                .order_by(User.id)
+                .limit(USER_BATCH_SIZE)
+            ).all()
+            if not users:
+                break
+
+            for u in users:
+                compute_monthly_report.delay(user_id = u.id, email = u.email, year = year, month = month)
+
+            run.last_user_id = users[-1].id
+            run.users_queued += len(users)
+            db.commit()
+            # commit released the row lock, take it again for the next batch
+            db.execute(select(MonthlyReportRun.id).filter_by(id = run.id).with_for_update())
+
+        run.status = 'completed'
+        run.finished_at = datetime.datetime.now(datetime.timezone.utc)
+        db.commit()
+        logger.info(f"Monthly report run {month}/{year} completed | users_queued={run.users_queued}")
+
+    finally:
+        db.close()
@@ -0,0 +1,43 @@
+import datetime
+import os
+import sys
+import uuid
+import pytest
+from dotenv import load_dotenv
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+load_dotenv(os.path.join(ROOT, ".env"))
+
+# Tests marked with this need a Postgres database migrated with `alembic upgrade head`
+# in DATABASE_URL (and DATABASE_SHARD_URLS, if set); the database module can't even be
+# imported without one. Test modules check it before importing the app.
+DATABASE_CONFIGURED = bool(os.getenv("DATABASE_URL"))
+
+
+@pytest.fixture
+def test_user():
+    """A throwaway user (on its shard too); deleted with all its data afterwards."""
+    from sqlalchemy import delete
+    from database import SessionLocal, shards
+    from models import User
+    from routers.auth import create_access_token
+    from services.account_service import add_user_to_shard
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    with SessionLocal() as db:
+        user = User(email=f"test-{uuid.uuid4().hex}@example.com", hashed_password='', role='user',
+                    created_at=now, updated_at=now)
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        add_user_to_shard(user)
+    token = create_access_token(user.email, user.id, user.created_at, user.role)
+    try:
+        yield {'id' : user.id, 'headers' : {'Authorization' : f"Bearer {token}"}}
+    finally:
+        # The database CASCADEs the delete to the user's expenses, categories, ...
+        for session in ([SessionLocal(), shards.session(user.id)] if shards.sharded else [SessionLocal()]):
+            with session:
+                session.execute(delete(User).where(User.id == user.id))
+                session.commit()
@@ -0,0 +1,45 @@
+"""
+Index use of the filter_expenses queries: each predicate combination must be served by the
+index built for it (alembic revision 8d3f6a1b2c57). Sequential scans are disabled, so the
+plan shows whether the index fits the predicates even on a small test database.
+"""
+from datetime import date
+import pytest
+from conftest import DATABASE_CONFIGURED
+
+if not DATABASE_CONFIGURED:
+    pytest.skip("DATABASE_URL not set", allow_module_level=True)
+
+from sqlalchemy.dialects import postgresql
+from database import Engine
+from services.search_service import expense_filter_conditions, build_filter_query
+
+START, END = date(2000, 1, 1), date(2030, 12, 31)
+
+
+def explain(conn, query) -> str:
+    # Inline the parameters so the plan is the same one the planner picks for real values
+    sql = str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    rows = conn.exec_driver_sql("EXPLAIN " + sql.replace("%", "%%")).fetchall()
+    return "\n".join(row[0] for row in rows)
+
+
+@pytest.fixture
+def conn():
+    with Engine.connect() as conn:
+        conn.exec_driver_sql("SET enable_seqscan = off")
+        yield conn
+        conn.rollback()
+
+
+@pytest.mark.parametrize("filters, cursor, expected_index", [
+    pytest.param({}, None, "ix_expenses_owner_date_id", id="date range"),
+    pytest.param({}, (date(2024, 1, 1), 0), "ix_expenses_owner_date_id", id="date range + keyset cursor"),
+    pytest.param({'min_amount' : 10, 'max_amount' : 500}, None, "ix_expenses_owner_date_id", id="amount range"),
+    pytest.param({'categories' : ["Groceries"]}, None, "ix_expenses_owner_date_id", id="categories"),
+    pytest.param({'text_query' : "coffee"}, None, "ix_expenses_description_tsv", id="description text"),
+])
+def test_filter_query_uses_index(conn, test_user, filters, cursor, expected_index):
+    conditions = expense_filter_conditions(test_user['id'], START, END, **filters)
+    plan = explain(conn, build_filter_query(conditions, 51, cursor=cursor))
+    assert expected_index in plan, plan
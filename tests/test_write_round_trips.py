@@ -0,0 +1,104 @@
+"""
+Database round trips of the expense write endpoints. Each one is a single statement plus its
+commit: the category is upserted in a CTE of the expense write (routers.expenses.upsert_category_cte),
+deletes return what they removed instead of loading it first.
+"""
+import contextlib
+import pytest
+from conftest import DATABASE_CONFIGURED
+
+if not DATABASE_CONFIGURED:
+    pytest.skip("DATABASE_URL not set", allow_module_level=True)
+
+import httpx
+import pytest_asyncio
+from sqlalchemy import event
+from database import shards, dispose_engines
+import routers.expenses
+from main import app
+
+MAX_ROUND_TRIPS = 2
+
+
+@contextlib.contextmanager
+def round_trips(user_id : int):
+    """Statements and commits sent to the user's shard while the block runs."""
+    engine = shards.async_session_factories[shards.shard_for(user_id)].kw["bind"].sync_engine
+    sent = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        sent.append(statement)
+
+    def on_commit(conn):
+        sent.append("COMMIT")
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    event.listen(engine, "commit", on_commit)
+    try:
+        yield sent
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+        event.remove(engine, "commit", on_commit)
+
+
+@pytest_asyncio.fixture
+async def client(monkeypatch):
+    # Per request writes; group commit batches across requests
+    monkeypatch.setattr(routers.expenses, "EXPENSE_GROUP_COMMIT", False)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    # Pooled asyncpg connections belong to this test's event loop
+    await dispose_engines()
+
+
+async def create_expense(client, test_user, category_name : str = "groceries") -> int:
+    response = await client.post('/expenses/new_expense', headers=test_user['headers'],
+                                 json={'amount' : 12.5, 'category_name' : category_name})
+    assert response.status_code == 201
+    return response.json()['id']
+
+
+@pytest.mark.asyncio
+async def test_create_expense(client, test_user):
+    with round_trips(test_user['id']) as sent:
+        await create_expense(client, test_user, "new category")
+    assert len(sent) <= MAX_ROUND_TRIPS, sent
+
+
+@pytest.mark.asyncio
+async def test_update_expense(client, test_user):
+    expense_id = await create_expense(client, test_user)
+    with round_trips(test_user['id']) as sent:
+        response = await client.put(f'/expenses/update_expense/{expense_id}', headers=test_user['headers'],
+                                    json={'amount' : 20.0, 'category_name' : 'other category'})
+    assert response.status_code == 201
+    assert len(sent) <= MAX_ROUND_TRIPS, sent
+
+
+@pytest.mark.asyncio
+async def test_delete_expense(client, test_user):
+    expense_id = await create_expense(client, test_user)
+    with round_trips(test_user['id']) as sent:
+        response = await client.delete(f'/expenses/delete_expense/{expense_id}', headers=test_user['headers'])
+    assert response.status_code == 200
+    assert len(sent) <= MAX_ROUND_TRIPS, sent
+
+
+@pytest.mark.asyncio
+async def test_delete_expenses_by_ids(client, test_user):
+    expense_ids = [await create_expense(client, test_user) for _ in range(3)]
+    with round_trips(test_user['id']) as sent:
+        response = await client.request('DELETE', '/expenses', headers=test_user['headers'],
+                                        json={'ids' : expense_ids})
+    assert response.json()['deleted_count'] == 3
+    assert len(sent) <= MAX_ROUND_TRIPS, sent
+
+
+@pytest.mark.asyncio
+async def test_bulk_delete_expenses(client, test_user):
+    await create_expense(client, test_user, "to delete")
+    with round_trips(test_user['id']) as sent:
+        response = await client.request('DELETE', '/expenses/bulk_delete_expenses', headers=test_user['headers'],
+                                        json={'category_names' : ['to delete']})
+    assert response.json()['deleted_count'] == 1
+    assert len(sent) <= MAX_ROUND_TRIPS, sent